@@ -1,8 +1,14 @@
 from PyQt4 import QtCore
+import os
+import sys
 import socket
 import struct
 import joystickv1
 
+# The Science station wire format is defined once in Science/Schema.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "Science"))
+import Schema
+
 
 class ConnectionManager:
     def __init__(self):
@@ -220,6 +226,17 @@ class ArmConnection(UdpConnection):
 class ScienceConnection(QtCore.QThread):
     sensorUpdate = QtCore.pyqtSignal([dict])
 
+    # Science packet fields (see Science/Schema.py) shown by the sensor list
+    SENSOR_LABELS = {
+        Schema.PacketType.PrimarySensor: (("distance", "Distance"), ("uv", "UV"),
+                                          ("thermocouple", "Thermo External"),
+                                          ("internal_temp", "Thermo Internal"),
+                                          ("humidity", "Humidity")),
+        Schema.PacketType.AuxSensor: (("encoder1", "Science Encoder 1"), ("encoder2", "Science Encoder 2"),
+                                      ("encoder3", "Science Encoder 3"), ("limit1", "Limit Switch"))
+    }
+    FRAME_HEADER = struct.Struct(">H")
+
     def __init__(self, host, port):
         super(self.__class__, self).__init__()
 
@@ -230,6 +247,7 @@ class ScienceConnection(QtCore.QThread):
         self.failed = 0
 
         self.science_sock = None
+        self.receive_buffer = b''
 
     def run(self):
         # Initial connection attempt
@@ -250,6 +268,7 @@ class ScienceConnection(QtCore.QThread):
 
     def connect(self, retry):
         try:
+            self.receive_buffer = b''
             self.science_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.science_sock.connect((self.host, self.port))
         except socket.error:
@@ -261,14 +280,16 @@ class ScienceConnection(QtCore.QThread):
 
     def send_message(self):
         if self.connected:
-            buff = struct.pack(">ic18sc", 0x00000000, 0x80, "I can haz picture?", 0x00)
-            self.science_sock.send(buff)
+            buff = Schema.pack(Schema.PacketType.ImageRequest,
+                               (Schema.IMAGE_REQUEST, Schema.CameraID.Microscope), 0)
+            # Science station commands are length-framed (2 byte big-endian length)
+            self.science_sock.send(struct.pack(">H", len(buff)) + buff)
 
     def receive_message(self):
         """
-        Receive the incoming UDP packets, unpack them and emit them so other UI components can use them
+        Receive the incoming science packets, unpack them and emit them so other UI components can use them
+        Packets are length-framed (2 byte big-endian length) and laid out as described in Science/Schema.py
         :return: Emit a dictionary of sensor values
-        :return: Emit a tuple of lat lng coordinates
         """
 
         try:
@@ -276,30 +297,24 @@ class ScienceConnection(QtCore.QThread):
         except socket.error:
             self.failed = self.failed + 1
         else:
-            # Unpack the first six floats of the packet
-            tup = struct.unpack_from(">ic", science_data, 0)
-            ide = tup[1]
-
-            if ide == 0x00:
-                tup = struct.unpack_from(">hihhh", science_data, 2)
-                distance = tup[0]
-                uv = tup[1]
-                thermo_ext = tup[2]
-                thermo_int = tup[3]
-                humidity = tup[4]
-                dictionary = {"Distance": str(distance), "UV": str(uv),
-                              "Thermo Internal": str(thermo_ext), "Thermo External": str(thermo_int),
-                              "Humidity": str(humidity)}
-                self.sensorUpdate.emit(dictionary)
-            elif ide == 0x02:
-                tup = struct.unpack_from(">hhh?", science_data, 2)
-                enc1 = tup[0]
-                enc2 = tup[1]
-                enc3 = tup[2]
-                limit = tup[3]
-                dictionary = {"Science Encoder 1": str(enc1), "Science Encoder 2": str(enc2),
-                              "Science Encoder 3": str(enc3), "Limit Switch": str(limit)}
-                self.sensorUpdate.emit(dictionary)
+            self.receive_buffer += science_data
+            header_size = self.FRAME_HEADER.size
+            while len(self.receive_buffer) >= header_size:
+                length = self.FRAME_HEADER.unpack_from(self.receive_buffer)[0]
+                if len(self.receive_buffer) < header_size + length:
+                    break
+                self.emit_packet(self.receive_buffer[header_size:header_size + length])
+                self.receive_buffer = self.receive_buffer[header_size + length:]
+
+    def emit_packet(self, data):
+        try:
+            packet = Schema.unpack(data)
+        except ValueError:
+            return
+        labels = self.SENSOR_LABELS.get(packet["type"])
+        if labels is not None:
+            dictionary = dict((label, str(packet[field])) for field, label in labels)
+            self.sensorUpdate.emit(dictionary)
 
 
 # Open a TCP connect in a separate thread
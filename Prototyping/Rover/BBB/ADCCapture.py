@@ -0,0 +1,371 @@
+"""
+Buffered capture of the Beaglebone Black analog inputs.
+
+Adafruit_BBIO's ADC.read() is a one-shot sysfs read: every sample
+opens in_voltageN_raw, starts a conversion and waits for it, and the
+first read after switching channels can be stale (hence the double
+reads). This engine instead puts the ADC into continuous capture
+through the IIO buffer interface for every enabled AIN channel. A
+capture thread drains /dev/iio:deviceN with one bulk read per poll into
+a ring buffer per channel, so a reading is an average over the newest
+samples already in memory.
+
+    read(pin, samples)         - average of the newest samples, 0.0 to 1.0
+                                 (same scale as ADC.read)
+    readAverage(pin, samples)  - (average, time of the newest sample)
+    readRaw(pin, samples)      - average in raw counts
+    decimate(pin, factor, n)   - the newest n averages of factor samples each
+
+If the buffer cannot be enabled (no IIO buffer support, or the device
+is busy), the engine falls back to one-shot reads of in_voltageN_raw.
+The first of those reads is discarded, then samples reads are averaged.
+A read right after start() (or after addChannel() restarted capture)
+waits up to FIRST_SCAN_TIMEOUT for the first scan, then tries a one-shot
+read rather than returning 0.
+
+Basic Implementation as follows:
+
+1) adc = ADCCapture.shared() (one engine per process, the ADC has one buffer)
+2) adc.addChannel("AIN1") for every pin used
+3) adc.start()
+4) adc.read("AIN1", 16)
+
+FakeIIODevice builds the same sysfs / character device layout in a
+directory, for running the engine off the Beaglebone:
+
+    fake = FakeIIODevice(tempfile.mkdtemp())
+    adc = ADCCapture(fake.sysfsPath, fake.devPath)
+    fake.push({0: [2048] * 64})
+
+EE Team of Husky Robotics
+"""
+import os
+import time
+import array
+import struct
+import threading
+
+IIO_SYSFS_PATH = "/sys/bus/iio/devices/iio:device0"
+IIO_DEV_PATH = "/dev/iio:device0"
+MAX_VALUE = 4095  # 12-bit ADC
+
+
+AIN_PINS = {
+    "P9_39": 0, "P9_40": 1, "P9_37": 2, "P9_38": 3,
+    "P9_33": 4, "P9_36": 5, "P9_35": 6
+}
+
+
+# Returns the channel number of "AIN3" / "P9_38" style pin names
+def channelOf(pin):
+    pin = str(pin)
+    if pin in AIN_PINS:
+        return AIN_PINS[pin]
+    if pin.startswith("AIN"):
+        return int(pin[3:])
+    return int(pin)
+
+
+class ADCCapture:
+
+    RING_SIZE = 1024      # samples kept per channel
+    BUFFER_LENGTH = 1024  # scans the kernel buffers between polls
+    POLL_PERIOD = 0.005   # seconds between bulk reads
+    FIRST_SCAN_TIMEOUT = 0.05  # seconds a read waits for the first scan
+
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    # Returns the engine shared by every sensor in this process
+    @classmethod
+    def shared(cls):
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = ADCCapture()
+            return cls._shared
+
+    def __init__(self, sysfsPath=IIO_SYSFS_PATH, devPath=IIO_DEV_PATH):
+        self._sysfsPath = sysfsPath
+        self._devPath = devPath
+        self._channels = []  # enabled channel numbers, in scan order
+        self._rings = {}     # channel -> array of the newest samples
+        self._count = 0      # scans stored since start
+        self._lastTime = 0.0  # time of the newest scan
+        self._lock = threading.Lock()
+        self._fd = None
+        self._buffered = False
+        self._running = False
+        self._thread = None
+        self._stopEvent = threading.Event()
+        self._firstScan = threading.Event()  # set once a scan is stored
+        self._scanFormat = None
+        self._overruns = 0
+
+    # Adds pin to the captured channels, restarting capture if running
+    def addChannel(self, pin):
+        channel = channelOf(pin)
+        if channel in self._channels:
+            return
+        running = self._running
+        if running:
+            self.stop()
+        self._channels = sorted(self._channels + [channel])
+        if running:
+            self.start()
+
+    # Starts buffered capture, or one-shot reads if the buffer is unavailable
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        with self._lock:
+            self._rings = dict((channel, array.array("H", [0] * self.RING_SIZE))
+                               for channel in self._channels)
+            self._count = 0
+            self._firstScan.clear()
+        try:
+            self._enableBuffer()
+            self._buffered = True
+        except (IOError, OSError):
+            self._disableBuffer()
+            self._buffered = False
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name="ADCCapture")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._stopEvent.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        if self._buffered:
+            self._disableBuffer()
+        self._buffered = False
+
+    # Returns whether samples come from the IIO buffer (not one-shot reads)
+    def isBuffered(self):
+        return self._buffered
+
+    # Returns the average of the newest samples of pin, from 0.0 to 1.0
+    def read(self, pin, samples=1):
+        return self.readRaw(pin, samples) / float(MAX_VALUE)
+
+    # Returns (average from 0.0 to 1.0, time of the newest sample)
+    def readAverage(self, pin, samples=1):
+        raw, timestamp = self._average(channelOf(pin), samples)
+        return raw / float(MAX_VALUE), timestamp
+
+    # Returns the average of the newest samples of pin in raw counts
+    def readRaw(self, pin, samples=1):
+        return self._average(channelOf(pin), samples)[0]
+
+    # Returns the newest count averages of factor consecutive samples
+    # each, oldest first, as values from 0.0 to 1.0
+    def decimate(self, pin, factor, count):
+        channel = channelOf(pin)
+        if not self._buffered:
+            return [self._oneShot(channel, factor) / float(MAX_VALUE) for i in range(count)]
+        if not self._waitForScan():
+            value = self._firstOneShot(channel, factor)
+            return [] if value is None else [value / float(MAX_VALUE)]
+        with self._lock:
+            ring = self._rings[channel]
+            available = min(self._count, self.RING_SIZE) // factor
+            count = min(count, available)
+            end = self._count
+            values = []
+            for block in range(count, 0, -1):
+                start = end - block * factor
+                total = 0
+                for i in range(start, start + factor):
+                    total += ring[i % self.RING_SIZE]
+                values.append(total / float(factor * MAX_VALUE))
+        return values
+
+    # Returns { "buffered", "channels", "scans", "overruns" }
+    def getStats(self):
+        return {
+            "buffered": self._buffered,
+            "channels": list(self._channels),
+            "scans": self._count,
+            "overruns": self._overruns
+        }
+
+    # Meant for internal use only
+    def _average(self, channel, samples):
+        if not self._buffered:
+            return self._oneShot(channel, samples), time.time()
+        if not self._waitForScan():
+            value = self._firstOneShot(channel, samples)
+            if value is None:
+                return 0.0, 0.0
+            return value, time.time()
+        with self._lock:
+            ring = self._rings[channel]
+            count = min(samples, self._count, self.RING_SIZE)
+            end = self._count
+            total = 0
+            for i in range(end - count, end):
+                total += ring[i % self.RING_SIZE]
+            return total / float(count), self._lastTime
+
+    # Returns whether a scan has been stored, waiting briefly for the
+    # first one after start()
+    # Meant for internal use only
+    def _waitForScan(self):
+        return self._count > 0 or self._firstScan.wait(self.FIRST_SCAN_TIMEOUT)
+
+    # One-shot read while the buffer is enabled but still empty, None
+    # if the driver refuses it (busy with the buffer)
+    # Meant for internal use only
+    def _firstOneShot(self, channel, samples):
+        try:
+            return self._oneShot(channel, samples)
+        except (IOError, OSError, ValueError):
+            return None
+
+    # Meant for internal use only
+    def _oneShot(self, channel, samples):
+        path = self._sysfsPath + "/in_voltage" + str(channel) + "_raw"
+        with open(path, "r") as raw:
+            raw.read()  # The first conversion after switching channels can be stale
+            total = 0
+            for i in range(max(samples, 1)):
+                raw.seek(0)
+                total += int(raw.read())
+        return total / float(max(samples, 1))
+
+    # Meant for internal use only
+    def _enableBuffer(self):
+        scan = self._sysfsPath + "/scan_elements/"
+        self._disableBuffer()
+        for name in os.listdir(scan):
+            if name.endswith("_en"):
+                self._write(scan + name, "0")
+        storage = []
+        for channel in self._channels:
+            prefix = scan + "in_voltage" + str(channel)
+            self._write(prefix + "_en", "1")
+            storage.append(self._storageFormat(self._readFile(prefix + "_type")))
+        self._scanFormat = "<" + "".join(storage)
+        self._write(self._sysfsPath + "/buffer/length", str(self.BUFFER_LENGTH))
+        self._write(self._sysfsPath + "/buffer/enable", "1")
+        self._fd = os.open(self._devPath, os.O_RDONLY | os.O_NONBLOCK)
+
+    # Meant for internal use only
+    def _disableBuffer(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        try:
+            self._write(self._sysfsPath + "/buffer/enable", "0")
+        except (IOError, OSError):
+            pass
+
+    # Struct code for a scan element type such as "le:u12/16>>0"
+    # Meant for internal use only
+    def _storageFormat(self, elementType):
+        storage = int(elementType.split("/")[1].split(">>")[0])
+        if not elementType.startswith("le:") or storage != 16:
+            raise IOError("Unsupported scan element type " + elementType)
+        return "H"
+
+    # Drains the kernel buffer into the rings every POLL_PERIOD
+    # Meant for internal use only
+    def _run(self):
+        scanSize = struct.calcsize(self._scanFormat)
+        chunk = scanSize * self.BUFFER_LENGTH
+        channels = len(self._channels)
+        leftover = b""
+        while not self._stopEvent.is_set():
+            try:
+                data = os.read(self._fd, chunk)  # One bulk read of every scan waiting
+            except OSError:
+                data = b""  # EAGAIN, nothing captured yet
+            if data:
+                if len(data) >= chunk:
+                    self._overruns += 1  # The kernel buffer was full, samples were lost
+                data = leftover + data
+                scans = len(data) // scanSize
+                leftover = data[scans * scanSize:]
+                self._store(array.array("H", data[:scans * scanSize]), scans, channels)
+            self._stopEvent.wait(self.POLL_PERIOD)
+
+    # Meant for internal use only
+    def _store(self, values, scans, channels):
+        now = time.time()
+        with self._lock:
+            count = self._count
+            for position, channel in enumerate(self._channels):
+                ring = self._rings[channel]
+                index = count
+                for value in values[position::channels]:
+                    ring[index % self.RING_SIZE] = value & MAX_VALUE
+                    index += 1
+            self._count = count + scans
+            self._lastTime = now
+        if scans:
+            self._firstScan.set()
+
+    # Meant for internal use only
+    def _write(self, path, value):
+        with open(path, "w") as target:
+            target.write(value)
+
+    # Meant for internal use only
+    def _readFile(self, path):
+        with open(path, "r") as source:
+            return source.read().strip()
+
+
+class FakeIIODevice:
+
+    # Creates the IIO sysfs files and a character device stand-in
+    # (a plain file) for channels in path
+    def __init__(self, path, channels=range(7)):
+        self.sysfsPath = os.path.join(path, "iio:device0")
+        self.devPath = os.path.join(path, "dev_iio:device0")
+        self._channels = list(channels)
+        os.makedirs(os.path.join(self.sysfsPath, "scan_elements"))
+        os.makedirs(os.path.join(self.sysfsPath, "buffer"))
+        for channel in self._channels:
+            prefix = os.path.join(self.sysfsPath, "scan_elements", "in_voltage" + str(channel))
+            self._write(prefix + "_en", "0")
+            self._write(prefix + "_index", str(channel))
+            self._write(prefix + "_type", "le:u12/16>>0")
+            self.setOneShot(channel, 0)
+        self._write(os.path.join(self.sysfsPath, "buffer", "length"), "0")
+        self._write(os.path.join(self.sysfsPath, "buffer", "enable"), "0")
+        self._write(self.devPath, "")
+
+    # Appends scans for { channel: [raw values] } to the device, for
+    # the channels the engine enabled
+    def push(self, samples):
+        enabled = [channel for channel in self._channels if self._isEnabled(channel)]
+        length = min(len(samples[channel]) for channel in enabled)
+        data = array.array("H")
+        for i in range(length):
+            for channel in enabled:
+                data.append(samples[channel][i])
+        with open(self.devPath, "ab") as device:
+            device.write(data.tobytes() if hasattr(data, "tobytes") else data.tostring())
+
+    # Sets the value in_voltageN_raw returns
+    def setOneShot(self, channel, value):
+        self._write(os.path.join(self.sysfsPath, "in_voltage" + str(channel) + "_raw"), str(value))
+
+    # Meant for internal use only
+    def _isEnabled(self, channel):
+        path = os.path.join(self.sysfsPath, "scan_elements", "in_voltage" + str(channel) + "_en")
+        with open(path, "r") as enabled:
+            return enabled.read().strip() == "1"
+
+    # Meant for internal use only
+    def _write(self, path, value):
+        with open(path, "w") as target:
+            target.write(value)
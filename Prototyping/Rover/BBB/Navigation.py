@@ -2,7 +2,7 @@ import math
 import Utils
 import mag as MAG
 import gps as GPS
-import Adafruit_BBIO.ADC as ADC
+from ADCCapture import ADCCapture
 
 class Navigation:
     """
@@ -19,7 +19,12 @@ class Navigation:
             respectively.
         POT_TOL (float): Currently unused. Maybe some kind of tolerance value.
             Maybe we should remove this?
+        POT_SAMPLES (int): Number of buffered ADC samples averaged per
+            potentiometer reading (see ADCCapture.py).
     """
+
+    POT_SAMPLES = 16
+
     def __init__(self, pot_left, pot_middle, pot_right, pot_tol, pot_pin):
         """
         Args:
@@ -40,12 +45,15 @@ class Navigation:
         self.POT_RIGHT = float(pot_right)
         self.POT_MIDDLE = float(pot_middle)
         self.POT_TOL = float(pot_tol)
+        self.adc = ADCCapture.shared()
+        self.adc.addChannel(pot_pin)
+        self.adc.start()
 
 
     # returns a float of how far from straight the potentiomer is. > 0 for Right, < 0 for left
     # returns -1 if error
     def readPot(self):
-        result = self.POT_MIDDLE - ADC.read(self.POT_PIN)
+        result = self.POT_MIDDLE - self.adc.read(self.POT_PIN, self.POT_SAMPLES)
         if result > self.POT_MIDDLE - self.POT_RIGHT or result < self.POT_MIDDLE - self.POT_LEFT:
             return -1
         return result
@@ -1,5 +1,6 @@
 import Adafruit_BBIO.ADC as ADC
 import Adafruit_PCA9685
+from I2CArbiter import I2CArbiter
 import PID
 import math
 import Servo_Sweep
@@ -56,7 +57,8 @@ class Robot(object):
 
         if is_using_big_motor == "0":
             # setup i2c to motorshield
-            pwm = Adafruit_PCA9685.PCA9685(address=0x60, busnum=1)
+            pwm = Adafruit_PCA9685.PCA9685(address=0x60, busnum=1, i2c_interface=I2CArbiter.get)
+            I2CArbiter.get(1).setPriority(0x60, I2CArbiter.PRIORITY_MOTOR)  # Motor writes go first
             pwm.set_pwm_freq(60)
             self.pot_pid = PID.PID(-0.1, 0, 0) #TODO Adjust
             self.nav = Navigation.Navigation(0.765555, 0.552777, 0.348333, 0.001, "AIN2")
@@ -1,14 +1,24 @@
 import serial
 import Adafruit_BBIO.UART as UART
 import Adafruit_BBIO.ADC as ADC
+from ADCCapture import ADCCapture
+from Filters import RunningMedian
 from time import sleep
 UART.setup("UART1")
 ser = serial.Serial('/dev/ttyO1', 9600)
 
 
 class Sonar:
+
+    OVERSAMPLE = 8  # ADC samples averaged per reading
+    MEDIAN_SIZE = 5  # readings in the median used for distances
+
     def __init__(self):
         ADC.setup()
+        self.adc = ADCCapture.shared()
+        self.adc.addChannel("AIN6")
+        self.adc.start()
+        self.median = RunningMedian(self.MEDIAN_SIZE)  # Rejects single echo spikes
         self.maxAnaVal = 0.8
         reader = open("SonarCalibrationData.txt", "r")
         values = reader.readline().split()
@@ -18,16 +28,19 @@ class Sonar:
 
 
     def readAna(self): # Get raw analog value from sensor
-        readVal = ADC.read("AIN6")
+        readVal = self.adc.read("AIN6", self.OVERSAMPLE)
         return readVal
 
+    def readFiltered(self): # Median of the latest analog readings
+        return self.median.filter(self.adc.read("AIN6", self.OVERSAMPLE))
+
     def readDisInch(self):  # Calculates distance in inches
-        readVal = ADC.read("AIN6")
+        readVal = self.readFiltered()
         readVal = (readVal * self.slope) + self.intersecpt # Calculated through linear best fit
         return readVal
 
     def readDisCm(self): # Calculates distance in centimeters
-        readVal = ADC.read("AIN6")
+        readVal = self.readFiltered()
         readVal = ((readVal * self.slope) - self.intersecpt) * 2.54  # Calculated through linear best fit
         return readVal
 
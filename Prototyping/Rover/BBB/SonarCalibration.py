@@ -1,6 +1,7 @@
 import serial
 import Adafruit_BBIO.UART as UART
 import Adafruit_BBIO.ADC as ADC
+from ADCCapture import ADCCapture
 from time import sleep
 UART.setup("UART1")
 ser = serial.Serial('/dev/ttyO1', 9600)
@@ -27,21 +28,18 @@ class SonarCalibration:
         self.count = 0.0
 
         self.analogPin = "AIN6"
+        self.adc = ADCCapture.shared()
+        self.adc.addChannel(self.analogPin)
+        self.adc.start()
 
     def readAna(self): # Get raw analog value from sensor
-        readVal = ADC.read("AIN6")
+        readVal = self.adc.read(self.analogPin)
         print(readVal)
 
     def addPoint(self, distance):
 
-        # First get the average reading from 10 analog readings
-        count = 0
-        total = 0.0
-        while count < 10:
-            readVal = ADC.read(self.analogPin)
-            total += readVal
-            count += 1
-        analogVal = total / 10.0
+        # First get the average reading from the newest 64 analog samples
+        analogVal = self.adc.read(self.analogPin, 64)
 
         # Add to totals
         self.xsum += analogVal
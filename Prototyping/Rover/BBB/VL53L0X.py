@@ -24,7 +24,7 @@
 
 import time
 from ctypes import *
-import smbus
+from I2CArbiter import I2CArbiter
 
 VL53L0X_GOOD_ACCURACY_MODE      = 0   # Good Accuracy mode
 VL53L0X_BETTER_ACCURACY_MODE    = 1   # Better Accuracy mode
@@ -32,7 +32,8 @@ VL53L0X_BEST_ACCURACY_MODE      = 2   # Best Accuracy mode
 VL53L0X_LONG_RANGE_MODE         = 3   # Longe Range mode
 VL53L0X_HIGH_SPEED_MODE         = 4   # High Speed mode
 
-i2cbus = smbus.SMBus(1)
+# Shared with the IMU and the motor shield on bus 1, see I2CArbiter.py
+i2cbus = I2CArbiter.get(1)
 
 # i2c bus read callback
 def i2c_read(address, reg, data_p, length):
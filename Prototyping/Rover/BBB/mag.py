@@ -1,5 +1,7 @@
 # from Adafruit_I2C import Adafruit_I2C
 import BNO055
+from I2CArbiter import I2CArbiter
+import Filters
 import sys
 import threading
 import math
@@ -20,7 +22,7 @@ class Magnetometer:
             updates current_heading.
     """
     def __init__(self):
-        self.bno055 = BNO055.BNO055()
+        self.bno055 = BNO055.BNO055(i2c_interface=I2CArbiter.get)
         if not self.bno055.begin():
             print 'Cannot initialize BNO055'
             sys.exit()
@@ -82,51 +84,25 @@ class _MagnetometerUpdaterThread(threading.Thread):
         daemon (bool): Set to True so the thread is treated by the
             `threading.Thread` class as a daemon thread.
         magnetometer (Magnetometer): The Magnetometer object that is updated.
-        heading_history (list of float): A list of recent heading readings (in
-            degrees), with the latest reading at the end of the list. When the
-            length exceeds heading_history_max_length, earlier readings are
-            deleted.
-        heading_history_max_length (int): The maximum length of
-            heading_history.
+        heading_filter (Filters.CircularMean): Circular mean of the recent
+            heading readings (in radians), keeps running sin / cos sums so an
+            update is O(1).
+        heading_history_max_length (int): The number of readings averaged.
         update_interval (float): Time interval (in seconds) between each update.
     """
     def __init__(self, magnetometer):
         super(_MagnetometerUpdaterThread, self).__init__()
         self.daemon = True
         self.magnetometer = magnetometer
-        self.heading_history = []
         self.heading_history_max_length = 10
+        self.heading_filter = Filters.CircularMean(self.heading_history_max_length)
         self.update_interval = 0.1
 
     def run(self):
         while True:
             magnetometer = self.magnetometer.bno055.read_magnetometer()
             unadjusted_heading = math.atan2(magnetometer[1], magnetometer[0])
-            self.heading_history.append(unadjusted_heading)
-            if len(self.heading_history) > self.heading_history_max_length:
-                del self.heading_history[0]
-            adjusted_heading = self.average_headings(self.heading_history)
+            adjusted_heading = self.heading_filter.filter(unadjusted_heading)
             with self.magnetometer.lock:
                 self.magnetometer.current_heading = math.degrees(adjusted_heading) % 360.0
             time.sleep(self.update_interval)
-
-    @staticmethod
-    def average_headings(headings):
-        """
-        Calculates the average value of a list of headings.
-        Equivalent to finding the unit vectors in the direction of each
-        heading, calculating the average vector, and returning the heading of
-        that vector.
-
-        Args:
-            headings (list of float): The headings in radians.
-
-        Returns:
-            float: The average heading in radians.
-        """
-        x_sum = 0.0
-        y_sum = 0.0
-        for theta in headings:
-            x_sum += math.cos(theta)
-            y_sum += math.sin(theta)
-        return math.atan2(y_sum, x_sum)
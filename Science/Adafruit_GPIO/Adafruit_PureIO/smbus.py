@@ -41,6 +41,8 @@ I2C_RDWR              = 0x0707  # Combined R/W transfer (one STOP only)
 I2C_PEC               = 0x0708  # != 0 to use PEC with SMBus
 I2C_SMBUS             = 0x0720  # SMBus transfer
 
+I2C_RDWR_IOCTL_MAX_MSGS = 42    # Most messages the kernel accepts in one I2C_RDWR
+
 
 # ctypes versions of I2C structs defined by kernel.
 class i2c_msg(Structure):
@@ -93,6 +95,11 @@ class SMBus(object):
         called to open the bus.
         """
         self._device = None
+        # Reused by transfer(), grown as needed.
+        self._transfer_buffer = None
+        self._transfer_cbuffer = None
+        self._transfer_msgs = None
+        self._transfer_request = None
         if bus is not None:
             self.open(bus)
 
@@ -273,6 +280,82 @@ class SMBus(object):
         self._select_device(addr)
         self._device.write(data)
 
+    def transfer(self, operations):
+        """Perform a list of operations in one combined I2C_RDWR transaction
+        (one ioctl, repeated starts between messages, a single STOP at the end).
+        Each operation is a tuple (addr, write, read_len): write is a bytes,
+        bytearray or list of byte values to send to addr (None or empty to
+        send nothing) and read_len is the number of bytes to then read back
+        from addr (0 to read nothing).  For a register read write is the
+        register number, e.g. (addr, [reg], 6).
+
+        Returns a list with one entry per operation: a memoryview of the bytes
+        read, or None for operations that read nothing.  The memoryviews point
+        into a buffer that is reused by the next transfer() call, copy them
+        (e.g. bytearray(view)) to keep the data.
+        """
+        assert self._device is not None, 'Bus must be opened before operations are made against it!'
+        count = 0
+        size = 0
+        for addr, write, read_len in operations:
+            if write:
+                count += 1
+                size += len(write)
+            if read_len:
+                count += 1
+                size += read_len
+        if count == 0:
+            return [None]*len(operations)
+        if count > I2C_RDWR_IOCTL_MAX_MSGS:
+            raise ValueError('Too many I2C messages in one transfer: {0} (max {1})'.format(
+                count, I2C_RDWR_IOCTL_MAX_MSGS))
+        self._reserve_transfer(count, size)
+        buf = self._transfer_buffer
+        base = addressof(self._transfer_cbuffer)
+        msgs = self._transfer_msgs
+        reads = []
+        index = 0
+        offset = 0
+        for addr, write, read_len in operations:
+            if write:
+                length = len(write)
+                buf[offset:offset+length] = write
+                msg = msgs[index]
+                msg.addr  = addr & 0x7F
+                msg.flags = 0
+                msg.len   = length
+                msg.buf   = cast(base + offset, POINTER(c_uint8))
+                index += 1
+                offset += length
+            if read_len:
+                msg = msgs[index]
+                msg.addr  = addr & 0x7F
+                msg.flags = I2C_M_RD
+                msg.len   = read_len
+                msg.buf   = cast(base + offset, POINTER(c_uint8))
+                reads.append((offset, read_len))
+                index += 1
+                offset += read_len
+            else:
+                reads.append(None)
+        self._transfer_request.nmsgs = count
+        ioctl(self._device.fileno(), I2C_RDWR, self._transfer_request)
+        view = memoryview(buf)
+        return [view[r[0]:r[0]+r[1]] if r is not None else None for r in reads]
+
+    def _reserve_transfer(self, count, size):
+        """Make sure the reused transfer() buffers hold count messages and
+        size bytes of data."""
+        if self._transfer_msgs is None or len(self._transfer_msgs) < count:
+            self._transfer_msgs = (i2c_msg*max(count, 4))()
+            self._transfer_request = i2c_rdwr_ioctl_data()
+            self._transfer_request.msgs = self._transfer_msgs
+        if self._transfer_buffer is None or len(self._transfer_buffer) < size:
+            # A new buffer instead of resizing, views of the old one may
+            # still be held by the caller.
+            self._transfer_buffer = bytearray(max(size, 32))
+            self._transfer_cbuffer = (c_uint8*len(self._transfer_buffer)).from_buffer(self._transfer_buffer)
+
     def process_call(self, addr, cmd, val):
         """Perform a smbus process call by writing a word (2 byte) value to
         the specified register of the device, and then reading a word of response
@@ -198,3 +198,52 @@ class Device(object):
         """Read a signed 16-bit value from the specified register, in big
         endian byte order."""
         return self.readS16(register, little_endian=False)
+
+    def transfer(self, operations):
+        """Perform a list of (addr, write, read_len) operations in one combined
+        I2C transaction, see Adafruit_PureIO.smbus.SMBus.transfer.  An addr of
+        None means this device.  Returns one memoryview of the bytes read (or
+        None) per operation; the views are only valid until the next transfer.
+        Buses without transfer() get one call per operation instead.
+        """
+        operations = [(self._address if addr is None else addr, write, read_len)
+                      for addr, write, read_len in operations]
+        if hasattr(self._bus, 'transfer'):
+            results = self._bus.transfer(operations)
+        else:
+            results = [self._transfer_one(addr, write, read_len)
+                       for addr, write, read_len in operations]
+        self._logger.debug("Transferred %d operations", len(operations))
+        return results
+
+    def readRegisters(self, blocks):
+        """Read several (register, length) blocks of this device in one
+        transaction.  Returns a list of bytearrays, one per block."""
+        results = self.transfer([(None, [register & 0xFF], length)
+                                 for register, length in blocks])
+        return [bytearray(result) for result in results]
+
+    def writeRegisters(self, writes):
+        """Write several (register, data) pairs to this device in one
+        transaction, data being a list of byte values (or a single byte).
+        Each pair is its own message, so the device does not need register
+        auto-increment between pairs."""
+        operations = []
+        for register, data in writes:
+            if isinstance(data, int):
+                data = [data]
+            operations.append((None, [register & 0xFF] + [value & 0xFF for value in data], 0))
+        self.transfer(operations)
+
+    def _transfer_one(self, addr, write, read_len):
+        """Fallback for transfer() on buses that only have the SMBus calls."""
+        write = bytearray(write) if write else bytearray()
+        if read_len and len(write) == 1:
+            return memoryview(bytearray(self._bus.read_i2c_block_data(addr, write[0], read_len)))
+        if len(write) == 1:
+            self._bus.write_byte(addr, write[0])
+        elif write:
+            self._bus.write_i2c_block_data(addr, write[0], write[1:])
+        if not read_len:
+            return None
+        return memoryview(bytearray([self._bus.read_byte(addr) & 0xFF for i in range(read_len)]))
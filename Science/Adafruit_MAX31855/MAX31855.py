@@ -22,10 +22,136 @@ import logging
 import sys
 import math
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import Adafruit_GPIO as GPIO
 import Adafruit_GPIO.SPI as SPI
 
 
+# Cold junction temperature (C) -> type K voltage (mV), NIST ITS-90
+# 0 to 1372 C, lowest order first.  Plus the exponential term
+# A0 * exp(A1 * (t - A2)^2).
+COLD_JUNCTION_COEFFICIENTS = (
+    -0.176004136860E-01, 0.389212049750E-01, 0.185587700320E-04,
+    -0.994575928740E-07, 0.318409457190E-09, -0.560728448890E-12,
+    0.560750590590E-15, -0.320207200030E-18, 0.971511471520E-22,
+    -0.121047212750E-25)
+COLD_JUNCTION_EXPONENTIAL = (0.118597600000E+00, -0.118343200000E-03, 0.126968600000E+03)
+
+# Type K voltage (mV) -> temperature (C), NIST ITS-90 inverse
+# coefficients, lowest order first, for voltages below each upper bound.
+INVERSE_RANGES = (
+    (0.0, (0.0000000E+00, 2.5173462E+01, -1.1662878E+00, -1.0833638E+00,
+           -8.9773540E-01, -3.7342377E-01, -8.6632643E-02, -1.0450598E-02,
+           -5.1920577E-04)),
+    (20.644, (0.000000E+00, 2.508355E+01, 7.860106E-02, -2.503131E-01,
+              8.315270E-02, -1.228034E-02, 9.804036E-04, -4.413030E-05,
+              1.057734E-06, -1.052755E-08)),
+    (54.886, (-1.318058E+02, 4.830222E+01, -1.646031E+00, 5.464731E-02,
+              -9.650715E-04, 8.802193E-06, -3.110810E-08)))
+
+MIN_VOLTAGE = -5.891  # mV, -200 C
+
+# MAX31855 output, mV per degree C of hot/cold junction difference
+SENSITIVITY = 0.041276
+
+
+def thermocoupleC(raw):
+    """Return the thermocouple temperature in degrees celsius from a raw
+    32-bit word.  Works on an int or a NumPy array of words; fault bits are
+    not checked.
+    """
+    return _signed((raw >> 18) & 0x3FFF, 14) * 0.25
+
+
+def internalC(raw):
+    """Return the internal (cold junction) temperature in degrees celsius
+    from a raw 32-bit word.  Works on an int or a NumPy array of words.
+    """
+    return _signed((raw >> 4) & 0xFFF, 12) * 0.0625
+
+
+def decode(raw):
+    """Decode every field of one raw 32-bit word into a dictionary:
+    raw, tempC (NaN on a fault), internalC, openCircuit, shortGND, shortVCC,
+    fault and none (True when no fault bit is set).
+    """
+    faults = raw & 0x10007
+    return {
+        'raw': raw,
+        'tempC': float('NaN') if raw & 0x7 else thermocoupleC(raw),
+        'internalC': internalC(raw),
+        'openCircuit': (raw & (1 << 0)) > 0,
+        'shortGND': (raw & (1 << 1)) > 0,
+        'shortVCC': (raw & (1 << 2)) > 0,
+        'fault': (raw & (1 << 16)) > 0,
+        'none': faults == 0
+    }
+
+
+def _signed(value, bits):
+    # 2's compliment, done with arithmetic so it also works on arrays
+    # (which are made signed first, logged words are usually uint32).
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        value = value.astype(numpy.int64)
+    return value - ((value & (1 << (bits - 1))) << 1)
+
+
+def _horner(coefficients, x):
+    # Evaluates the polynomial with lowest order coefficients first.
+    result = coefficients[-1]
+    for coefficient in coefficients[-2::-1]:
+        result = result * x + coefficient
+    return result
+
+
+def linearize(tempC, coldJunctionC):
+    """Return the NIST-linearized thermocouple temperature in degrees
+    celsius from the MAX31855 thermocouple and internal temperatures.
+    Both may be floats or NumPy arrays (e.g. of logged readings).  Readings
+    outside the type K range give NaN.
+    """
+    thermocoupleVoltage = (tempC - coldJunctionC) * SENSITIVITY
+    a0, a1, a2 = COLD_JUNCTION_EXPONENTIAL
+    if numpy is not None and isinstance(coldJunctionC, numpy.ndarray):
+        exp = numpy.exp
+    else:
+        exp = math.exp
+    coldJunctionVoltage = (_horner(COLD_JUNCTION_COEFFICIENTS, coldJunctionC) +
+                           a0 * exp(a1 * (coldJunctionC - a2) ** 2))
+    # cold junction voltage + thermocoupleVoltage, the NIST ranges apply to the sum
+    voltageSum = thermocoupleVoltage + coldJunctionVoltage
+    if numpy is not None and isinstance(voltageSum, numpy.ndarray):
+        result = numpy.full(voltageSum.shape, numpy.nan)
+        remaining = voltageSum >= MIN_VOLTAGE  # also False for NaN
+        for upper, coefficients in INVERSE_RANGES:
+            selected = remaining & (voltageSum < upper)
+            result[selected] = _horner(coefficients, voltageSum[selected])
+            remaining &= ~selected
+        return result
+    if not voltageSum >= MIN_VOLTAGE:
+        return float('NaN')
+    for upper, coefficients in INVERSE_RANGES:
+        if voltageSum < upper:
+            return _horner(coefficients, voltageSum)
+    return float('NaN')
+
+
+def linearizeRaw(raw):
+    """Return the NIST-linearized temperature from raw 32-bit words, an int
+    or a NumPy array of logged words.  Words with a fault give NaN.
+    """
+    temp = linearize(thermocoupleC(raw), internalC(raw))
+    if numpy is not None and isinstance(raw, numpy.ndarray):
+        return numpy.where(raw & 0x7, numpy.nan, temp)
+    if raw & 0x7:
+        return float('NaN')
+    return temp
+
+
 class MAX31855(object):
     """Class to represent an Adafruit MAX31855 thermocouple temperature
     measurement board.
@@ -54,119 +180,34 @@ class MAX31855(object):
         self._spi.set_mode(0)
         self._spi.set_bit_order(SPI.MSBFIRST)
 
+    def readSnapshot(self):
+        """Read the device once and return every field decoded from that one
+        32-bit word, see decode().  Use this instead of calling readTempC(),
+        readInternalC() and readState() in a row, which reads the device
+        three times and can mix values from different conversions.
+        """
+        return decode(self._read32())
+
     def readInternalC(self):
         """Return internal temperature value in degrees celsius."""
-        v = self._read32()
-        # Ignore bottom 4 bits of thermocouple data.
-        v >>= 4
-        # Grab bottom 11 bits as internal temperature data.
-        internal = v & 0x7FF
-        if v & 0x800:
-            # Negative value, take 2's compliment. Compute this with subtraction
-            # because python is a little odd about handling signed/unsigned.
-            internal -= 4096
-        # Scale by 0.0625 degrees C per bit and return value.
-        return internal * 0.0625
+        return internalC(self._read32())
 
     def readTempC(self):
         """Return the thermocouple temperature value in degrees celsius."""
-        v = self._read32()
-        # Check for error reading value.
-        if v & 0x7:
-            return float('NaN')
-        # Check if signed bit is set.
-        if v & 0x80000000:
-            # Negative value, take 2's compliment. Compute this with subtraction
-            # because python is a little odd about handling signed/unsigned.
-            v >>= 18
-            v -= 16384
-        else:
-            # Positive value, just shift the bits to get the value.
-            v >>= 18
-        # Scale by 0.25 degrees C per bit and return value.
-        return v * 0.25
+        return decode(self._read32())['tempC']
 
     def readState(self):
         """Return dictionary containing fault codes and hardware problems
         """
-        v = self._read32()
-        return {
-            'openCircuit': (v & (1 << 0)) > 0,
-            'shortGND': (v & (1 << 1)) > 0,
-            'shortVCC': (v & (1 << 2)) > 0,
-            'fault': (v & (1 << 16)) > 0,
-            'none' : v & 0x10007 == 0  # Returns no status bit is indicated
-        }
+        snapshot = decode(self._read32())
+        return dict((key, snapshot[key]) for key in ('openCircuit', 'shortGND', 'shortVCC', 'fault', 'none'))
 
     def readLinearizedTempC(self):
         """Return the NIST-linearized thermocouple temperature value in degrees celsius.
         See https://learn.adafruit.com/calibrating-sensors/maxim-31855-linearization for more info.
         """
-        # MAX31855 thermocouple voltage reading in mV
-        thermocoupleVoltage = (self.readTempC() - self.readInternalC()) * 0.041276
-        # MAX31855 cold junction voltage reading in mV
-        coldJunctionTemperature = self.readInternalC()
-        coldJunctionVoltage = (-0.176004136860E-01 +
-            0.389212049750E-01  * coldJunctionTemperature +
-            0.185587700320E-04  * math.pow(coldJunctionTemperature, 2.0) +
-            -0.994575928740E-07 * math.pow(coldJunctionTemperature, 3.0) +
-            0.318409457190E-09  * math.pow(coldJunctionTemperature, 4.0) +
-            -0.560728448890E-12 * math.pow(coldJunctionTemperature, 5.0) +
-            0.560750590590E-15  * math.pow(coldJunctionTemperature, 6.0) +
-            -0.320207200030E-18 * math.pow(coldJunctionTemperature, 7.0) +
-            0.971511471520E-22  * math.pow(coldJunctionTemperature, 8.0) +
-            -0.121047212750E-25 * math.pow(coldJunctionTemperature, 9.0) +
-            0.118597600000E+00  * math.exp(-0.118343200000E-03 * math.pow((coldJunctionTemperature-0.126968600000E+03), 2.0)))
-        # cold junction voltage + thermocouple voltage
-        voltageSum = thermocoupleVoltage + coldJunctionVoltage
-        # calculate corrected temperature reading based on coefficients for 3 different ranges
-        # float b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10;
-        if thermocoupleVoltage < 0:
-            b0 = 0.0000000E+00
-            b1 = 2.5173462E+01
-            b2 = -1.1662878E+00
-            b3 = -1.0833638E+00
-            b4 = -8.9773540E-01
-            b5 = -3.7342377E-01
-            b6 = -8.6632643E-02
-            b7 = -1.0450598E-02
-            b8 = -5.1920577E-04
-            b9 = 0.0000000E+00
-        elif thermocoupleVoltage < 20.644:
-            b0 = 0.000000E+00
-            b1 = 2.508355E+01
-            b2 = 7.860106E-02
-            b3 = -2.503131E-01
-            b4 = 8.315270E-02
-            b5 = -1.228034E-02
-            b6 = 9.804036E-04
-            b7 = -4.413030E-05
-            b8 = 1.057734E-06
-            b9 = -1.052755E-08
-        elif thermocoupleVoltage < 54.886:
-            b0 = -1.318058E+02
-            b1 = 4.830222E+01
-            b2 = -1.646031E+00
-            b3 = 5.464731E-02
-            b4 = -9.650715E-04
-            b5 = 8.802193E-06
-            b6 = -3.110810E-08
-            b7 = 0.000000E+00
-            b8 = 0.000000E+00
-            b9 = 0.000000E+00
-        else:
-            # TODO: handle error - out of range
-            return 0
-        return (b0 +
-            b1 * voltageSum +
-            b2 * pow(voltageSum, 2.0) +
-            b3 * pow(voltageSum, 3.0) +
-            b4 * pow(voltageSum, 4.0) +
-            b5 * pow(voltageSum, 5.0) +
-            b6 * pow(voltageSum, 6.0) +
-            b7 * pow(voltageSum, 7.0) +
-            b8 * pow(voltageSum, 8.0) +
-            b9 * pow(voltageSum, 9.0))
+        snapshot = self.readSnapshot()
+        return linearize(snapshot['tempC'], snapshot['internalC'])
 
     def _read32(self):
         # Read 32 bits from the SPI bus.
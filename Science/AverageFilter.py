@@ -8,10 +8,14 @@ add to the average.
 To Reset the average filter, use reset()
 and supply new values in filter()
 
+Given a size, only the last size values are
+averaged (see Filters.MovingAverage)
+
 Written by Jaden Bottemiller in January 2017
 EE Team of Husky Robotics
 (Untested as of 2/7/2017)
 """
+from Filters import MovingAverage
 
 
 class AverageFilter(object):
@@ -19,11 +23,16 @@ class AverageFilter(object):
     _sum = 0
     _num = 0
 
-    def __init__(self):
+    def __init__(self, size=None):
         self._sum = 0
         self._num = 0
+        self._window = None
+        if size is not None:
+            self._window = MovingAverage(size)
 
     def filter(self, input):
+        if self._window is not None:
+            return self._window.filter(input)
         self._num += 1
         self._sum += input
         return self._sum / self._num
@@ -31,3 +40,5 @@ class AverageFilter(object):
     def reset(self):
         self._sum = 0
         self._num = 0
+        if self._window is not None:
+            self._window.reset()
@@ -22,7 +22,7 @@ class CamFocus(Command):
         self._motor.moveTo(setpoint)
 
     def setpoint(self, setpoint=None):
-        self._setpoint = Parse.aux_ctrl[AuxCtrlID.CamFocusPos + 1]
+        self._setpoint = Parse.aux_ctrl.get(AuxCtrlID.CamFocusPos)
         return self._setpoint
 
     def stopSafe(self):
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark of Codec.py against the original Util integer
+conversions (copied below as they were before Codec existed).
+
+Run on the Beaglebone with:
+    python CodecBenchmark.py
+
+Prints the time per call for each field width and the speedup.
+"""
+import sys
+import struct
+import timeit
+from binascii import unhexlify
+import Codec
+
+
+def legacy_long_to_bytes(val):
+    if val < 0:
+        return struct.pack('<l', val)
+    if val == 0:
+        return '\x00'
+    width = val.bit_length()
+    width += 8 - ((width % 8) or 8)
+    fmt = '%%0%dx' % (width // 4)
+    return unhexlify(fmt % val)
+
+
+def legacy_long_to_byte_length(val, byte_length):
+    valBA = bytearray(legacy_long_to_bytes(val))
+    if len(valBA) > byte_length:
+        valBA = valBA[:byte_length]
+    elif len(valBA) < byte_length:
+        valBA = b'\x00'*(byte_length-len(valBA)) + valBA
+    return valBA
+
+
+def legacy_bytesToInt(data, start=None, stop=None):
+    data = data[start:stop]
+    encoded = str(data).encode('hex')
+    return int(encoded, 16)
+
+
+def bench(statement, setup, number):
+    best = min(timeit.repeat(statement, setup, number=number, repeat=3))
+    return best / number * 1e6  # microseconds per call
+
+
+def main(number=20000):
+    setup = "from __main__ import Codec, legacy_long_to_byte_length, legacy_bytesToInt"
+    sys.stdout.write("%-22s %12s %12s %8s\n" % ("field", "legacy (us)", "codec (us)", "speedup"))
+    for length, value in ((1, 0x5A), (2, 1234), (4, 1490000000), (8, 2 ** 40 + 7)):
+        data = "bytearray(%r)" % bytes(Codec.encode(value, length))
+        rows = (
+            ("encode %d byte" % length,
+             "legacy_long_to_byte_length(%d, %d)" % (value, length),
+             "Codec.encode(%d, %d)" % (value, length)),
+            ("decode %d byte" % length,
+             "legacy_bytesToInt(d, 0, %d)" % length,
+             "Codec.decode(d, 0, %d)" % length),
+        )
+        for name, legacy, fast in rows:
+            rowSetup = setup + "; d = " + data
+            legacyTime = bench(legacy, rowSetup, number)
+            fastTime = bench(fast, rowSetup, number)
+            sys.stdout.write("%-22s %12.3f %12.3f %7.1fx\n" % (name, legacyTime, fastTime, legacyTime / fastTime))
+
+
+if __name__ == "__main__":
+    main()
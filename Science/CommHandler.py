@@ -11,7 +11,11 @@ import sys
 import socket
 import Error
 import Parse
-import Util
+import Codec
+import ThreadStats
+from Uplink import Uplink
+from SendQueue import SendQueue, OverflowPolicy
+from CommandServer import CommandServer
 from threading import Thread
 
 
@@ -19,12 +23,18 @@ class CommHandler:
 
     SOCKET = None
     BYTE_BUFFER_SIZE = 2048
+    SEND_QUEUE_SIZE = 32
+    SEND_QUEUE_POLICY = OverflowPolicy.KEEP_LATEST
+    SEND_WAIT_TIMEOUT = 0.5  # seconds, lets the sender notice stopComms()
+
+    _packets = SendQueue(SEND_QUEUE_SIZE, SEND_QUEUE_POLICY)
+    _server = None
 
     @classmethod
     def setup(cls, internalIP, receivePort):
         CommHandler._internalIP = internalIP
         CommHandler._receivePort = receivePort
-        CommHandler._packets = []
+        CommHandler._packets = SendQueue(CommHandler.SEND_QUEUE_SIZE, CommHandler.SEND_QUEUE_POLICY)
         try:
             CommHandler.SOCKET = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             CommHandler.SOCKET.bind((CommHandler._internalIP, CommHandler._receivePort))
@@ -48,20 +58,16 @@ class CommHandler:
 
     # Meant to be threaded on system
     # Otherwise there will be an infinite loop
+    # Keeps every base station connection open and hands each
+    # complete length-framed command to Parse (see CommandServer.py)
     @classmethod
     def receiveMessagesOnThread(cls):
+        ThreadStats.register("comms")
         CommHandler._continue = True
+        CommHandler._server = CommandServer(CommHandler.SOCKET, cls._queueMessage)
         try:
-            while CommHandler._continue:
-                CommHandler.SOCKET.listen(1)
-                client, clientAddr = CommHandler.SOCKET.accept()
-                CommHandler._receiving = True
-                data = client.recv(CommHandler.BYTE_BUFFER_SIZE)
-                if not data:
-                    break
-                CommHandler._receiving = False
-                Parse.queueMessage(Message(data, clientAddr))
-                client.close()
+            CommHandler._receiving = True
+            CommHandler._server.serve()
         except socket.error:
             # Throw "Failed to begin receive process"
             Error.throw(0x0502)
@@ -69,33 +75,73 @@ class CommHandler:
             sys.stderr.write("\nUnexpected error: " + str(sys.exc_info()[0]) + "\n")
             # Throw "Could not initialize comms"
             Error.throw(0x0501)
+        CommHandler._receiving = False
+
+    # Called by the command server for every complete command
+    @classmethod
+    def _queueMessage(cls, data, clientAddr):
+        try:
+            Parse.queueMessage(Message(data, clientAddr))
+        except IndexError:
+            # Throw "Failed to Parse incoming Packet"
+            Error.throw(0x0504, "Command packet too short", "CommHandler.py", 85)
+        except Exception:
+            # A malformed frame must not stop the server, drop only this one
+            # Throw "Failed to Parse incoming Packet"
+            Error.throw(0x0504, "Malformed command packet: " + str(sys.exc_info()[1]), "CommHandler.py", 89)
     
+    # Queues a packet for the sender thread. When the queue is
+    # full the SEND_QUEUE_POLICY decides which packet is dropped.
     @classmethod
     def addCyclePacket(cls, packet):
-        cls._packets += [packet]
+        cls._packets.put(packet)
 
     @classmethod
     def sendAll(cls):
         _sendThread = Thread(target=cls._sendPackets)
         _sendThread.start()
 
+    # Sleeps until a packet is queued, then sends it
     @classmethod
     def _sendPackets(cls):
+        ThreadStats.register("comms")
         while CommHandler._continue:
-            if len(cls._packets) > 0:
-                cls._packets[0].send()
-                del cls._packets[0]
+            packet = cls._packets.get(CommHandler.SEND_WAIT_TIMEOUT)
+            if packet is None:
+                continue
+            packet.send()
+            if len(cls._packets) == 0:
+                Uplink.flushAll()  # Push out the corked cycle
     
     @classmethod
     def stopComms(cls):
         CommHandler._continue = False
+        if CommHandler._server is not None:
+            CommHandler._server.stop()
+        cls._packets.close()
+        Uplink.closeAll()
+
+    # Returns depth and drop counters of the send queue
+    @classmethod
+    def getQueueStats(cls):
+        return cls._packets.getStats()
+
+    # Sets Nagle/cork batching of the uplink (see Uplink.setBatching())
+    @classmethod
+    def setBatching(cls, nodelay=True, cork=False):
+        Uplink.setBatching(nodelay, cork)
+
+    # Returns send latency counters for every uplink target
+    @classmethod
+    def getUplinkStats(cls):
+        return Uplink.getAllStats()
 
 
 class Message:
 
     def __init__(self, data, fromAddr):
         self.data = bytearray(data) 
-        self.ID = Util.bytesToInt(data[4])
+        self.ID = Codec.decode(data[4])
         self.fromAddr = fromAddr
 
     def __str__(self):
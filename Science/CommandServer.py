@@ -0,0 +1,149 @@
+"""
+Multi-client command server for the Science station.
+
+Keeps every base station connection open and waits on all of them at
+once with epoll (select() where epoll is not available, Python 2.7 has
+no selectors module). Commands are length-framed the same way as the
+uplink (see Uplink.py):
+
+    [ 2 byte big-endian length ][ command packet bytes ]
+
+Bytes are buffered per connection, so a command split across two
+recv() calls, or several commands arriving back to back in one recv(),
+are all reassembled and handed to the callback one complete command at
+a time.
+
+Basic Implementation as follows:
+
+1) Create with a bound listening socket and a callback taking
+   (data, clientAddr)
+2) Call serve() on its own thread; it returns after stop()
+
+EE Team of Husky Robotics
+"""
+import errno
+import select
+import socket
+from Uplink import Uplink
+
+
+class CommandServer:
+
+    BACKLOG = 8
+    RECV_SIZE = 2048
+    POLL_TIMEOUT = 0.5  # seconds, lets serve() notice stop()
+    FRAME_HEADER = Uplink.FRAME_HEADER
+
+    def __init__(self, listenSocket, onMessage):
+        self._listener = listenSocket
+        self._onMessage = onMessage
+        self._clients = {}  # fileno -> (socket, address, bytearray buffer)
+        self._continue = False
+        self._poller = None
+        if hasattr(select, "epoll"):
+            self._poller = select.epoll()
+
+    # Accepts clients and dispatches complete commands until stop()
+    # Raises socket.error if the listening socket fails
+    def serve(self):
+        self._continue = True
+        self._listener.listen(self.BACKLOG)
+        self._listener.setblocking(False)
+        self._register(self._listener.fileno())
+        try:
+            while self._continue:
+                for fd in self._wait():
+                    if fd == self._listener.fileno():
+                        self._accept()
+                    elif fd in self._clients:
+                        self._read(fd)
+        finally:
+            self._closeAll()
+
+    def stop(self):
+        self._continue = False
+
+    def clientCount(self):
+        return len(self._clients)
+
+    # Returns the list of readable file descriptors
+    # Meant for internal use only
+    def _wait(self):
+        try:
+            if self._poller is not None:
+                return [fd for fd, event in self._poller.poll(self.POLL_TIMEOUT)]
+            fds = [self._listener.fileno()] + list(self._clients.keys())
+            return select.select(fds, [], [], self.POLL_TIMEOUT)[0]
+        except (IOError, OSError, select.error) as e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+
+    # Meant for internal use only
+    def _register(self, fd):
+        if self._poller is not None:
+            self._poller.register(fd, select.EPOLLIN)
+
+    # Meant for internal use only
+    def _unregister(self, fd):
+        if self._poller is not None:
+            try:
+                self._poller.unregister(fd)
+            except (IOError, OSError):
+                pass
+
+    # Meant for internal use only
+    def _accept(self):
+        try:
+            client, clientAddr = self._listener.accept()
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        client.setblocking(False)
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._clients[client.fileno()] = (client, clientAddr, bytearray())
+        self._register(client.fileno())
+
+    # Reads what is available from a client and dispatches
+    # every complete frame in its buffer
+    # Meant for internal use only
+    def _read(self, fd):
+        client, clientAddr, buffer = self._clients[fd]
+        try:
+            data = client.recv(self.RECV_SIZE)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            data = b''
+        if not data:
+            # Client went away, drop only that connection
+            self._close(fd)
+            return
+        buffer.extend(data)
+        headerSize = self.FRAME_HEADER.size
+        start = 0
+        while len(buffer) - start >= headerSize:
+            length = self.FRAME_HEADER.unpack_from(buffer, start)[0]
+            end = start + headerSize + length
+            if len(buffer) < end:
+                break
+            self._onMessage(bytes(buffer[start + headerSize:end]), clientAddr)
+            start = end
+        if start > 0:
+            del buffer[:start]
+
+    # Meant for internal use only
+    def _close(self, fd):
+        client = self._clients.pop(fd)[0]
+        self._unregister(fd)
+        try:
+            client.close()
+        except socket.error:
+            pass
+
+    # Meant for internal use only
+    def _closeAll(self):
+        for fd in list(self._clients.keys()):
+            self._close(fd)
+        self._unregister(self._listener.fileno())
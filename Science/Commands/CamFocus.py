@@ -11,6 +11,8 @@ DEFAULT_PIN = "P8_45"
 
 class CamFocus(Command):
 
+    frequency = 20  # Hz
+
     def __init__(self, servo_pin=DEFAULT_PIN):
         self._motor = Servo(servo_pin)
         Command.__init__(self)
@@ -24,7 +26,7 @@ class CamFocus(Command):
         self._motor.moveTo(self.setpoint())
 
     def setpoint(self, setpoint=None):
-        self._setpoint = Parse.aux_ctrl[AuxCtrlID.CamFocusPos + 1]
+        self._setpoint = Parse.aux_ctrl.get(AuxCtrlID.CamFocusPos)
         return self._setpoint
 
     def stopSafe(self):
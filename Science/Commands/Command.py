@@ -1,12 +1,13 @@
-from threading import Thread
+from CommandExecutor import CommandExecutor
 
 
 class Command:
 
     commands = []
+    executor = CommandExecutor()  # Runs every started command (see CommandExecutor.py)
+    frequency = 50  # Hz, how often run() is called
 
     def __init__(self, pid=None):
-        self._thread = Thread(target=self._threadRun)
         self._pid = pid
         self._pidCtrl = True
         self._setpoint = 0
@@ -14,21 +15,19 @@ class Command:
         if self._pid is None:
             self._pidCtrl = False
 
+    # Schedules run() on the shared executor
     def start(self):
-        self._thread.start()
+        self.executor.add(self)
+        self.executor.start()
 
     def setpoint(self, setpoint=None):
         if not (setpoint is None):
             self._setpoint = setpoint
         return self._setpoint
 
-    def _threadRun(self):
-        while not self.isFinished():
-            self.run(self.setpoint())
-
     def stop(self):
+        self.executor.remove(self)
         self.stopSafe()
-        self._thread.join(0.02)
 
     def initialize(self):
         pass
@@ -49,10 +48,17 @@ class Command:
 
     @classmethod
     def stopAllSafe(cls):
+        cls.executor.stop()
         for command in cls.commands:
             command.stopSafe()
 
     @classmethod
     def startAll(cls):
         for command in cls.commands:
-            command.start()
+            cls.executor.add(command)
+        cls.executor.start()
+
+    # Returns overrun counts and execution time histograms per command
+    @classmethod
+    def getExecutorStats(cls):
+        return cls.executor.getStats()
@@ -0,0 +1,209 @@
+"""
+Fixed-rate executor for Commands.
+
+Runs every registered Command on one thread at the frequency the
+command declares (Command.frequency, in Hz) instead of each command
+spinning in its own thread. Deadlines are absolute (start + n * period)
+and the command with the earliest deadline runs first, so the time
+between two run() calls of a command stays at its period and PID loops
+see a steady dT.
+
+For each command the executor keeps:
+    runs       - number of run() calls
+    overruns   - deadlines missed because a run finished too late
+                 (missed deadlines are skipped, not run back to back)
+    errors     - run() calls that raised
+    maxLate    - largest delay between a deadline and the run starting
+    histogram  - counts of run() execution times, one bucket per bound
+                 in HISTOGRAM_BOUNDS plus one for anything longer
+
+Basic Implementation as follows:
+
+1) Set frequency on the Command subclass (or instance)
+2) Command.startAll() adds every command to Command.executor and starts it
+3) Command.stopAllSafe() stops the executor and makes every command safe
+4) Optionally executor.addTickHook(fn) to run fn once per tick, after
+   every command due in that tick has run
+
+NOTE: run() must not block. A command that has to wait (e.g. to end a
+relay pulse) should remember when and finish on a later run().
+
+EE Team of Husky Robotics
+"""
+import sys
+import time
+import heapq
+import threading
+import ThreadStats
+
+
+class CommandExecutor:
+
+    HISTOGRAM_BOUNDS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05)  # seconds
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._wakeEvent = threading.Event()
+        self._thread = None
+        self._running = False
+        self._version = 0  # Bumped whenever the command list changes
+        self._tickHooks = []
+
+    # Adds a command, it starts running on the next cycle
+    def add(self, command):
+        with self._lock:
+            for entry in self._entries:
+                if entry.command is command:
+                    return
+            self._entries.append(_Entry(command, len(self._entries)))
+            self._version += 1
+        self._wakeEvent.set()
+
+    def remove(self, command):
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry.command is not command]
+            self._version += 1
+        self._wakeEvent.set()
+
+    # Calls hook() once per tick, after every command due at that
+    # time has run, e.g. to flush deferred motor outputs
+    def addTickHook(self, hook):
+        if hook not in self._tickHooks:
+            self._tickHooks.append(hook)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._wakeEvent.clear()
+        with self._lock:
+            for entry in self._entries:
+                entry.deadline = None
+            self._version += 1
+        self._thread = threading.Thread(target=self._run, name="CommandExecutor")
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Stops running commands, waits up to timeout seconds
+    # for the command in progress to return
+    def stop(self, timeout=0.5):
+        self._running = False
+        self._wakeEvent.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def isRunning(self):
+        return self._running
+
+    # Returns { command class name: counters } for every command
+    def getStats(self):
+        with self._lock:
+            entries = list(self._entries)
+        stats = {}
+        for entry in entries:
+            name = entry.command.__class__.__name__
+            if name in stats:
+                name += "-" + str(entry.order)
+            stats[name] = entry.getStats()
+        return stats
+
+    # Meant for internal use only
+    def _run(self):
+        ThreadStats.register("commands")
+        heap = []
+        version = None
+        while self._running:
+            now = time.time()
+            if version != self._version:
+                # Commands were added or removed, rebuild the schedule
+                with self._lock:
+                    entries = list(self._entries)
+                    version = self._version
+                for entry in entries:
+                    if entry.deadline is None:
+                        entry.deadline = now
+                heap = [(entry.deadline, entry.order, entry) for entry in entries]
+                heapq.heapify(heap)
+            if not heap:
+                self._wakeEvent.wait(0.1)
+                self._wakeEvent.clear()
+                continue
+            deadline, order, entry = heap[0]
+            if deadline > now:
+                self._wakeEvent.wait(deadline - now)
+                self._wakeEvent.clear()
+                continue
+            # Run every command that is due, then the tick hooks once
+            while heap and heap[0][0] <= now:
+                entry = heap[0][2]
+                if entry.execute(time.time()):
+                    heapq.heapreplace(heap, (entry.deadline, entry.order, entry))
+                else:
+                    heapq.heappop(heap)
+                    self.remove(entry.command)
+            for hook in self._tickHooks:
+                hook()
+
+
+class _Entry:
+
+    def __init__(self, command, order):
+        self.command = command
+        self.order = order
+        self.period = 1.0 / command.frequency
+        self.deadline = None  # Set when the executor first schedules it
+        self.runs = 0
+        self.overruns = 0
+        self.errors = 0
+        self.maxLate = 0.0
+        self.lastDuration = 0.0
+        self.histogram = [0] * (len(CommandExecutor.HISTOGRAM_BOUNDS) + 1)
+
+    # Runs the command once and moves its deadline forward.
+    # Returns False once the command is finished.
+    def execute(self, now):
+        command = self.command
+        late = now - self.deadline
+        if late > self.maxLate:
+            self.maxLate = late
+        try:
+            if command.isFinished():
+                return False
+            command.run(command.setpoint())
+        except Exception:
+            self.errors += 1
+            if self.errors == 1:
+                sys.stderr.write("\n" + command.__class__.__name__ + ".run() failed: " +
+                                 str(sys.exc_info()[1]) + "\n")
+        end = time.time()
+        self.runs += 1
+        self._record(end - now)
+        self.period = 1.0 / command.frequency
+        self.deadline += self.period
+        if self.deadline <= end:
+            missed = int((end - self.deadline) / self.period) + 1
+            self.overruns += missed
+            self.deadline += missed * self.period
+        return True
+
+    def getStats(self):
+        return {
+            "frequency": 1.0 / self.period,
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "maxLate": self.maxLate,
+            "lastDuration": self.lastDuration,
+            "histogram": list(self.histogram)
+        }
+
+    # Meant for internal use only
+    def _record(self, duration):
+        self.lastDuration = duration
+        bucket = 0
+        for bound in CommandExecutor.HISTOGRAM_BOUNDS:
+            if duration <= bound:
+                break
+            bucket += 1
+        self.histogram[bucket] += 1
@@ -1,5 +1,5 @@
 import Parse
-from datetime import datetime
+from math import pi
 from Motor import TalonMC
 from Packet import AuxCtrlID
 from PID import PID
@@ -8,31 +8,25 @@ from Command import Command
 
 class DrillCtrl(Command):
 
+    frequency = 50  # Hz
+
     def __init__(self,  drillMotorPin, drillEncoder, kp=0, ki=0, kd=0):
         self._pid = PID(kp, ki, kd)
         Command.__init__(self, self._pid)
         self.drillMotor = TalonMC(drillMotorPin)
         self.drillEncoder = drillEncoder
-        self.currentPos = 0
         self.currentRate = 0
-        self.lastTime = datetime.now().microsecond
 
     def initialize(self):
         self.drillMotor.enable()
-        self.currentPos = self.drillEncoder.getValue()[0]
         self.currentRate = 0
 
     def run(self, setpoint):
         # Set setpoint of PID controller to given setpoint
         self._pid.setTarget(setpoint)
 
-        # Find current rate
-        now = datetime.now().microsecond
-        deltaT = now - self.lastTime
-        self.lastTime = now
-        currentP = self.drillEncoder.getValue()[0]
-        self.currentRate = (currentP - self.currentPos) / deltaT
-        self.currentPos = currentP
+        # Find current rate in RPM from the encoder's edge timestamps
+        self.currentRate = self.drillEncoder.getVelocity() * 60 / (2 * pi)
 
         # Run PID Controller
         self._pid.run(self.currentRate)
@@ -40,7 +34,7 @@ class DrillCtrl(Command):
         self.drillMotor.set(self._pid.getOutput())
 
     def setpoint(self, setpoint=None):
-        self._setpoint = Parse.aux_ctrl[AuxCtrlID.DrillRPM + 1]
+        self._setpoint = Parse.aux_ctrl.get(AuxCtrlID.DrillRPM)
         return self._setpoint
 
     def stopSafe(self):
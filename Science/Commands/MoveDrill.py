@@ -7,6 +7,8 @@ from Command import Command
 
 class MoveDrill(Command):
 
+    frequency = 15  # Hz, one new distance per run in BETTER_ACCURACY mode (66ms budget)
+
     def __init__(self, armatureMotorPin, distanceSensor, kp=0, ki=0, kd=0):
         # We cannot have undershoot, move slow
         # and calibrate well
@@ -14,20 +16,20 @@ class MoveDrill(Command):
         Command.__init__(self, self._pid)
         self.motor = TalonMC(armatureMotorPin)
         self.distanceSensor = distanceSensor
-        self.currentPos = self.distanceSensor.getValue()
+        self.currentPos = self._readDistance()
 
     def initialize(self):
         self.motor.enable()
-        self.currentPos = self.distanceSensor.getValue()
+        self.currentPos = self._readDistance()
 
     def run(self, setpoint):
         self._pid.setTarget(setpoint)
-        self.currentPos = self.distanceSensor.getValue()
+        self.currentPos = self._readDistance()
         self._pid.run(self.currentPos)
         self.motor.set(self._pid.getOutput())
 
     def setpoint(self, setpoint=None):
-        self._setpoint = Parse.aux_ctrl[AuxCtrlID.MoveDrill + 1]
+        self._setpoint = Parse.aux_ctrl.get(AuxCtrlID.MoveDrill)
         return self._setpoint
 
     def stopSafe(self):
@@ -35,3 +37,8 @@ class MoveDrill(Command):
 
     def isFinished(self):
         return False
+
+    # Latest reading from the sensor's ranging thread
+    # Meant for internal use only
+    def _readDistance(self):
+        return self.distanceSensor.getPacketValues()[0]
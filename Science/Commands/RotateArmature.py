@@ -1,21 +1,38 @@
+import Parse
+from Packet import AuxCtrlID
+from PID import PID
 from Command import Command
 from Motor import TalonMC
 
 
 class RotateArmature(Command):
 
-    def __init__(self, armatureMotorPin, encoder):
-        Command.__init__(self)
+    frequency = 50  # Hz
+
+    def __init__(self, armatureMotorPin, encoder, kp=0, ki=0, kd=0):
+        self._pid = PID(kp, ki, kd)
+        Command.__init__(self, self._pid)
         self._motor = TalonMC(armatureMotorPin)
         self._encoder = encoder
+        self.currentRate = 0
 
     def initialize(self):
-        pass
+        self._motor.enable()
+        self.currentRate = 0
+
+    # Holds the armature at the commanded angular velocity (rad/s)
+    def run(self, setpoint):
+        self._pid.setTarget(setpoint)
+        self.currentRate = self._encoder.getVelocity()
+        self._pid.run(self.currentRate)
+        self._motor.set(self._pid.getOutput())
 
-    def run(self, reading):
-        pass
+    def setpoint(self, setpoint=None):
+        self._setpoint = Parse.aux_ctrl.get(AuxCtrlID.RotateArmature)
+        return self._setpoint
 
     def stopSafe(self):
         self._motor.stop()
 
-
+    def isFinished(self):
+        return False
@@ -9,9 +9,14 @@ from Packet import SysCtrlID, CameraID
 
 
 class SystemControl(Command):
-    
+
+    frequency = 50  # Hz
+    AF_PULSE = 0.002  # seconds the relay is held for an autofocus capture
+    CAPTURE_PULSE = 0.2  # seconds the relay is held for a capture
+
     def __init__(self, microscopeRelayPin):
         self.microscopeRelayPin = microscopeRelayPin
+        self._relayRelease = None  # time to drop the relay, None if it is low
         try:
             GPIO.setup(self.microscopeRelayPin, GPIO.OUT)
         except:
@@ -21,16 +26,12 @@ class SystemControl(Command):
 
     def initialize(self):
         GPIO.output(self.microscopeRelayPin, GPIO.LOW)
+        self._relayRelease = None
 
     def run(self, reading):
-        PING = Parse.sys_ctrl[SysCtrlID.Ping + 1] == 1
-        REBOOT = Parse.sys_ctrl[SysCtrlID.Reboot + 1] == 1
-        MICROSCOPE_CAPTURE = Parse.cam_ctrl[CameraID.Microscope]
-        MICROSCOPE_AF_CAPTURE = Parse.cam_ctrl[CameraID.Microscope_AF]
-        Parse.sys_ctrl[SysCtrlID.Ping + 1] = 0
-        Parse.sys_ctrl[SysCtrlID.Reboot + 1] = 0
-        Parse.cam_ctrl[CameraID.Microscope] = False
-        Parse.cam_ctrl[CameraID.Microscope_AF] = False
+        # One-shot events, each is consumed exactly once
+        PING = Parse.sys_ctrl.consume(SysCtrlID.Ping)
+        REBOOT = Parse.sys_ctrl.consume(SysCtrlID.Reboot)
 
         if PING:
             if not Error.areErrors():
@@ -39,12 +40,25 @@ class SystemControl(Command):
                 Error.throw(0x00FE)
         if REBOOT:
             os.system("sudo reboot")
-        if MICROSCOPE_AF_CAPTURE:
-            GPIO.output(self.microscopeRelayPin, GPIO.HIGH)
-            time.sleep(0.002)
+        # The relay is released on a later run() rather than
+        # sleeping, which would hold up the other commands
+        now = time.time()
+        if self._relayRelease is not None and now >= self._relayRelease:
             GPIO.output(self.microscopeRelayPin, GPIO.LOW)
-        if MICROSCOPE_CAPTURE:
-            GPIO.output(self.microscopeRelayPin, GPIO.HIGH)
-            time.sleep(0.2)
+            self._relayRelease = None
+        # One capture per pulse, a capture requested during
+        # a pulse stays pending until a later run()
+        if self._relayRelease is None and Parse.cam_ctrl.consume(CameraID.Microscope_AF, 1):
+            self._pulseRelay(now, self.AF_PULSE)
+        if self._relayRelease is None and Parse.cam_ctrl.consume(CameraID.Microscope, 1):
+            self._pulseRelay(now, self.CAPTURE_PULSE)
+
+    # Pulses shorter than one period are done in place
+    # Meant for internal use only
+    def _pulseRelay(self, now, length):
+        GPIO.output(self.microscopeRelayPin, GPIO.HIGH)
+        if length < 1.0 / self.frequency:
+            time.sleep(length)
             GPIO.output(self.microscopeRelayPin, GPIO.LOW)
-        time.sleep(0.02)
+        else:
+            self._relayRelease = now + length
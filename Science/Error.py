@@ -1,18 +1,55 @@
+"""
+Error reporting for the Science station.
+
+throw() counts each occurrence per error code in a bounded table
+instead of sending a packet (and starting a thread) for every call. A
+single flusher thread sends one Error packet per code that occurred
+since the previous flush every FLUSH_INTERVAL seconds, through the
+normal CommHandler send queue. A sensor that throws every cycle
+therefore costs one packet per interval, not one per cycle.
+
+Each Error packet carries the code and its total count since startup
+(see Schema.py), so a packet replaced in the send queue loses nothing.
+
+stderr gets the full message the first time a code is thrown, then a
+one line summary per flush while it keeps repeating.
+
+Fatal codes (FATAL_CODES, or fatal=True) bypass the batching and are
+sent right away from the calling thread. fatal=True also reboots.
+
+NOTE: Error packets are (code, total count) and use a queueKey per code,
+so packets for different codes do not replace each other in the send
+queue.
+
+EE Team of Husky Robotics
+"""
 import sys
 import os
-import Util
+import time
+import threading
+import Schema
 from CommHandler import CommHandler
 from Packet import Packet
 from Packet import PacketType
 from Packet import getConnectionStatus, setStatus
 
+FLUSH_INTERVAL = 1.0  # seconds between batched error packets
+MAX_CODES = 64  # size of the error table
+FATAL_CODES = set([0x0001, 0x0501, 0x0502])
 
-errors = []
+# { ERROR_CODE: [ COUNT, REPORTED_COUNT, LAST_TIME ] }
+errors = {}
+evicted = 0  # codes dropped from a full table
+
+_lock = threading.Lock()
+_flushEvent = threading.Event()
+_flushThread = None
 
 
 def clearErrors():
     global errors
-    errors = []
+    with _lock:
+        errors = {}
 
 
 def throw(errorCode, comment="", file="", line=None, fatal=False):
@@ -21,28 +58,102 @@ def throw(errorCode, comment="", file="", line=None, fatal=False):
     elif errorCode == 0x0503:
         comment += "\nCHECK ETHERNET CABLE ATTACHMENT \n"
         setStatus(False)
+    urgent = fatal or errorCode in FATAL_CODES
+    count = _count(errorCode)
+    if count == 1 or urgent:
+        sys.stderr.write(_format(errorCode, comment, file, line))
+    if not urgent:
+        _startFlusher()
+        return True
+    # Sent now from this thread, the flusher may never get to run
+    with _lock:
+        entry = errors.get(errorCode)
+        if entry is not None:
+            entry[1] = entry[0]
+    _errorPacket(errorCode, count).send()
+    if fatal:
+        os.system("sudo reboot")  # TODO: Test whether or not this works.
+        sys.exit(0x00FF)
+    return True
+
+
+def getErrors():
+    with _lock:
+        return dict((code, entry[0]) for code, entry in errors.items())
+
+
+def areErrors():
+    return len(errors) > 0
+
+
+# Sends one packet for every code thrown since the last flush
+def flush():
+    pending = []
+    with _lock:
+        for code, entry in errors.items():
+            if entry[0] != entry[1]:
+                pending.append((code, entry[0], entry[0] - entry[1]))
+                entry[1] = entry[0]
+    for code, count, repeats in pending:
+        if count > 1:
+            sys.stderr.write("Error: " + hex(code) + " repeated " + str(repeats) +
+                             " times (" + str(count) + " total)\n")
+        CommHandler.addCyclePacket(_errorPacket(code, count))
+    return len(pending)
+
+
+# Meant for internal use only
+def _count(errorCode):
+    global evicted
+    with _lock:
+        entry = errors.get(errorCode)
+        if entry is None:
+            if len(errors) >= MAX_CODES:
+                # Forget the code that was seen longest ago
+                oldest = min(errors, key=lambda code: errors[code][2])
+                del errors[oldest]
+                evicted += 1
+            entry = [0, 0, 0]
+            errors[errorCode] = entry
+        entry[0] += 1
+        entry[2] = time.time()
+        return entry[0]
+
+
+# Meant for internal use only
+def _format(errorCode, comment, file, line):
     if len(comment) > 0:
-        comment += "\n\tGiven information: " + str(comment) + "\n"
+        comment = "\n\tGiven information: " + str(comment) + "\n"
     if file != "":
         comment += "File: " + file
     if not (line is None):
         comment += " | " + "Line: " + str(line)
     comment += "\n"
-    error_out = "Error: " + hex(errorCode) + " | Refer to documentation for more information.\n" + comment + "\n"
-    sys.stderr.write(error_out)
-    errors.append(errorCode)
+    return "Error: " + hex(errorCode) + " | Refer to documentation for more information.\n" + comment + "\n"
+
+
+# Meant for internal use only
+def _errorPacket(errorCode, count):
     errorPack = Packet(PacketType.Error)
-    errorPack.appendData(Util.byteMap(errorCode, 16))  # BYTEMAP?
-    CommHandler.sendAsyncPacket(errorPack)
-    errorPack = None
-    if fatal:
-        os.system("sudo reboot")  # TODO: Test whether or not this works.
-        sys.exit(0x00FF)
+    errorPack.queueKey = (PacketType.Error, errorCode)  # One queued packet per code
+    errorPack.appendData(Schema.packBody(PacketType.Error, (errorCode, min(count, 0xFFFF))))
+    return errorPack
 
 
-def getErrors():
-    return errors
+# Meant for internal use only
+def _startFlusher():
+    global _flushThread
+    if _flushThread is not None:
+        return
+    with _lock:
+        if _flushThread is not None:
+            return
+        _flushThread = threading.Thread(target=_flushOnThread, name="ErrorFlush")
+        _flushThread.daemon = True
+    _flushThread.start()
 
 
-def areErrors():
-    return len(errors) > 0
+# Meant for internal use only
+def _flushOnThread():
+    while not _flushEvent.wait(FLUSH_INTERVAL):
+        flush()
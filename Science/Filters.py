@@ -0,0 +1,182 @@
+"""
+Streaming filters for sensor readings.
+
+Every filter takes one value at a time with filter(value), which
+returns the filtered output, and keeps its state in buffers allocated
+once in the constructor:
+
+    MovingAverage(size)      - mean of the last size values, O(1)
+    ExponentialAverage(a)    - EMA, output += a * (value - output), O(1)
+    RunningMedian(size)      - median of the last size values, kept
+                               sorted with bisect, O(log size) search
+    CircularMean(size)       - mean of the last size angles (radians) from
+                               running sin / cos sums, O(1)
+
+get() returns the current output without adding a value, reset()
+empties the filter.
+
+NOTE: MovingAverage and CircularMean keep running sums. They are
+recomputed from the buffer each time it wraps around so floating point
+error cannot build up.
+
+Basic Implementation as follows:
+
+    heading = CircularMean(10)
+    heading.filter(math.atan2(y, x))
+
+EE Team of Husky Robotics
+"""
+import math
+import bisect
+import array
+
+
+class MovingAverage(object):
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("Filter size must be at least 1")
+        self._size = size
+        self._values = array.array("d", [0.0] * size)
+        self.reset()
+
+    def filter(self, value):
+        index = self._index
+        if self._count == self._size:
+            self._sum -= self._values[index]
+        else:
+            self._count += 1
+        self._values[index] = value
+        self._sum += value
+        index += 1
+        if index == self._size:
+            index = 0
+            self._sum = sum(self._values)
+        self._index = index
+        return self._sum / self._count
+
+    def get(self):
+        if self._count == 0:
+            return 0.0
+        return self._sum / self._count
+
+    def isFull(self):
+        return self._count == self._size
+
+    def reset(self):
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+
+
+class ExponentialAverage(object):
+
+    # alpha = weight of each new value, 0 < alpha <= 1
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self._alpha = alpha
+        self.reset()
+
+    def filter(self, value):
+        if self._empty:
+            self._output = float(value)  # Start at the first value instead of 0
+            self._empty = False
+        else:
+            self._output += self._alpha * (value - self._output)
+        return self._output
+
+    def get(self):
+        return self._output
+
+    def setAlpha(self, alpha):
+        self._alpha = alpha
+
+    def reset(self):
+        self._output = 0.0
+        self._empty = True
+
+
+class RunningMedian(object):
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("Filter size must be at least 1")
+        self._size = size
+        self._values = array.array("d", [0.0] * size)
+        self.reset()
+
+    def filter(self, value):
+        value = float(value)
+        if self._count == self._size:
+            # Drop the oldest value from the sorted window
+            del self._sorted[bisect.bisect_left(self._sorted, self._values[self._index])]
+        else:
+            self._count += 1
+        self._values[self._index] = value
+        self._index = (self._index + 1) % self._size
+        bisect.insort(self._sorted, value)
+        return self.get()
+
+    def get(self):
+        count = self._count
+        if count == 0:
+            return 0.0
+        middle = count // 2
+        if count % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2.0
+
+    def reset(self):
+        self._index = 0
+        self._count = 0
+        self._sorted = []  # the values in the window, in order, never more than size
+
+
+class CircularMean(object):
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("Filter size must be at least 1")
+        self._size = size
+        self._sin = array.array("d", [0.0] * size)
+        self._cos = array.array("d", [0.0] * size)
+        self.reset()
+
+    # Adds an angle in radians, returns the mean angle in (-pi, pi]
+    def filter(self, angle):
+        index = self._index
+        sin = math.sin(angle)
+        cos = math.cos(angle)
+        if self._count == self._size:
+            self._sinSum -= self._sin[index]
+            self._cosSum -= self._cos[index]
+        else:
+            self._count += 1
+        self._sin[index] = sin
+        self._cos[index] = cos
+        self._sinSum += sin
+        self._cosSum += cos
+        index += 1
+        if index == self._size:
+            index = 0
+            self._sinSum = sum(self._sin)
+            self._cosSum = sum(self._cos)
+        self._index = index
+        return math.atan2(self._sinSum, self._cosSum)
+
+    def get(self):
+        return math.atan2(self._sinSum, self._cosSum)
+
+    # Returns the length of the mean vector, 1.0 when every angle agrees
+    # and near 0.0 when they are spread around the circle
+    def getConsistency(self):
+        if self._count == 0:
+            return 0.0
+        return math.hypot(self._sinSum, self._cosSum) / self._count
+
+    def reset(self):
+        self._index = 0
+        self._count = 0
+        self._sinSum = 0.0
+        self._cosSum = 0.0
@@ -0,0 +1,210 @@
+"""
+Shared I2C bus arbiter, one per bus number.
+
+The UV sensor (Adafruit_GPIO.I2C.Device) and the VL53L0X library
+callbacks both talk to bus 2 from different sampling threads, each
+with its own /dev/i2c-2 handle. A register read is a write of the
+register number followed by a read, and with two handles a transfer
+from the other thread can land between them. The arbiter owns the
+only handle to its bus and runs every transaction to completion
+before the next one starts.
+
+Waiting transactions are granted the bus by priority, then in order
+of arrival, so motor writes (PRIORITY_MOTOR) go ahead of telemetry
+reads that were queued first. A transaction already on the bus is
+never interrupted.
+
+The arbiter has the Adafruit_PureIO SMBus method names, so it can be
+used wherever an SMBus is:
+
+    device = I2C.Device(0x38, 2, I2CArbiter.get)   # i2c_interface
+    bus = I2CArbiter.get(2)
+    bus.setPriority(0x40, I2CArbiter.PRIORITY_MOTOR)
+
+getStats() returns per device address: transactions, errors, and the
+average / maximum time spent waiting for the bus and on the bus.
+
+EE Team of Husky Robotics
+"""
+import time
+import heapq
+import threading
+import Adafruit_GPIO.Adafruit_PureIO.smbus as smbus
+
+
+class I2CArbiter:
+
+    PRIORITY_MOTOR = 0
+    PRIORITY_DEFAULT = 1
+    PRIORITY_TELEMETRY = 2
+
+    _buses = {}
+    _busesLock = threading.Lock()
+
+    # Returns the arbiter for busnum, opening the bus the first time.
+    # Can be passed to I2C.Device as its i2c_interface.
+    @classmethod
+    def get(cls, busnum):
+        with cls._busesLock:
+            arbiter = cls._buses.get(busnum)
+            if arbiter is None:
+                arbiter = I2CArbiter(busnum)
+                cls._buses[busnum] = arbiter
+            return arbiter
+
+    # Returns { bus number: getStats() } for every open bus
+    @classmethod
+    def getAllStats(cls):
+        with cls._busesLock:
+            buses = dict(cls._buses)
+        return dict((busnum, arbiter.getStats()) for busnum, arbiter in buses.items())
+
+    def __init__(self, busnum, bus=None):
+        self.busnum = busnum
+        if bus is None:
+            bus = smbus.SMBus(busnum)
+        self._bus = bus
+        self._condition = threading.Condition(threading.Lock())
+        self._busy = False
+        self._waiting = []  # heap of (PRIORITY, ARRIVAL) tickets
+        self._arrivals = 0
+        self._priorities = {}  # address -> priority
+        self._stats = {}  # address -> _DeviceStats
+
+    # Sets the priority used for every transaction with addr
+    def setPriority(self, addr, priority):
+        self._priorities[addr] = priority
+
+    def getStats(self):
+        with self._condition:
+            stats = dict(self._stats)
+        return dict((addr, entry.getStats()) for addr, entry in stats.items())
+
+    def resetStats(self):
+        with self._condition:
+            self._stats = {}
+
+    # Runs a batch of (addr, write, read_len) operations as one
+    # transaction (see Adafruit_PureIO.smbus.SMBus.transfer). The data
+    # read is copied before the bus is released, the smbus buffer is
+    # reused by whichever thread goes next.
+    def transfer(self, operations, priority=None):
+        addr = operations[0][0] if operations else None
+        return self._run(addr, priority, self._transfer, operations)
+
+    def read_byte(self, addr):
+        return self._run(addr, None, self._bus.read_byte, addr)
+
+    def read_byte_data(self, addr, cmd):
+        return self._run(addr, None, self._bus.read_byte_data, addr, cmd)
+
+    def read_word_data(self, addr, cmd):
+        return self._run(addr, None, self._bus.read_word_data, addr, cmd)
+
+    def read_i2c_block_data(self, addr, cmd, length=32):
+        return self._run(addr, None, self._bus.read_i2c_block_data, addr, cmd, length)
+
+    def write_byte(self, addr, val):
+        return self._run(addr, None, self._bus.write_byte, addr, val)
+
+    def write_byte_data(self, addr, cmd, val):
+        return self._run(addr, None, self._bus.write_byte_data, addr, cmd, val)
+
+    def write_word_data(self, addr, cmd, val):
+        return self._run(addr, None, self._bus.write_word_data, addr, cmd, val)
+
+    def write_i2c_block_data(self, addr, cmd, vals):
+        return self._run(addr, None, self._bus.write_i2c_block_data, addr, cmd, vals)
+
+    def close(self):
+        self._acquire(self.PRIORITY_MOTOR)
+        try:
+            self._bus.close()
+        finally:
+            self._release()
+
+    # Meant for internal use only
+    def _transfer(self, operations):
+        return [memoryview(bytearray(result)) if result is not None else None
+                for result in self._bus.transfer(operations)]
+
+    # Runs function(*args) while holding the bus and records its timing
+    # Meant for internal use only
+    def _run(self, addr, priority, function, *args):
+        if priority is None:
+            priority = self._priorities.get(addr, self.PRIORITY_DEFAULT)
+        requested = time.time()
+        self._acquire(priority)
+        start = time.time()
+        failed = True
+        try:
+            result = function(*args)
+            failed = False
+        finally:
+            end = time.time()
+            self._release()
+            self._record(addr, start - requested, end - start, failed)
+        return result
+
+    # Meant for internal use only
+    def _acquire(self, priority):
+        with self._condition:
+            if not self._busy and not self._waiting:
+                self._busy = True
+                return
+            ticket = (priority, self._arrivals)
+            self._arrivals += 1
+            heapq.heappush(self._waiting, ticket)
+            while self._busy or self._waiting[0] != ticket:
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._busy = True
+
+    # Meant for internal use only
+    def _release(self):
+        with self._condition:
+            self._busy = False
+            if self._waiting:
+                self._condition.notify_all()
+
+    # Meant for internal use only
+    def _record(self, addr, wait, duration, failed):
+        with self._condition:
+            entry = self._stats.get(addr)
+            if entry is None:
+                entry = _DeviceStats()
+                self._stats[addr] = entry
+            entry.add(wait, duration, failed)
+
+
+class _DeviceStats:
+
+    def __init__(self):
+        self.transactions = 0
+        self.errors = 0
+        self.totalWait = 0.0
+        self.maxWait = 0.0
+        self.totalTime = 0.0
+        self.maxTime = 0.0
+
+    def add(self, wait, duration, failed):
+        self.transactions += 1
+        if failed:
+            self.errors += 1
+        self.totalWait += wait
+        self.totalTime += duration
+        if wait > self.maxWait:
+            self.maxWait = wait
+        if duration > self.maxTime:
+            self.maxTime = duration
+
+    def getStats(self):
+        count = max(self.transactions, 1)
+        return {
+            "transactions": self.transactions,
+            "errors": self.errors,
+            "averageWait": self.totalWait / count,
+            "maxWait": self.maxWait,
+            "averageTime": self.totalTime / count,
+            "maxTime": self.maxTime
+        }
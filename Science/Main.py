@@ -1,10 +1,9 @@
-import sys
-
 import Error
 import Util
 import Parse
 import Adafruit_BBIO.ADC as ADC  # Ignore compilation errors
 from Motor import Motor
+from PWMOutput import PWMOutput
 from Sensors.Thermocouple import Thermocouple
 from Sensors.DistanceSensor import DistanceSensor
 from Sensors.Humidity import Humidity
@@ -21,6 +20,7 @@ from Commands.Command import Command
 from CommHandler import CommHandler
 from Packet import Packet, PacketType
 from SystemTelemetry import SystemTelemetry
+from TelemetryPublisher import TelemetryPublisher
 
 
 # Communication Setup
@@ -30,6 +30,12 @@ PRIMARY_TCP_SEND_PORT = 22
 INTERNAL_IP = '192.168.0.90'
 INTERNAL_TCP_RECEIVE_PORT = 5000
 
+# Publish rates (Hz) per packet type
+PRIMARY_SENSOR_RATE = 10
+AUX_SENSOR_RATE = 20
+SYSTEM_TELEMETRY_RATE = 1
+RATE_REPORT_PERIOD = 30  # seconds between achieved rate reports on stdout
+
 Packet.setDefaultTarget(MAIN_IP, PRIMARY_TCP_SEND_PORT)
 
 # Initialize hardware and communications
@@ -69,6 +75,7 @@ SensorHandler.addAccessorySensors(encoder1, encoder2, encoder3, limit1, limit2,
 # Setup and start all sensors
 SensorHandler.setupAll()
 SensorHandler.startAll()
+SensorHandler.startSampling()  # Sensors with a sampleRate read on their own threads
 
 # Create Command Interface
 drillController = DrillCtrl("P8_13", encoder1)
@@ -77,6 +84,10 @@ armatureController = MoveDrill("P8_19", DistanceSensor)
 camFocusCommand = CamFocus("P9_14")
 systemControl = SystemControl("P9_15")
 
+# Motor outputs are written once per control tick, only if changed
+PWMOutput.setDeferred(True)
+Command.executor.addTickHook(Motor.flushAll)
+
 # Initialize All Commands (Set machine to relaxed state)
 Command.initializeAll()
 # Start All Commands
@@ -86,25 +97,24 @@ Command.startAll()
 Motor.enableAll()
 
 
-while True:
-
-    # Update All Sensor Data In Main Thread
+# Encoders are not on the sampling scheduler,
+# refresh them right before each aux packet
+def buildAuxPacket():
     SensorHandler.updateAll()
+    return SensorHandler.buildAuxPacket()
 
-    # Send Primary Sensor Packet
-    primarySensorData = Packet(PacketType.PrimarySensor)
-    primarySensorData.appendData(SensorHandler.getPrimarySensorData())
-    CommHandler.addCyclePacket(primarySensorData)
-
-    # Send Auxiliary Sensor Packet
-    auxSensorData = Packet(PacketType.AuxSensor)
-    auxSensorData.appendData(SensorHandler.getAuxSensorData())
-    CommHandler.addCyclePacket(auxSensorData)
 
-    # Send System Telemetry Packet
+def buildSystemPacket():
     SystemTelemetry.updateTelemetry()
     systemPacket = Packet(PacketType.SystemTelemetry)
     systemPacket.appendData(SystemTelemetry.getTelemetryData())
-    CommHandler.addCyclePacket(systemPacket)
+    return systemPacket
+
 
-    sys.stdout.flush()
+# Publish each packet type at its own rate, the send queue
+# keeps only the newest unsent packet of each type
+publisher = TelemetryPublisher()
+publisher.addStream(PacketType.PrimarySensor, PRIMARY_SENSOR_RATE, SensorHandler.buildPrimaryPacket)
+publisher.addStream(PacketType.AuxSensor, AUX_SENSOR_RATE, buildAuxPacket)
+publisher.addStream(PacketType.SystemTelemetry, SYSTEM_TELEMETRY_RATE, buildSystemPacket)
+publisher.run(RATE_REPORT_PERIOD)
@@ -1,6 +1,6 @@
-import Adafruit_GPIO.PWM as PWM
 import time
 import Util
+from PWMOutput import PWMOutput
 
 """
 
@@ -9,7 +9,7 @@ import Util
 
 class Motor:
 
-    pwm_handler = PWM.get_platform_pwm()
+    pwm_handler = PWMOutput.handler  # Raw handler, write through PWMOutput instead
     pwm_working = ["P9_14", "P9_16", "P9_42", "P9_21", "P8_13", "P8_19"]
     motors = []
     _freq = 2000
@@ -17,24 +17,26 @@ class Motor:
 
     def __init__(self, pin):
         self._pin = pin
-        self.pwm_handler.start(self._pin, 0.0)
+        PWMOutput.start(self._pin, 0.0)
         self._started = True
         self.motors += [self]
 
     def enable(self):
         pass
 
+    # Redundant writes are skipped by PWMOutput
     def set(self, value):
-        self.pwm_handler.set_duty_cycle(self._pin, ((value % 100) * 100.0))
+        PWMOutput.setDuty(self._pin, ((value % 100) * 100.0))
 
     def stop(self):
-        self.pwm_handler.stop(self._pin)
+        PWMOutput.stop(self._pin)
+        self._started = False
 
     def calibrate(self):
         pass
 
     def setFreq(self, freq):
-        self.pwm_handler.set_frequency(self._pin, freq)
+        PWMOutput.setFrequency(self._pin, freq)
         self._freq = freq
 
     @classmethod
@@ -50,14 +52,12 @@ class Motor:
     def stopAll(cls):
         for motor in cls.motors:
             motor.stop()
-            cls.pwm_handler.stop(motor._pin)
-        cls.pwm_handler.cleanup()
+        PWMOutput.cleanup()
 
     @classmethod
     def initializeAllPWMPins(cls):
         for pin in cls.pwm_working:
-            cls.pwm_handler.stop(pin)
-        
+            PWMOutput.stop(pin)
 
     @classmethod
     def calibrateAll(cls):
@@ -67,6 +67,17 @@ class Motor:
     def isStarted(self):
         return self._started
 
+    # Writes held back by PWMOutput.setDeferred(True), call
+    # at the end of each control tick
+    @classmethod
+    def flushAll(cls):
+        PWMOutput.flush()
+
+    # Returns PWM writes issued vs. suppressed
+    @classmethod
+    def getWriteStats(cls):
+        return PWMOutput.getStats()
+
 """
 Interfaces Beaglebone Black PWM outputs with
 a Talon Motor Controller.
@@ -121,7 +132,7 @@ class Servo(Motor):
 
     def moveTo(self, angle):
         dutyCycle = 100 - ((angle / 180.0) * (self._maxDutyCycle - self._minDutyCycle) + self._minDutyCycle)
-        self.pwm_handler.set_duty_cycle(self._pin, dutyCycle)
+        PWMOutput.setDuty(self._pin, dutyCycle)
 
 
 """
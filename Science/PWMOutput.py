@@ -0,0 +1,176 @@
+"""
+Write-coalescing PWM output layer for Motor, TalonMC and Servo.
+
+Every PWM write on the Beaglebone is a sysfs write. The command loops
+set their motors on every iteration, usually to the same value, so
+this layer keeps the last duty cycle and frequency written to each pin
+and skips a write that would not change what is in sysfs. Duty cycles
+are compared the way the driver stores them, in whole nanoseconds of
+the pin's period, so a change too small to reach the hardware is not
+written either.
+
+With setDeferred(True) setDuty() only records the new value and
+flush() writes every changed pin at once; Main.py calls flush() at the
+end of each control tick (see Commands/CommandExecutor.py).
+
+The duty_cycle / period sysfs files stay open for the life of the pin:
+Adafruit_BBIO opens them once in start() and seeks and rewrites them
+on every set, so nothing here reopens files.
+
+getStats() returns the writes issued and suppressed, in total and per pin.
+
+EE Team of Husky Robotics
+"""
+import threading
+import Adafruit_GPIO.PWM as PWM
+
+
+class PWMOutput:
+
+    DEFAULT_FREQUENCY = 2000  # Hz, Adafruit_BBIO's default
+
+    handler = PWM.get_platform_pwm()
+
+    _lock = threading.Lock()
+    _pins = {}
+    _deferred = False
+    _flushes = 0
+
+    # Starts PWM output on pin
+    @classmethod
+    def start(cls, pin, duty=0.0, frequency=None):
+        if frequency is None:
+            frequency = cls.DEFAULT_FREQUENCY
+        with cls._lock:
+            cls.handler.start(pin, duty, frequency)
+            state = cls._pins.get(pin)
+            if state is None:
+                state = _PinState()
+                cls._pins[pin] = state
+            state.started = True
+            state.duty = duty
+            state.frequency = frequency
+            state.pendingDuty = None
+            state.writes += 1
+
+    # Sets the duty cycle (percent) of pin. The write is skipped if it would
+    # not change the output, and held until flush() in deferred mode.
+    @classmethod
+    def setDuty(cls, pin, duty):
+        if duty < 0.0 or duty > 100.0:
+            raise ValueError('Invalid duty cycle value, must be between 0.0 to 100.0 (inclusive).')
+        with cls._lock:
+            state = cls._pins.get(pin)
+            if state is None or not state.started:
+                raise RuntimeError("PWM pin " + str(pin) + " has not been started")
+            if cls._deferred:
+                if state.pendingDuty is not None:
+                    state.suppressed += 1  # Replaced before it was written
+                state.pendingDuty = duty
+                return
+            cls._writeDuty(pin, state, duty)
+
+    @classmethod
+    def setFrequency(cls, pin, frequency):
+        with cls._lock:
+            state = cls._pins.get(pin)
+            if state is None or not state.started:
+                raise RuntimeError("PWM pin " + str(pin) + " has not been started")
+            if state.frequency == frequency:
+                state.suppressed += 1
+                return
+            cls.handler.set_frequency(pin, frequency)
+            state.frequency = frequency
+            state.writes += 1
+
+    # Writes every duty cycle held back in deferred mode
+    @classmethod
+    def flush(cls):
+        with cls._lock:
+            cls._flushes += 1
+            for pin, state in cls._pins.items():
+                if state.pendingDuty is not None and state.started:
+                    duty = state.pendingDuty
+                    state.pendingDuty = None
+                    cls._writeDuty(pin, state, duty)
+
+    # In deferred mode setDuty() only takes effect on flush()
+    @classmethod
+    def setDeferred(cls, deferred):
+        if not deferred:
+            cls.flush()
+        cls._deferred = deferred
+
+    @classmethod
+    def stop(cls, pin):
+        with cls._lock:
+            cls.handler.stop(pin)
+            state = cls._pins.get(pin)
+            if state is not None:
+                state.started = False
+                state.duty = None
+                state.pendingDuty = None
+
+    @classmethod
+    def isStarted(cls, pin):
+        state = cls._pins.get(pin)
+        return state is not None and state.started
+
+    # Stops every pin and releases the PWM subsystem
+    @classmethod
+    def cleanup(cls):
+        for pin in list(cls._pins):
+            if cls._pins[pin].started:
+                cls.stop(pin)
+        bbio = getattr(cls.handler, "bbio_pwm", None)
+        if bbio is not None and hasattr(bbio, "cleanup"):
+            bbio.cleanup()
+
+    # Returns { "writes", "suppressed", "flushes", "pins": { pin: { "writes", "suppressed" } } }
+    @classmethod
+    def getStats(cls):
+        with cls._lock:
+            pins = dict((pin, {"writes": state.writes, "suppressed": state.suppressed})
+                        for pin, state in cls._pins.items())
+        return {
+            "writes": sum(pin["writes"] for pin in pins.values()),
+            "suppressed": sum(pin["suppressed"] for pin in pins.values()),
+            "flushes": cls._flushes,
+            "pins": pins
+        }
+
+    @classmethod
+    def resetStats(cls):
+        with cls._lock:
+            cls._flushes = 0
+            for state in cls._pins.values():
+                state.writes = 0
+                state.suppressed = 0
+
+    # Meant for internal use only, caller holds cls._lock
+    @classmethod
+    def _writeDuty(cls, pin, state, duty):
+        if state.duty is not None and cls._dutyNs(state.duty, state.frequency) == \
+                cls._dutyNs(duty, state.frequency):
+            state.suppressed += 1
+            return
+        cls.handler.set_duty_cycle(pin, duty)
+        state.duty = duty
+        state.writes += 1
+
+    # Duty cycle as the driver writes it to sysfs
+    # Meant for internal use only
+    @classmethod
+    def _dutyNs(cls, duty, frequency):
+        return int((1e9 / frequency) * (duty / 100.0))
+
+
+class _PinState:
+
+    def __init__(self):
+        self.started = False
+        self.duty = None
+        self.frequency = PWMOutput.DEFAULT_FREQUENCY
+        self.pendingDuty = None
+        self.writes = 0
+        self.suppressed = 0
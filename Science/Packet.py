@@ -10,7 +10,9 @@ Questions/Comments? Email: jadenjb@uw.edu
 import socket
 import time
 import Error
-import Util
+import Codec
+from Uplink import Uplink
+from Schema import PacketType, AuxCtrlID, CameraID, SysCtrlID
 
 CONNECTION_STATUS = True
 
@@ -24,6 +26,7 @@ class Packet:
     def __init__(self, id=0x00, targetIP=None, targetPort=None):
         self._data = b''  # bytes
         self._id = id
+        self.queueKey = id  # Packets with the same key replace each other in the send queue
         self._recieved = ""
         if targetPort == None:
             targetIP = self.DEFAULT_TARGET_IP
@@ -36,8 +39,8 @@ class Packet:
     # Appends 32bit UNIX timestamp to beginning of packet
     # Automatically done when send() is called.
     def addTimeID(self):
-        time_data = Util.long_to_byte_length(int(time.time()), 4)
-        id_data = Util.long_to_byte_length(self._id, 1)
+        time_data = Codec.encode(int(time.time()), 4)
+        id_data = Codec.encode(self._id, 1)
         self._data = time_data + id_data + self._data
 
     # Takes in int or string of bytes and
@@ -45,7 +48,7 @@ class Packet:
     # buffer for the packet.
     def appendData(self, data):
         if isinstance(data, int):
-            self._data += Util.long_to_byte_length(data, 1)
+            self._data += Codec.encode(data, 1)
         else:
             self._data = data
 
@@ -56,26 +59,28 @@ class Packet:
     def clear(self):
         self._data = ""
 
-    # Sends data to constructor-specified client
+    # Sends data to constructor-specified client over
+    # the persistent uplink for that target (see Uplink.py)
     # Returns whether or not send is successful
     def send(self):
         if self._data == 0x0503 and not getConnectionStatus():
             return True
         try:
             self.addTimeID()  # Always add time and id to the packet
-            s = socket.socket()
-            s.connect((self._targetIP, self._targetPort))
-            s.send(self._data)
-            s.close()
+            Uplink.get(self._targetIP, self._targetPort).send(self._data)
         except socket.error:
             # Throw "Failed to send packet"
-            Error.throw(0x0503, "Failed to send packet", "Packet.py", 72)
+            Error.throw(0x0503, "Failed to send packet", "Packet.py", 71)
             return setStatus(False)
         return setStatus(True)
 
     def getData(self):
         return self._data
 
+    # Called once the packet has been sent or dropped from the send queue
+    def release(self):
+        pass
+
     def __str__(self):
         return "Packet: " + str(self._id) + "\tData: " + str(self._data) + "\n"
 
@@ -86,32 +91,51 @@ class Packet:
         time.sleep(0.03)
 
 
-# Packet Type Enumeration:
+class FramedPacket(Packet):
+
+    """
+    A packet whose bytes, uplink length prefix included, are
+    written in place by a PacketBuilder (see PacketBuilder.py).
+    send() hands that memory to the uplink without copying it.
+    """
+
+    def __init__(self, id, frame, targetIP=None, targetPort=None):
+        Packet.__init__(self, id, targetIP, targetPort)
+        self._frame = frame
+        self._releaseHook = None
+
+    # hook() is called when the frame's buffer can be written again
+    def setReleaseHook(self, hook):
+        self._releaseHook = hook
 
+    def release(self):
+        if self._releaseHook is not None:
+            self._releaseHook()
 
-class PacketType:
-    PrimarySensor = 0x00
-    Error = 0x01
-    AuxSensor = 0x02
-    SystemTelemetry = 0x03
-    ImageRequest = 0x80
-    AuxControl = 0x81
-    SysControl = 0x82
+    # The builder already wrote the time and ID
+    def addTimeID(self):
+        pass
+
+    def appendData(self, data):
+        raise TypeError("FramedPacket data is written by its PacketBuilder")
 
+    def send(self):
+        try:
+            Uplink.get(self._targetIP, self._targetPort).sendFrame(self._frame)
+        except socket.error:
+            # Throw "Failed to send packet"
+            Error.throw(0x0503, "Failed to send packet", "Packet.py", 112)
+            return setStatus(False)
+        finally:
+            self.release()  # Done with the buffer, the builder can reuse it
+        return setStatus(True)
 
-class AuxCtrlID:
-    MoveDrill = 0x00
-    DrillRPM = 0x01
-    CamFocusPos = 0x02
-    RotateArmature = 0x03
+    def getData(self):
+        return self._frame[Uplink.FRAME_HEADER.size:].tobytes()
 
-class CameraID:
-    Microscope = 0x01
-    Microscope_AF = 0x02
 
-class SysCtrlID:
-    Ping = 0x00
-    Reboot = 0x01
+# Packet Type Enumerations live in Schema.py with the
+# packet layouts, imported above so existing imports keep working.
 
 
 def setStatus(status):
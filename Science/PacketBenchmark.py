@@ -0,0 +1,111 @@
+"""
+Allocation and timing benchmark of sensor packet assembly.
+
+Compares the per-cycle path Main.py used before PacketBuilder existed
+(encode each field, join the body, prepend the time and ID header,
+prepend the uplink length prefix) against PacketBuilder.build(), which
+fills a preallocated frame in place.
+
+Run with:
+    python3 PacketBenchmark.py
+
+Allocation counts need tracemalloc (Python 3.4+). On Python 2 only the
+timings are printed.
+"""
+import sys
+import time
+import timeit
+import Codec
+import Schema
+from Schema import PacketType
+from Uplink import Uplink
+from PacketBuilder import PacketBuilder
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class FakeSensor:
+
+    def __init__(self, values):
+        self.packetFields = len(values)
+        self._values = tuple(values)
+
+    def getPacketValues(self):
+        return self._values
+
+
+# Same fields as the PrimarySensor layout in Schema.py:
+# distance, uv, thermocouple + internal_temp, humidity
+SENSORS = [FakeSensor((812,)), FakeSensor((70000,)), FakeSensor((250, 31)), FakeSensor((512,))]
+WIDTHS = [2, 4, 2, 2, 2]
+
+
+def legacy_build():
+    body = bytearray()
+    field = 0
+    for sensor in SENSORS:
+        for value in sensor.getPacketValues():
+            body += Codec.encode(value, WIDTHS[field])
+            field += 1
+    data = Codec.encode(int(time.time()), 4) + Codec.encode(PacketType.PrimarySensor, 1) + body
+    return Uplink.FRAME_HEADER.pack(len(data)) + bytes(data)
+
+
+builder = PacketBuilder(PacketType.PrimarySensor, SENSORS)
+
+
+def builder_build():
+    frame = builder.build()
+    builder.release(frame)  # As the sender does once the frame is out
+    return frame
+
+
+# Returns the blocks and bytes each packet keeps allocated. Results are
+# kept alive, as they would be while waiting in the send queue
+def allocations(function, number):
+    function()  # Warm up caches and lazily created objects
+    results = [None] * number
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(number):
+        results[i] = function()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    count = sum(max(stat.count_diff, 0) for stat in stats)
+    size = sum(max(stat.size_diff, 0) for stat in stats)
+    return float(count) / number, float(size) / number
+
+
+def main(number=20000):
+    timestamp = int(time.time())
+    frame = builder.build(timestamp)
+    built = frame.tobytes()
+    builder.release(frame)
+    if built != Uplink.FRAME_HEADER.pack(Schema.getLayout(PacketType.PrimarySensor).size) + \
+            Schema.pack(PacketType.PrimarySensor, (812, 70000, 250, 31, 512), timestamp):
+        sys.stdout.write("PacketBuilder output does not match Schema.pack()\n")
+        return 1
+
+    rows = (("legacy", legacy_build), ("PacketBuilder", builder_build))
+    sys.stdout.write("%-16s %12s\n" % ("path", "time (us)"))
+    for name, function in rows:
+        best = min(timeit.repeat(function, number=number, repeat=3))
+        sys.stdout.write("%-16s %12.3f\n" % (name, best / number * 1e6))
+
+    if tracemalloc is None:
+        sys.stdout.write("\ntracemalloc needs Python 3.4+, allocation counts skipped\n")
+        return 0
+
+    sys.stdout.write("\n%-16s %16s %16s\n" % ("path", "blocks/packet", "bytes/packet"))
+    for name, function in rows:
+        count, size = allocations(function, number)
+        sys.stdout.write("%-16s %16.2f %16.2f\n" % (name, count, size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Preallocated, fixed-layout packet buffers.
+
+A PacketBuilder owns a small ring of buffers for one packet type. Each
+buffer holds a whole uplink frame (length prefix, time and ID header,
+body) laid out as described in Schema.py. The length prefix and ID are
+written once; every build() only writes the timestamp and each source's
+values in place with struct.pack_into at offsets computed up front, and
+returns a memoryview of the frame that can go straight to
+Uplink.sendFrame().
+
+Sources are objects with a getPacketValues() method (see
+Sensors/Sensor.py) and a packetFields attribute giving how many schema
+fields they fill, in order.
+
+NOTE: A buffer is only reused once it has been released: wrapper
+objects with a setReleaseHook() method (FramedPacket) release their
+buffer after it was sent, or when the send queue drops them. Callers
+using the bare frames call release(frame) when done with it. If every
+buffer is still in use, build() adds one to the ring instead of
+overwriting a frame that may still be queued or on the wire.
+
+EE Team of Husky Robotics
+"""
+import struct
+import time
+import threading
+import Schema
+from Uplink import Uplink
+
+
+class PacketBuilder:
+
+    RING_SIZE = 3
+
+    def __init__(self, packetType, sources=(), ringSize=RING_SIZE, wrap=None):
+        self._layout = Schema.getLayout(packetType)
+        self._packetType = packetType
+        self._headerOffset = Uplink.FRAME_HEADER.size
+        self._buffers = []
+        self._frames = []
+        # Optional per-slot wrapper objects (e.g. a Packet) built once
+        self._wrap = wrap
+        self._wrapped = [] if wrap is not None else None
+        self._lock = threading.Lock()
+        self._free = []  # indices of buffers not queued or being sent
+        self._inUse = []
+        for i in range(ringSize):
+            self._addBuffer()
+        self._timeStruct = struct.Struct(">I")
+        self._sources = []
+        self.bind(sources)
+
+    # Assigns each source its struct and offset in the packet.
+    # Raises ValueError if the sources do not fill the layout exactly.
+    def bind(self, sources):
+        self._sources = []
+        field = 0
+        for source in sources:
+            count = getattr(source, "packetFields", 1)
+            codes = self._layout.codes[field:field + count]
+            if len(codes) != count:
+                raise ValueError("Sources have more fields than the packet layout")
+            fieldStruct = struct.Struct(">" + "".join(codes))
+            offset = self._headerOffset + self._layout.offsets[field]
+            limits = self._layout.limits[field:field + count]
+            self._sources.append((fieldStruct, offset, source.getPacketValues, limits))
+            field += count
+        if sources and field != len(self._layout.codes):
+            raise ValueError("Sources do not fill every field of the packet layout")
+
+    # Fills a free buffer in place and returns its frame
+    # (or its wrapper object if one was given)
+    def build(self, timestamp=None):
+        index = self._acquire()
+        buffer = self._buffers[index]
+        if timestamp is None:
+            timestamp = int(time.time())
+        self._timeStruct.pack_into(buffer, self._headerOffset, timestamp & 0xFFFFFFFF)
+        for fieldStruct, offset, getValues, limits in self._sources:
+            values = getValues()
+            try:
+                fieldStruct.pack_into(buffer, offset, *values)
+            except struct.error:
+                fieldStruct.pack_into(buffer, offset, *self._clamp(values, limits))
+        if self._wrapped is not None:
+            return self._wrapped[index]
+        return self._frames[index]
+
+    # Fills the next buffer from a flat sequence of values
+    # in layout order instead of the bound sources
+    def buildFrom(self, values, timestamp=None):
+        index = self._acquire()
+        if timestamp is None:
+            timestamp = int(time.time())
+        buffer = self._buffers[index]
+        try:
+            self._layout.struct.pack_into(buffer, self._headerOffset,
+                                          timestamp & 0xFFFFFFFF, self._layout.header, *values)
+        except struct.error:
+            self._layout.struct.pack_into(buffer, self._headerOffset, timestamp & 0xFFFFFFFF,
+                                          self._layout.header, *self._clamp(values, self._layout.limits))
+        if self._wrapped is not None:
+            return self._wrapped[index]
+        return self._frames[index]
+
+    # Returns the buffer of frame (from build()) to the ring
+    def release(self, frame):
+        for index, candidate in enumerate(self._frames):
+            if candidate is frame:
+                self._release(index)
+                return
+
+    def frameSize(self):
+        return len(self._buffers[0])
+
+    def ringSize(self):
+        return len(self._buffers)
+
+    # Meant for internal use only
+    def _acquire(self):
+        with self._lock:
+            if not self._free:
+                self._addBuffer()
+            index = self._free.pop()
+            self._inUse[index] = True
+            return index
+
+    # Meant for internal use only
+    def _release(self, index):
+        with self._lock:
+            if self._inUse[index]:
+                self._inUse[index] = False
+                self._free.append(index)
+
+    # Meant for internal use only
+    def _addBuffer(self):
+        index = len(self._buffers)
+        headerSize = self._headerOffset
+        buffer = bytearray(headerSize + self._layout.size)
+        Uplink.FRAME_HEADER.pack_into(buffer, 0, self._layout.size)
+        Schema.HEADER.pack_into(buffer, headerSize, 0, self._packetType)
+        self._buffers.append(buffer)
+        self._frames.append(memoryview(buffer))
+        if self._wrapped is not None:
+            wrapped = self._wrap(self._frames[index])
+            if hasattr(wrapped, "setReleaseHook"):
+                wrapped.setReleaseHook(lambda: self._release(index))
+            self._wrapped.append(wrapped)
+        self._inUse.append(False)
+        self._free.append(index)
+
+    # Meant for internal use only
+    def _clamp(self, values, limits):
+        return Schema.clamp(values, limits)
@@ -1,148 +1,194 @@
 import sys
+import time
 import struct
 import Error
 import Util
+import Schema
+import ThreadStats
+from SetpointStore import SetpointStore
+from collections import deque
 from Packet import PacketType
-from threading import Thread
+from threading import Thread, Condition, Lock
 
 IMG_REQ_CONST = 6370218008217978682469763330258393040577855L
 
-msgQueue = []
+# Messages waiting to be parsed, the parse thread sleeps
+# on _msgCondition until queueMessage() adds one
+msgQueue = deque()
+_msgCondition = Condition(Lock())
 
-# [ LAST TIMESTAMP, CMD_VAL_ID1, CMD_VAL_ID2, ... ]
-aux_ctrl = []
-sys_ctrl = []
+# { PACKET_TYPE: [ COUNT, TOTAL_SECONDS, MAX_SECONDS ] }
+handlerStats = {}
+
+# Setpoints written by this thread and read by the Commands,
+# indexed by command ID (see SetpointStore.py)
+aux_ctrl = SetpointStore(32)
+# System commands, value per SysCtrlID plus a one-shot event
+# per SysCtrlID whenever a command is set to 1 (ping, reboot)
+sys_ctrl = SetpointStore(32)
 
 """
-*** WHEN PICTURE IS CAPTURED, THE RESPECTIVE
-    CAMERA ID, SHOULD BE SET TO 'False' IN
-    THIS HANDLER ARRAY.
+*** Image requests are one-shot events per CameraID.
+    WHEN PICTURE IS CAPTURED, CONSUME THE EVENT
+    (cam_ctrl.consume(CameraID)).
 """
-# [ LAST TIMESTAMP, CAM_NUM0_BOOL, CAM_NUM1_BOOL, ... ]
-cam_ctrl = []
+cam_ctrl = SetpointStore(32, False)
 
 reset = False
 
 """
-Queue a message to the handler
+Queue a message to the handler and wake the parse thread
 """
 def queueMessage(msg):
-    global msgQueue
-    msgQueue += [msg]
+    with _msgCondition:
+        msgQueue.append(msg)
+        _msgCondition.notify()
 
 """
 Get Message from Queue
+Blocks until a message is available if block is True,
+returns None if no message arrived within timeout
+"""
+def nextMsg(block=False, timeout=None):
+    with _msgCondition:
+        if block and len(msgQueue) == 0:
+            _msgCondition.wait(timeout)
+        if len(msgQueue) == 0:
+            return None
+        return msgQueue.popleft()
+
+"""
+Drop every queued message
 """
-def nextMsg():
-    global msgQueue
-    temp = msgQueue[0]
-    del msgQueue[0]
-    return temp
+def clearQueue():
+    with _msgCondition:
+        msgQueue.clear()
 
 """
 Parse message into timestamp and id
+Decodes the message with its Schema.py layout and
+dispatches on the packet ID through handlers{}
 """
 def parse(msg):
-    global msgQueue
-    global reset
-    if len(msgQueue) == 0 and reset:
-        reset = False  # Set reset back to default value
-    if msg.ID == PacketType.AuxControl:
-        parse_aux(msg)
-    elif msg.ID == PacketType.SysControl:
-        parse_sysctrl(msg)
-    elif msg.ID == PacketType.ImageRequest:
-        parse_imgreq(msg)
-    else:
+    handler = handlers.get(msg.ID)
+    try:
+        fields = Schema.unpack(msg.data)
+    except ValueError:
+        handler = None
+    if handler is None:
         # Throw Failed to Parse incoming Packet
         Error.throw(0x0504)
+        return
+    start = time.time()
+    handler(fields)
+    _recordLatency(msg.ID, time.time() - start)
+
+"""
+Adds one handler run to the latency counters
+"""
+def _recordLatency(packetType, elapsed):
+    stats = handlerStats.get(packetType)
+    if stats is None:
+        stats = [0, 0.0, 0.0]
+        handlerStats[packetType] = stats
+    stats[0] += 1
+    stats[1] += elapsed
+    if elapsed > stats[2]:
+        stats[2] = elapsed
+
+"""
+Returns { PACKET_TYPE: (COUNT, AVG_SECONDS, MAX_SECONDS) }
+"""
+def getHandlerStats():
+    result = {}
+    for packetType, stats in handlerStats.items():
+        result[packetType] = (stats[0], stats[1] / max(stats[0], 1), stats[2])
+    return result
 
 """
 Parse Auxilliary Ctrl Packet
 """
-def parse_aux(msg):
-    global aux_ctrl    
-    # Set Timestamp
-    aux_ctrl[0] = Util.bytesToInt(msg.data, 0, 4)
-    # Get Command ID at byte pos 5
-    cmd_id = msg.data[5]
-    # Get Command Value
-    cmd_value = Util.bytesToInt(msg.data, 6, 10)
-    aux_ctrl[cmd_id + 1] = cmd_value
-    sys.stdout.write(str(aux_ctrl))
+def parse_aux(fields):
+    # Set Command Value at its Command ID
+    aux_ctrl.set(fields["cmd_id"], fields["value"], fields["timestamp"])
+    sys.stdout.write(str(aux_ctrl.snapshot()[2]))
 
 
 """
 Parse System Ctrl Packet
 """
-def parse_sysctrl(msg):
-    global cam_ctrl
-    # Set Timestamp
-    sys_ctrl[0] = Util.bytesToInt(msg.data, 0, 4)
-    # Find Command ID at byte pos 5
-    cmd_id = msg.data[5]
-    # Find value as trailing 8 bytes
-    cmd_value = Util.bytesToInt(msg.data, 6, 10)
+def parse_sysctrl(fields):
     # Set Controller to specified value at specified location
-    sys_ctrl[cmd_id + 1] = cmd_value
+    sys_ctrl.set(fields["cmd_id"], fields["value"], fields["timestamp"])
+    if fields["value"] == 1:
+        sys_ctrl.trigger(fields["cmd_id"], fields["timestamp"])
 
 
 """
 Parse Img Request
 """
-def parse_imgreq(msg):
-    global cam_ctrl
-    # Set Timestamp
-    cam_ctrl[0] = Util.bytesToInt(msg.data, 0, 4)
-    # Get CMD Value
-    cmd_value = Util.bytesToInt(msg.data, 5, 28)
+def parse_imgreq(fields):
     # Throw error if value incorrect
-    if cmd_value != IMG_REQ_CONST:
+    if fields["request"] != Schema.IMAGE_REQUEST:
         # Throw invalid request error
         Error.throw(0x0505)
-    # Set the camera number
-    cmd_camera = msg.data[28]
-    cam_ctrl[cmd_camera] = True
-    Util.write(str(cam_ctrl))
+        return
+    # Request a capture from the camera number
+    cam_ctrl.trigger(fields["camera"], fields["timestamp"])
+    Util.write(str(fields["camera"]))
+
+
+"""
+Dispatch table of PacketType -> parse method
+"""
+handlers = {
+    PacketType.AuxControl: parse_aux,
+    PacketType.SysControl: parse_sysctrl,
+    PacketType.ImageRequest: parse_imgreq
+}
 
 
 """
 Parsing Handler
 """
 def parse_all():
-    while len(msgQueue) > 0:
-        parse(nextMsg())
+    msg = nextMsg()
+    while msg is not None:
+        parse(msg)
+        msg = nextMsg()
 
 
 """
 Threading method, call to setup thread
+Sleeps until a message is queued
 """
 def thread_parsing():
-    global cam_ctrl
     global reset
+    ThreadStats.register("comms")
     while True:
+        msg = nextMsg(True)
         if reset:
-            msgQueue = []
-        parse_all()
+            # Drop the pending messages along with this one
+            clearQueue()
+            reset = False
+            continue
+        if msg is not None:
+            parse(msg)
 
 
 """
 Call every camera capture
 """
 def resetCam():
-    for i in range(1, len(cam_ctrl)):
-        cam_ctrl[i] = False
+    cam_ctrl.clearEvents()
 
 
 """
-Setup Parsing with all zero arrays
+Setup Parsing with all setpoints reset to zero
 """
 def setupParsing():
-    global aux_ctrl
-    global sys_ctrl
-    global cam_ctrl
-    aux_ctrl = [0] * 32
-    sys_ctrl = [0] * 32
-    cam_ctrl = [0] + [False] * 31
+    aux_ctrl.reset()
+    sys_ctrl.reset()
+    cam_ctrl.reset()
     runThread = Thread(target=thread_parsing)
     runThread.start()
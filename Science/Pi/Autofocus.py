@@ -0,0 +1,224 @@
+"""
+Closed-loop autofocus for the microscope camera.
+
+Moves the CamFocus servo (AuxCtrlID.CamFocusPos on the BeagleBone),
+captures a frame at each position and scores it with Sharpness.py,
+looking for the position with the sharpest image in as few captures
+as possible:
+
+1) Bracket the peak. From a cold start this is a coarse scan across the
+   whole servo range (COARSE_POINTS positions). With a warm start (the
+   best position of the last focus), it measures around the last best
+   position and steps outward, doubling the step, until the score drops
+   on both sides.
+2) Golden-section search inside the bracket down to TOLERANCE degrees.
+3) Fit a parabola through the best position and its measured
+   neighbours on either side and move to its vertex. With Verify the
+   vertex is captured too, and the best measured position wins.
+
+Every position is captured at most once per focus (positions are
+whole degrees, the servo command is an integer), so the searches
+share their measurements.
+
+Basic Implementation as follows:
+
+    Focuser = Autofocus(CaptureFrame, SendServo)
+    Result = Focuser.Focus()
+    Result.Position, Result.Frames, Result.Time
+
+CaptureFrame() returns a frame (array) or an image file name, and
+SendServo(Position) moves the servo. Focus() returns after moving the
+servo to the chosen position; GetStats() totals every focus so far.
+
+NOTE: scores drop near the edges of the range if the sample is out of
+the field of view entirely, so a flat curve (nothing to focus on) ends
+at the best measured position without a fit.
+
+EE Team of Husky Robotics
+"""
+import time
+import Sharpness
+
+GOLDEN = (5 ** 0.5 - 1) / 2  # 0.618...
+
+
+class FocusResult:
+
+    def __init__(self, Position, Score, Frames, Time, WarmStart):
+        self.Position = Position    # servo position chosen, degrees
+        self.Score = Score          # sharpness there (None if it was not captured)
+        self.Frames = Frames        # frames captured
+        self.Time = Time            # wall time of the whole focus, seconds
+        self.WarmStart = WarmStart  # whether the last best position was used
+
+    def __str__(self):
+        return ("Focus at " + str(self.Position) + " (sharpness " + str(self.Score) + "), " +
+                str(self.Frames) + " frames in " + ("%.2f" % self.Time) + "s" +
+                (", warm start" if self.WarmStart else ""))
+
+
+class Autofocus:
+
+    MIN_POSITION = 0     # servo range, degrees (see Motor.Servo.moveTo)
+    MAX_POSITION = 180
+    COARSE_POINTS = 7    # positions in a cold start scan
+    WARM_STEP = 6        # first step either side of the last best position
+    TOLERANCE = 2        # golden-section stops when the bracket is this narrow
+    SETTLE_TIME = 0.15   # seconds after every move before capturing
+    SLEW_TIME = 0.002    # extra seconds per degree moved
+
+    def __init__(self, Capture, Move, Metric="tenengrad", Scale=4, Roi=Sharpness.CENTER_THIRD, Verify=True):
+        self._Capture = Capture
+        self._Move = Move
+        self._Metric = Metric
+        self._Scale = Scale
+        self._Roi = Roi
+        self._Verify = Verify
+        self._LastBest = None
+        self._Position = None  # where the servo was last sent
+        self._Scores = {}      # position -> sharpness, for the focus in progress
+        self._Focuses = 0
+        self._TotalFrames = 0
+        self._TotalTime = 0.0
+        self._LastResult = None
+
+    # Runs a full focus and leaves the servo at the sharpest position.
+    # Warm=False ignores the last best position and scans the whole range.
+    def Focus(self, Warm=True):
+        Start = time.time()
+        self._Scores = {}
+        WarmStart = Warm and self._LastBest is not None
+        if WarmStart:
+            Low, High = self._WarmBracket(self._LastBest)
+        else:
+            Low, High = self._CoarseBracket()
+        self._GoldenSection(Low, High)
+        Position = self._FitPeak()
+        if self._Verify:
+            self._Measure(Position)
+            Position = self._Best()
+        if Position != self._Position:
+            self._MoveTo(Position, False)
+        self._LastBest = Position
+        Result = FocusResult(Position, self._Scores.get(Position), len(self._Scores),
+                             time.time() - Start, WarmStart)
+        self._Focuses += 1
+        self._TotalFrames += Result.Frames
+        self._TotalTime += Result.Time
+        self._LastResult = Result
+        return Result
+
+    # Forgets the last best position, the next focus is a cold start
+    def Reset(self):
+        self._LastBest = None
+
+    def GetLastBest(self):
+        return self._LastBest
+
+    # Returns { "focuses", "frames", "time", "averageFrames", "averageTime", "last" }
+    def GetStats(self):
+        Count = max(self._Focuses, 1)
+        return {
+            "focuses": self._Focuses,
+            "frames": self._TotalFrames,
+            "time": self._TotalTime,
+            "averageFrames": self._TotalFrames / float(Count),
+            "averageTime": self._TotalTime / Count,
+            "last": self._LastResult
+        }
+
+    # Scans COARSE_POINTS evenly spaced positions and returns the bracket
+    # between the neighbours of the best one
+    # Meant for internal use only
+    def _CoarseBracket(self):
+        Step = (self.MAX_POSITION - self.MIN_POSITION) / float(self.COARSE_POINTS - 1)
+        Positions = [int(round(self.MIN_POSITION + I * Step)) for I in range(self.COARSE_POINTS)]
+        for Position in Positions:
+            self._Measure(Position)
+        Index = Positions.index(self._Best())
+        return Positions[max(Index - 1, 0)], Positions[min(Index + 1, len(Positions) - 1)]
+
+    # Measures either side of Center, then steps toward the sharper side,
+    # doubling the step, until the score drops
+    # Meant for internal use only
+    def _WarmBracket(self, Center):
+        Step = self.WARM_STEP
+        Low = self._Clamp(Center - Step)
+        High = self._Clamp(Center + Step)
+        for Position in (Center, Low, High):
+            self._Measure(Position)
+        Best = Center
+        while True:
+            if self._Scores[Low] > self._Scores[Best] and Low < Best:
+                Best, High = Low, Best
+                Step *= 2
+                Low = self._Clamp(Best - Step)
+            elif self._Scores[High] > self._Scores[Best] and High > Best:
+                Best, Low = High, Best
+                Step *= 2
+                High = self._Clamp(Best + Step)
+            else:
+                return Low, High  # Best is the peak of Low, Best, High
+            self._Measure(Low)
+            self._Measure(High)
+
+    # Narrows [Low, High] around the peak until it is TOLERANCE wide
+    # Meant for internal use only
+    def _GoldenSection(self, Low, High):
+        Left = int(round(High - GOLDEN * (High - Low)))
+        Right = int(round(Low + GOLDEN * (High - Low)))
+        while High - Low > self.TOLERANCE and Left < Right:
+            if self._Measure(Left) > self._Measure(Right):
+                High = Right
+                Right = Left
+                Left = int(round(High - GOLDEN * (High - Low)))
+            else:
+                Low = Left
+                Left = Right
+                Right = int(round(Low + GOLDEN * (High - Low)))
+            if Left == Right:
+                self._Measure(Left)
+                break
+
+    # Returns the vertex of the parabola through the best measured position
+    # and its closest measured neighbours, or the best position if it is
+    # at the edge of the measurements or the curve is not a peak
+    # Meant for internal use only
+    def _FitPeak(self):
+        B = self._Best()
+        Lower = [Position for Position in self._Scores if Position < B]
+        Upper = [Position for Position in self._Scores if Position > B]
+        if not Lower or not Upper:
+            return B
+        A = max(Lower)
+        C = min(Upper)
+        Fa, Fb, Fc = self._Scores[A], self._Scores[B], self._Scores[C]
+        Denominator = (B - A) * (Fb - Fc) - (B - C) * (Fb - Fa)
+        if Denominator <= 0:
+            return B  # Flat or not a maximum
+        Vertex = B - 0.5 * ((B - A) ** 2 * (Fb - Fc) - (B - C) ** 2 * (Fb - Fa)) / Denominator
+        return int(round(min(max(Vertex, A), C)))
+
+    # Returns the sharpness at Position, capturing a frame the first time
+    # Meant for internal use only
+    def _Measure(self, Position):
+        if Position not in self._Scores:
+            self._MoveTo(Position, True)
+            self._Scores[Position] = Sharpness.Measure(self._Capture(), self._Metric, self._Roi, self._Scale)
+        return self._Scores[Position]
+
+    # Meant for internal use only
+    def _MoveTo(self, Position, Settle):
+        Distance = abs(Position - self._Position) if self._Position is not None else self.MAX_POSITION
+        self._Move(Position)
+        self._Position = Position
+        if Settle:
+            time.sleep(self.SETTLE_TIME + self.SLEW_TIME * Distance)
+
+    # Meant for internal use only
+    def _Best(self):
+        return max(self._Scores, key=lambda Position: self._Scores[Position])
+
+    # Meant for internal use only
+    def _Clamp(self, Position):
+        return int(min(max(Position, self.MIN_POSITION), self.MAX_POSITION))
@@ -0,0 +1,501 @@
+"""
+Persistent capture service for the microscope camera.
+
+fswebcam opened the camera, waited for the sensor to settle, wrote a
+JPEG to the SD card and exited for every picture, and the autofocus
+then decoded that file again. The service here opens the camera once
+and keeps it streaming: V4L2Source memory-maps the driver's frame
+buffers (VIDIOC_REQBUFS / QBUF / DQBUF), and a capture thread always
+holds the newest frame, handing the previous buffer back to the driver.
+Frames are converted to NumPy arrays straight from the mapped buffer:
+
+    GetFrame()               - grayscale (H, W) array, for Sharpness.py
+    GetFrame(Channels=True)  - RGB (H, W, 3) array
+    GetFrame(Fresh=True)     - waits for a frame exposed after the call,
+                               e.g. after moving the focus servo
+    Save(File)               - queues the newest frame to be written as a
+                               full resolution JPEG by a background thread
+
+With YUYV the grayscale frame is the luma plane, so no decoding is
+needed at all. MJPG frames are decoded with PIL, and saved as they came
+from the camera without re-encoding.
+
+FileSource stands in for the camera off the Pi, replaying JPEG files as
+MJPG frames at a fixed rate; a v4l2loopback device works with
+V4L2Source as it is.
+
+Basic Implementation as follows:
+
+    Cam = Camera(V4L2Source("/dev/video0", 1600, 1200))
+    Cam.Start()
+    Sharpness.Measure(Cam.GetFrame(Fresh=True))
+    Cam.Save("test060.jpg")
+    Cam.Stop()
+
+NOTE: only one process can stream from a camera, fswebcam will fail
+with "device busy" while the service is running.
+
+EE Team of Husky Robotics
+"""
+import io
+import os
+import sys
+import mmap
+import time
+import errno
+import select
+import ctypes
+import threading
+from fcntl import ioctl
+import numpy
+from PIL import Image
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+# ctypes versions of the V4L2 structs defined by the kernel (linux/videodev2.h).
+class v4l2_capability(ctypes.Structure):
+    _fields_ = [("driver", ctypes.c_char * 16),
+                ("card", ctypes.c_char * 32),
+                ("bus_info", ctypes.c_char * 32),
+                ("version", ctypes.c_uint32),
+                ("capabilities", ctypes.c_uint32),
+                ("device_caps", ctypes.c_uint32),
+                ("reserved", ctypes.c_uint32 * 3)]
+
+
+class v4l2_pix_format(ctypes.Structure):
+    _fields_ = [("width", ctypes.c_uint32),
+                ("height", ctypes.c_uint32),
+                ("pixelformat", ctypes.c_uint32),
+                ("field", ctypes.c_uint32),
+                ("bytesperline", ctypes.c_uint32),
+                ("sizeimage", ctypes.c_uint32),
+                ("colorspace", ctypes.c_uint32),
+                ("priv", ctypes.c_uint32),
+                ("flags", ctypes.c_uint32),
+                ("ycbcr_enc", ctypes.c_uint32),
+                ("quantization", ctypes.c_uint32),
+                ("xfer_func", ctypes.c_uint32)]
+
+
+class v4l2_format_union(ctypes.Union):
+    # The kernel union holds pointers (struct v4l2_window), align the same way
+    _fields_ = [("pix", v4l2_pix_format),
+                ("raw_data", ctypes.c_char * 200),
+                ("align", ctypes.c_void_p)]
+
+
+class v4l2_format(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32),
+                ("fmt", v4l2_format_union)]
+
+
+class v4l2_requestbuffers(ctypes.Structure):
+    _fields_ = [("count", ctypes.c_uint32),
+                ("type", ctypes.c_uint32),
+                ("memory", ctypes.c_uint32),
+                ("reserved", ctypes.c_uint32 * 2)]
+
+
+class timeval(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long),
+                ("tv_usec", ctypes.c_long)]
+
+
+class v4l2_timecode(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32),
+                ("flags", ctypes.c_uint32),
+                ("frames", ctypes.c_uint8),
+                ("seconds", ctypes.c_uint8),
+                ("minutes", ctypes.c_uint8),
+                ("hours", ctypes.c_uint8),
+                ("userbits", ctypes.c_uint8 * 4)]
+
+
+class v4l2_buffer_m(ctypes.Union):
+    _fields_ = [("offset", ctypes.c_uint32),
+                ("userptr", ctypes.c_ulong),
+                ("fd", ctypes.c_int32)]
+
+
+class v4l2_buffer(ctypes.Structure):
+    _fields_ = [("index", ctypes.c_uint32),
+                ("type", ctypes.c_uint32),
+                ("bytesused", ctypes.c_uint32),
+                ("flags", ctypes.c_uint32),
+                ("field", ctypes.c_uint32),
+                ("timestamp", timeval),
+                ("timecode", v4l2_timecode),
+                ("sequence", ctypes.c_uint32),
+                ("memory", ctypes.c_uint32),
+                ("m", v4l2_buffer_m),
+                ("length", ctypes.c_uint32),
+                ("reserved2", ctypes.c_uint32),
+                ("reserved", ctypes.c_uint32)]
+
+
+# _IOC from asm-generic/ioctl.h
+def _IOC(Direction, Number, Struct):
+    return (Direction << 30) | (ctypes.sizeof(Struct) << 16) | (ord("V") << 8) | Number
+
+IOC_WRITE = 1
+IOC_READ = 2
+
+VIDIOC_QUERYCAP = _IOC(IOC_READ, 0, v4l2_capability)
+VIDIOC_S_FMT = _IOC(IOC_READ | IOC_WRITE, 5, v4l2_format)
+VIDIOC_REQBUFS = _IOC(IOC_READ | IOC_WRITE, 8, v4l2_requestbuffers)
+VIDIOC_QUERYBUF = _IOC(IOC_READ | IOC_WRITE, 9, v4l2_buffer)
+VIDIOC_QBUF = _IOC(IOC_READ | IOC_WRITE, 15, v4l2_buffer)
+VIDIOC_DQBUF = _IOC(IOC_READ | IOC_WRITE, 17, v4l2_buffer)
+VIDIOC_STREAMON = _IOC(IOC_WRITE, 18, ctypes.c_int)
+VIDIOC_STREAMOFF = _IOC(IOC_WRITE, 19, ctypes.c_int)
+
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_MEMORY_MMAP = 1
+V4L2_FIELD_NONE = 1
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_STREAMING = 0x04000000
+
+
+def FourCC(Code):
+    return ord(Code[0]) | (ord(Code[1]) << 8) | (ord(Code[2]) << 16) | (ord(Code[3]) << 24)
+
+FORMATS = ("YUYV", "MJPG", "GREY")
+
+
+class Frame:
+
+    def __init__(self, Data, Sequence, Timestamp, Index=None):
+        self.Data = Data            # uint8 array of the frame bytes, only valid while the frame is held
+        self.Sequence = Sequence    # frames captured before this one
+        self.Timestamp = Timestamp  # time.time() when it was dequeued
+        self.Index = Index          # driver buffer the data is mapped from
+
+
+class V4L2Source:
+
+    BUFFERS = 4  # driver buffers mapped, one is always held by the service
+
+    def __init__(self, Device="/dev/video0", Width=1600, Height=1200, Format="YUYV"):
+        if Format not in FORMATS:
+            raise ValueError("Unsupported format " + str(Format) + ", expected one of " + str(FORMATS))
+        self.Device = Device
+        self.Width = Width
+        self.Height = Height
+        self.Format = Format
+        self.BytesPerLine = 0
+        self._Fd = None
+        self._Maps = []
+        self._Views = []  # uint8 arrays over each mapped buffer
+        self._Sequence = 0
+
+    # Opens the device, sets the format, maps the buffers and starts streaming
+    def Open(self):
+        self._Fd = os.open(self.Device, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            Cap = v4l2_capability()
+            ioctl(self._Fd, VIDIOC_QUERYCAP, Cap)
+            if not Cap.capabilities & V4L2_CAP_VIDEO_CAPTURE or not Cap.capabilities & V4L2_CAP_STREAMING:
+                raise IOError(self.Device + " cannot stream video capture")
+            Format = v4l2_format()
+            Format.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+            Format.fmt.pix.width = self.Width
+            Format.fmt.pix.height = self.Height
+            Format.fmt.pix.pixelformat = FourCC(self.Format)
+            Format.fmt.pix.field = V4L2_FIELD_NONE
+            ioctl(self._Fd, VIDIOC_S_FMT, Format)
+            if Format.fmt.pix.pixelformat != FourCC(self.Format):
+                raise IOError(self.Device + " does not support " + self.Format)
+            # The driver may pick the closest size it supports
+            self.Width = Format.fmt.pix.width
+            self.Height = Format.fmt.pix.height
+            self.BytesPerLine = Format.fmt.pix.bytesperline
+            self._MapBuffers()
+            ioctl(self._Fd, VIDIOC_STREAMON, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        except:
+            self.Close()
+            raise
+
+    # Returns the next frame, or None if none arrived within Timeout seconds
+    def Read(self, Timeout=1.0):
+        if not select.select([self._Fd], [], [], Timeout)[0]:
+            return None
+        Buffer = v4l2_buffer()
+        Buffer.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+        Buffer.memory = V4L2_MEMORY_MMAP
+        try:
+            ioctl(self._Fd, VIDIOC_DQBUF, Buffer)
+        except IOError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return None
+            raise
+        self._Sequence += 1
+        Data = self._Views[Buffer.index][:Buffer.bytesused]
+        return Frame(Data, self._Sequence, time.time(), Buffer.index)
+
+    # Hands the buffer of Frame back to the driver
+    def Release(self, Frame):
+        self._Queue(Frame.Index)
+
+    def Close(self):
+        if self._Fd is None:
+            return
+        try:
+            ioctl(self._Fd, VIDIOC_STREAMOFF, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        except IOError:
+            pass
+        self._Views = []  # The maps cannot be closed while arrays point into them
+        for Map in self._Maps:
+            Map.close()
+        self._Maps = []
+        os.close(self._Fd)
+        self._Fd = None
+
+    # Meant for internal use only
+    def _MapBuffers(self):
+        Request = v4l2_requestbuffers()
+        Request.count = self.BUFFERS
+        Request.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+        Request.memory = V4L2_MEMORY_MMAP
+        ioctl(self._Fd, VIDIOC_REQBUFS, Request)
+        if Request.count < 2:
+            raise IOError(self.Device + " gave " + str(Request.count) + " buffers, need at least 2")
+        for Index in range(Request.count):
+            Buffer = v4l2_buffer()
+            Buffer.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+            Buffer.memory = V4L2_MEMORY_MMAP
+            Buffer.index = Index
+            ioctl(self._Fd, VIDIOC_QUERYBUF, Buffer)
+            Map = mmap.mmap(self._Fd, Buffer.length, mmap.MAP_SHARED,
+                            mmap.PROT_READ | mmap.PROT_WRITE, offset=Buffer.m.offset)
+            self._Maps.append(Map)
+            self._Views.append(numpy.frombuffer(Map, numpy.uint8))
+            self._Queue(Index)
+
+    # Meant for internal use only
+    def _Queue(self, Index):
+        Buffer = v4l2_buffer()
+        Buffer.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+        Buffer.memory = V4L2_MEMORY_MMAP
+        Buffer.index = Index
+        ioctl(self._Fd, VIDIOC_QBUF, Buffer)
+
+
+class FileSource:
+
+    # Replays the JPEG Files in a loop as MJPG frames, Rate frames per second
+    def __init__(self, Files, Rate=15.0):
+        if not Files:
+            raise ValueError("FileSource needs at least one file")
+        self.Files = list(Files)
+        self.Rate = Rate
+        self.Format = "MJPG"
+        self.Width, self.Height = Image.open(self.Files[0]).size
+        self.BytesPerLine = 0
+        self._Frames = []
+        self._Sequence = 0
+        self._Next = 0.0
+
+    def Open(self):
+        self._Frames = []
+        for File in self.Files:
+            with open(File, "rb") as Source:
+                self._Frames.append(Source.read())
+        self._Next = time.time()
+
+    def Read(self, Timeout=1.0):
+        Wait = self._Next - time.time()
+        if Wait > Timeout:
+            time.sleep(Timeout)
+            return None
+        if Wait > 0:
+            time.sleep(Wait)
+        self._Next = max(self._Next + 1.0 / self.Rate, time.time())
+        Data = self._Frames[self._Sequence % len(self._Frames)]
+        self._Sequence += 1
+        return Frame(numpy.frombuffer(Data, numpy.uint8), self._Sequence, time.time())
+
+    def Release(self, Frame):
+        pass
+
+    def Close(self):
+        self._Frames = []
+
+
+class Camera:
+
+    SKIP_FRAMES = 5      # frames dropped after starting while exposure settles
+    SAVE_QUEUE = 4       # JPEGs waiting to be written before Save() drops them
+    JPEG_QUALITY = 90    # when a raw frame has to be encoded
+    FRAME_TIMEOUT = 2.0  # seconds GetFrame() waits before giving up
+
+    def __init__(self, Source):
+        self.Source = Source
+        self._Lock = threading.Condition(threading.Lock())
+        self._Held = None  # newest frame, its buffer stays out of the driver
+        self._Running = False
+        self._Thread = None
+        self._SaveQueue = queue.Queue(self.SAVE_QUEUE)
+        self._SaveThread = None
+        self._Frames = 0
+        self._Saved = 0
+        self._SaveDropped = 0
+        self._Error = None
+
+    # Opens the source and starts the capture and save threads
+    def Start(self):
+        if self._Running:
+            return
+        self.Source.Open()
+        self._Running = True
+        self._Error = None
+        self._Thread = threading.Thread(target=self._Run, name="Camera")
+        self._Thread.daemon = True
+        self._Thread.start()
+        self._SaveThread = threading.Thread(target=self._RunSave, name="CameraSave")
+        self._SaveThread.daemon = True
+        self._SaveThread.start()
+
+    # Stops capturing, waits for queued JPEGs and closes the source
+    def Stop(self):
+        if not self._Running:
+            return
+        self._Running = False
+        with self._Lock:
+            self._Lock.notify_all()
+        self._Thread.join(2.0)
+        self._SaveQueue.put(None)
+        self._SaveThread.join()
+        with self._Lock:
+            self._Held = None
+        self.Source.Close()
+
+    # Returns the newest frame as an array, grayscale (H, W) or
+    # Channels=True for RGB (H, W, 3). Fresh=True waits for a frame
+    # whose exposure started after this call.
+    def GetFrame(self, Channels=False, Fresh=False):
+        with self._Lock:
+            Frame = self._Wait(Fresh)
+            return self._Convert(Frame, Channels)
+
+    # Queues the newest frame to be written to File as a JPEG, returns
+    # False if the save queue is full and the frame was dropped
+    def Save(self, File, Fresh=False):
+        with self._Lock:
+            Frame = self._Wait(Fresh)
+            if self.Source.Format == "MJPG":
+                Payload = Frame.Data.tobytes()  # Already a JPEG, write as it is
+            else:
+                Payload = self._Convert(Frame, self.Source.Format != "GREY")
+        try:
+            self._SaveQueue.put_nowait((File, Payload))
+            return True
+        except queue.Full:
+            self._SaveDropped += 1
+            return False
+
+    # Returns { "running", "format", "width", "height", "frames", "saved", "saveDropped" }
+    def GetStats(self):
+        return {
+            "running": self._Running,
+            "format": self.Source.Format,
+            "width": self.Source.Width,
+            "height": self.Source.Height,
+            "frames": self._Frames,
+            "saved": self._Saved,
+            "saveDropped": self._SaveDropped
+        }
+
+    # Returns the held frame, waiting for one captured after two more
+    # frames if Fresh (the next one may already have been exposing)
+    # Meant for internal use only, caller holds self._Lock
+    def _Wait(self, Fresh):
+        Sequence = self._Held.Sequence if self._Held is not None else 0
+        Needed = Sequence + 2 if Fresh else max(Sequence, 1)
+        Deadline = time.time() + self.FRAME_TIMEOUT
+        while self._Held is None or self._Held.Sequence < Needed:
+            if self._Error is not None:
+                raise IOError("Camera capture failed: " + str(self._Error))
+            Remaining = Deadline - time.time()
+            if not self._Running or Remaining <= 0:
+                raise IOError("No frame from the camera")
+            self._Lock.wait(Remaining)
+        return self._Held
+
+    # Meant for internal use only
+    def _Convert(self, Frame, Channels):
+        Format = self.Source.Format
+        Width = self.Source.Width
+        Height = self.Source.Height
+        if Format == "MJPG":
+            ImgObj = Image.open(io.BytesIO(Frame.Data.tobytes()))
+            ImgObj = ImgObj.convert("RGB" if Channels else "L")
+            return numpy.asarray(ImgObj)
+        Pitch = self.Source.BytesPerLine or Width * (2 if Format == "YUYV" else 1)
+        Data = Frame.Data[:Height * Pitch].reshape(Height, Pitch)
+        if Format == "GREY":
+            Gray = Data[:, :Width].copy()
+            return numpy.dstack((Gray, Gray, Gray)) if Channels else Gray
+        if not Channels:
+            return Data[:, 0:Width * 2:2].copy()  # Y of every Y U Y V pair
+        return YUYVToRGB(Data[:, :Width * 2])
+
+    # Keeps the newest frame, handing the one it replaces back to the source
+    # Meant for internal use only
+    def _Run(self):
+        Skip = self.SKIP_FRAMES
+        try:
+            while self._Running:
+                Frame = self.Source.Read()
+                if Frame is None:
+                    continue
+                if Skip > 0:
+                    Skip -= 1
+                    self.Source.Release(Frame)
+                    continue
+                with self._Lock:
+                    Previous = self._Held
+                    self._Held = Frame
+                    self._Frames += 1
+                    self._Lock.notify_all()
+                if Previous is not None:
+                    self.Source.Release(Previous)
+        except Exception as e:
+            sys.stdout.write("Camera capture stopped: " + str(e) + "\n")
+            with self._Lock:
+                self._Error = e
+                self._Lock.notify_all()
+
+    # Writes queued JPEGs until Stop()
+    # Meant for internal use only
+    def _RunSave(self):
+        while True:
+            Item = self._SaveQueue.get()
+            if Item is None:
+                return
+            File, Payload = Item
+            try:
+                if isinstance(Payload, bytes):
+                    with open(File, "wb") as Output:
+                        Output.write(Payload)
+                else:
+                    Image.fromarray(Payload).save(File, "JPEG", quality=self.JPEG_QUALITY)
+                self._Saved += 1
+            except (IOError, OSError) as e:
+                sys.stdout.write("Could not save " + File + ": " + str(e) + "\n")
+
+
+# Converts an (H, W * 2) array of Y U Y V bytes to an (H, W, 3) RGB array (BT.601)
+def YUYVToRGB(Data):
+    Y = Data[:, 0::2].astype(numpy.float32)
+    U = numpy.repeat(Data[:, 1::4].astype(numpy.float32) - 128, 2, axis=1)
+    V = numpy.repeat(Data[:, 3::4].astype(numpy.float32) - 128, 2, axis=1)
+    RGB = numpy.empty(Y.shape + (3,), numpy.float32)
+    RGB[..., 0] = Y + 1.402 * V
+    RGB[..., 1] = Y - 0.344 * U - 0.714 * V
+    RGB[..., 2] = Y + 1.772 * U
+    return numpy.clip(RGB, 0, 255).astype(numpy.uint8)
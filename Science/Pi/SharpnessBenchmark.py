@@ -0,0 +1,98 @@
+"""
+Per-frame benchmark of Sharpness.py against the original pure Python
+sharpness calculation from MainST.py (copied below as it was before
+Sharpness existed).
+
+Run on the Pi from this directory with:
+    python SharpnessBenchmark.py [first image] [last image]
+
+Times each method over the test images (test030.jpg - test035.jpg by
+default), including opening and decoding the JPEG, and prints the
+milliseconds per frame and the speedup over the original. It also
+checks that GradientEnergy over RGB gives exactly the original value.
+"""
+import sys
+import time
+from PIL import Image
+import Sharpness
+
+
+# Cuts out the specified part of the image to prepare for sharpness calculations.
+def LegacyPrepareImageData(ImgData, StartX, StartY, EndX, EndY):
+    Output = [[0 for Y in range(StartY, EndY + 1)] for X in range(StartX, EndX + 1)]
+    for Y in range(StartY, EndY):
+        for X in range(StartX, EndX):
+            Output[X - StartX][Y - StartY] = ImgData[X, Y]
+    return Output
+
+
+# Calculates the sharpness of a prepared data set.
+def LegacyGetSharpnessBasic(ImgData, Width, Height):
+    Sum = 0
+    for Y in range(0, Height - 1):
+        for X in range(0, Width - 1):
+            Sum += ((ImgData[X+1][Y][0] - ImgData[X][Y][0]) ** 2)
+            Sum += ((ImgData[X+1][Y][1] - ImgData[X][Y][1]) ** 2)
+            Sum += ((ImgData[X+1][Y][2] - ImgData[X][Y][2]) ** 2)
+            Sum += ((ImgData[X][Y][0] - ImgData[X][Y+1][0]) ** 2)
+            Sum += ((ImgData[X][Y][1] - ImgData[X][Y+1][1]) ** 2)
+            Sum += ((ImgData[X][Y][2] - ImgData[X][Y+1][2]) ** 2)
+    return Sum
+
+
+def LegacyTestImage(File):
+    ImgObj = Image.open(File)
+    ImgDataRaw = ImgObj.load()
+    SizeRaw = ImgObj.size
+    Left = SizeRaw[0] * 1 // 3
+    Right = SizeRaw[0] * 2 // 3
+    Top = SizeRaw[1] * 1 // 3
+    Bottom = SizeRaw[1] * 2 // 3
+    ImgData = LegacyPrepareImageData(ImgDataRaw, Left, Top, Right, Bottom)
+    return LegacyGetSharpnessBasic(ImgData, Right - Left, Bottom - Top)
+
+
+# Returns (milliseconds per frame, scores) of Method over Files, best of Repeat runs
+def TimeMethod(Method, Files, Repeat):
+    Best = None
+    for I in range(Repeat):
+        Start = time.time()
+        Scores = [Method(File) for File in Files]
+        Elapsed = time.time() - Start
+        if Best is None or Elapsed < Best:
+            Best = Elapsed
+    return Best / len(Files) * 1000.0, Scores
+
+
+def Main(Min=30, Max=35, Repeat=3):
+    Files = ["test0" + str(I).zfill(2) + ".jpg" for I in range(Min, Max + 1)]
+    Methods = (
+        ("gradient RGB", lambda File: Sharpness.Measure(File, "gradient", Channels=True)),
+        ("gradient gray", lambda File: Sharpness.Measure(File, "gradient")),
+        ("tenengrad gray", lambda File: Sharpness.Measure(File, "tenengrad")),
+        ("laplacian gray", lambda File: Sharpness.Measure(File, "laplacian")),
+        ("tenengrad gray /2", lambda File: Sharpness.Measure(File, "tenengrad", Scale=2)),
+        ("tenengrad gray /4", lambda File: Sharpness.Measure(File, "tenengrad", Scale=4)),
+        ("laplacian gray /4", lambda File: Sharpness.Measure(File, "laplacian", Scale=4)),
+    )
+
+    # The original takes seconds per frame, so it only runs once
+    LegacyMs, LegacyScores = TimeMethod(LegacyTestImage, Files, 1)
+    sys.stdout.write("%-20s %12s %10s\n" % ("method", "ms / frame", "speedup"))
+    sys.stdout.write("%-20s %12.1f %10s\n" % ("legacy RGB", LegacyMs, "1.0x"))
+    for Name, Method in Methods:
+        Ms, Scores = TimeMethod(Method, Files, Repeat)
+        sys.stdout.write("%-20s %12.1f %9.1fx\n" % (Name, Ms, LegacyMs / Ms))
+        if Name == "gradient RGB" and Scores != LegacyScores:
+            sys.stdout.write("MISMATCH: legacy " + str(LegacyScores) + " != " + str(Scores) + "\n")
+
+    # Every metric should rank the images the same way
+    sys.stdout.write("\nScores per image:\n")
+    for File in Files:
+        sys.stdout.write("%s  %14d  %10.1f  %10.1f\n" % (
+            File, Sharpness.Measure(File, "gradient", Channels=True),
+            Sharpness.Measure(File, "tenengrad"), Sharpness.Measure(File, "laplacian")))
+
+
+if __name__ == "__main__":
+    Main(*[int(Arg) for Arg in sys.argv[1:3]])
@@ -1,18 +1,19 @@
-import os
 import datetime
 import RPi.GPIO as GPIO
+from Camera import Camera, V4L2Source
 
 GPIO.setmode(GPIO.BOARD)
 in_pin = 16
 GPIO.setup(in_pin, GPIO.IN)
+cam = Camera(V4L2Source("/dev/video0", 1600, 1200))
+cam.Start()
 while True:
     try:
         GPIO.wait_for_edge(in_pin, GPIO.FALLING)
         name = (''.join(str(datetime.datetime.now()).split(".")).replace(" ","") + '.jpg')
-        command = "fswebcam -r 1600x1200 " + name
-        print(command)
-        os.system("ping 8.8.8.8")
-        #os.system(command)
+        print("Saving " + name)
+        cam.Save(name)
     except KeyboardInterrupt:
-        GPIO.cleanup()
+        cam.Stop()
+        break
 GPIO.cleanup()
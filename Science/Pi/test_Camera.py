@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import pytest
+
+numpy = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from Camera import Camera, FileSource
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FILES = [os.path.join(HERE, "test030.jpg"), os.path.join(HERE, "test031.jpg")]
+
+
+@pytest.fixture
+def cam():
+    Cam = Camera(FileSource(FILES, Rate=50.0))
+    Cam.SKIP_FRAMES = 1
+    Cam.Start()
+    yield Cam
+    Cam.Stop()
+
+
+class TestFileSource:
+    def test_grayscale_frame(self, cam):
+        Frame = cam.GetFrame()
+        assert Frame.shape == (1200, 1600)
+        assert Frame.dtype == numpy.uint8
+
+    def test_rgb_frame(self, cam):
+        Frame = cam.GetFrame(Channels=True)
+        assert Frame.shape == (1200, 1600, 3)
+        assert Frame.dtype == numpy.uint8
+
+    def test_fresh_frame_advances(self, cam):
+        cam.GetFrame()
+        Before = cam.GetStats()["frames"]
+        cam.GetFrame(Fresh=True)
+        assert cam.GetStats()["frames"] >= Before + 2
+
+    def test_save_writes_jpeg(self, cam):
+        Path = tempfile.mkdtemp()
+        try:
+            File = os.path.join(Path, "frame.jpg")
+            assert cam.Save(File)
+            cam.Stop()  # Waits for the save queue
+            with open(File, "rb") as Saved:
+                assert Saved.read(2) == b"\xff\xd8"
+            assert cam.GetStats()["saved"] == 1
+        finally:
+            shutil.rmtree(Path)
@@ -6,6 +6,7 @@ import Error
 import Util
 import Parse
 from Packet import Packet, PacketType
+from Uplink import Uplink
 from SystemTelemetry import SystemTelemetry
 
 LISTEN = True
@@ -34,8 +35,22 @@ picT.start()
 SOCKET = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 if LISTEN:
     SOCKET.bind(('192.168.0.104', 22))
+    SOCKET.listen(1)
     while True:
-        SOCKET.listen(1)
         client, clientAddr = SOCKET.accept()
-        data = client.recv(1024)
-        sys.stdout.write("\nData Received: " + str(data) + "\n\tFrom: " + str(clientAddr))
+        # Packets arrive length-framed on one persistent stream (see Uplink.py)
+        buffer = b''
+        while True:
+            data = client.recv(1024)
+            if not data:
+                break
+            buffer += data
+            while len(buffer) >= Uplink.FRAME_HEADER.size:
+                length = Uplink.FRAME_HEADER.unpack_from(buffer)[0]
+                end = Uplink.FRAME_HEADER.size + length
+                if len(buffer) < end:
+                    break
+                packet = buffer[Uplink.FRAME_HEADER.size:end]
+                buffer = buffer[end:]
+                sys.stdout.write("\nData Received: " + str(packet) + "\n\tFrom: " + str(clientAddr))
+        client.close()
@@ -0,0 +1,285 @@
+"""
+Science station wire format, shared by the Science station and the
+base station (Prototyping/BaseStation/BaseStation UI/ui_components/comms_update.py).
+
+Every packet starts with the same header, added by Packet.addTimeID():
+
+    [ 4 byte UNIX time ][ 1 byte PacketType ][ body ... ]
+
+AuxControl and SysControl bodies start with a 1 byte command ID
+(AuxCtrlID / SysCtrlID) followed by the value for that command.
+All fields are big-endian.
+
+The layouts below are compiled once by _compile_schema() into
+struct.Struct objects covering the whole packet (header included), so
+packing or unpacking a packet is a single struct call and dispatching
+on the header byte is a dictionary lookup.
+
+NOTE: This module must not import anything from the Science station
+other than the standard library, the base station imports it directly.
+
+EE Team of Husky Robotics
+"""
+import re
+import struct
+
+
+# Packet Type Enumeration:
+
+
+class PacketType:
+    PrimarySensor = 0x00
+    Error = 0x01
+    AuxSensor = 0x02
+    SystemTelemetry = 0x03
+    ImageRequest = 0x80
+    AuxControl = 0x81
+    SysControl = 0x82
+
+
+class AuxCtrlID:
+    MoveDrill = 0x00
+    DrillRPM = 0x01
+    CamFocusPos = 0x02
+    RotateArmature = 0x03
+
+
+class CameraID:
+    Microscope = 0x01
+    Microscope_AF = 0x02
+
+
+class SysCtrlID:
+    Ping = 0x00
+    Reboot = 0x01
+
+
+class Protocol:
+    '''
+    Packet layouts, in the same form as Communications/comms.py
+
+    A definition is a tuple of the format (header, format_string, descriptor)
+        - header is the PacketType byte
+        - format_string is the struct format of the body (after the time and ID
+          header), without the byte order character
+        - descriptor is a tuple of labels for each value in the format string
+
+    AuxControl and SysControl only describe the command ID byte here, the value
+    that follows it is described per command in AuxCommands / SysCommands.
+    '''
+
+    PrimarySensor = (PacketType.PrimarySensor, "HIHHH",
+                     ("distance", "uv", "thermocouple", "internal_temp", "humidity"))
+    Error = (PacketType.Error, "HH", ("code", "count"))
+    AuxSensor = (PacketType.AuxSensor, "HHHBBB",
+                 ("encoder1", "encoder2", "encoder3", "limit1", "limit2", "limit3"))
+    SystemTelemetry = (PacketType.SystemTelemetry, "14H",
+                       ("cpu_usage", "ram_usage", "ram_capacity", "active_threads",
+                        "flash_usage", "flash_capacity", "sd_card_usage", "sd_card_capacity",
+                        "send_queue_depth", "send_queue_drops", "thread_cpu_encoders",
+                        "thread_cpu_comms", "thread_cpu_commands", "thread_cpu_sensors"))
+    ImageRequest = (PacketType.ImageRequest, "23sB", ("request", "camera"))
+    AuxControl = (PacketType.AuxControl, "B", ("cmd_id",))
+    SysControl = (PacketType.SysControl, "B", ("cmd_id",))
+
+
+class AuxCommands:
+    '''
+    Value layouts of AuxControl commands, (cmd_id, format_string, descriptor)
+    '''
+
+    MoveDrill = (AuxCtrlID.MoveDrill, "I", ("value",))
+    DrillRPM = (AuxCtrlID.DrillRPM, "i", ("value",))
+    CamFocusPos = (AuxCtrlID.CamFocusPos, "I", ("value",))
+    RotateArmature = (AuxCtrlID.RotateArmature, "i", ("value",))
+
+
+class SysCommands:
+    '''
+    Value layouts of SysControl commands, (cmd_id, format_string, descriptor)
+    '''
+
+    Ping = (SysCtrlID.Ping, "I", ("value",))
+    Reboot = (SysCtrlID.Reboot, "I", ("value",))
+
+
+# Value of the "request" field of a valid ImageRequest (Parse.IMG_REQ_CONST)
+IMAGE_REQUEST = b"\x00" * 5 + b"I can haz picture?"
+
+HEADER = struct.Struct(">IB")
+HEADER_FIELDS = ("timestamp", "type")
+_COMMAND_ID = struct.Struct(">B")
+_FORMAT_CODE = re.compile(r"(\d*)([a-zA-Z?])")
+
+_commandTables = {
+    PacketType.AuxControl: AuxCommands,
+    PacketType.SysControl: SysCommands
+}
+
+_compiled = False
+_layouts = dict()  # PacketType -> Layout
+_commands = dict()  # PacketType -> { cmd_id -> Layout }
+
+
+class Layout:
+    '''
+    A compiled packet layout
+
+    struct covers the whole packet, header included, body covers
+    everything after the header (what Packet.appendData() takes).
+    '''
+
+    def __init__(self, header, fmt, descriptor, cmd_id=None):
+        self.header = header
+        self.cmd_id = cmd_id
+        self.fields = tuple(descriptor)
+        self.struct = struct.Struct(">" + HEADER.format.lstrip(">") + fmt)
+        self.body = struct.Struct(">" + fmt)
+        self.size = self.struct.size
+        self.names = HEADER_FIELDS + self.fields
+        # Struct code and byte offset in the packet of each field, and the
+        # (smallest, largest) value each integer field can hold (used if a
+        # value is out of range)
+        self.codes = []
+        self.offsets = []
+        self.limits = []
+        offset = HEADER.size
+        for count, code in _FORMAT_CODE.findall(fmt):
+            fieldCode = count + code if code in "sp" else code
+            count = 1 if code in "sp" or not count else int(count)
+            limit = None
+            if code in "bBhHiIlLqQ":
+                bits = 8 * struct.calcsize(">" + code)
+                if code.isupper():
+                    limit = (0, (1 << bits) - 1)
+                else:
+                    limit = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+            for i in range(count):
+                self.codes.append(fieldCode)
+                self.offsets.append(offset)
+                self.limits.append(limit)
+                offset += struct.calcsize(">" + fieldCode)
+
+    # Packs the body, saturating any value that does not fit its field
+    def packBody(self, values):
+        try:
+            return self.body.pack(*values)
+        except struct.error:
+            return self.body.pack(*self._clamp(values))
+
+    def pack(self, values, timestamp):
+        try:
+            return self.struct.pack(timestamp, self.header, *values)
+        except struct.error:
+            return self.struct.pack(timestamp & 0xFFFFFFFF, self.header, *self._clamp(values))
+
+    # Meant for internal use only
+    def _clamp(self, values):
+        return clamp(values, self.limits)
+
+
+def clamp(values, limits):
+    '''
+    Returns values with every integer field saturated to its (min, max)
+    limits, so an out of range reading is sent as the nearest value the
+    field can hold instead of wrapping around
+    '''
+    clamped = []
+    for value, limit in zip(values, limits):
+        if limit is not None:
+            value = max(limit[0], min(limit[1], int(value)))
+        clamped.append(value)
+    return clamped
+
+
+def _item_iterator(obj):
+    '''
+    Iterates over the layout definitions of obj, except hidden ones
+    '''
+    for attr, value in sorted(obj.__dict__.items()):
+        if not attr.startswith("_"):
+            yield attr, value
+
+
+def _compile_schema():
+    '''
+    Compiles the protocol
+
+    Populates _layouts and _commands with a Layout per packet type and per
+    command. Unlike comms.py the definitions themselves are left untouched.
+    '''
+    global _compiled
+    if _compiled:
+        return
+    for attr, (header, fmt, descriptor) in _item_iterator(Protocol):
+        if header in _layouts:
+            raise Exception("Duplicate packet header " + str(header))
+        _layouts[header] = Layout(header, fmt, descriptor)
+        commandTable = _commandTables.get(header)
+        if commandTable is None:
+            continue
+        _commands[header] = dict()
+        for name, (cmd_id, cmdFmt, cmdDescriptor) in _item_iterator(commandTable):
+            _commands[header][cmd_id] = Layout(header, fmt + cmdFmt, descriptor + cmdDescriptor, cmd_id)
+    _compiled = True
+
+
+def getLayout(packetType, cmd_id=None):
+    '''
+    Returns the compiled Layout for a packet type (and command ID for
+    AuxControl / SysControl). Raises KeyError if there is none.
+    '''
+    if cmd_id is not None:
+        return _commands[packetType][cmd_id]
+    return _layouts[packetType]
+
+
+def packBody(packetType, values, cmd_id=None):
+    '''
+    Returns the body of a packet (everything after the time and ID header)
+    values is a sequence in descriptor order, without the cmd_id
+    '''
+    layout = getLayout(packetType, cmd_id)
+    if cmd_id is not None:
+        values = (cmd_id,) + tuple(values)
+    return layout.packBody(values)
+
+
+def pack(packetType, values, timestamp, cmd_id=None):
+    '''
+    Returns a whole packet, header included
+    '''
+    layout = getLayout(packetType, cmd_id)
+    if cmd_id is not None:
+        values = (cmd_id,) + tuple(values)
+    return layout.pack(values, int(timestamp))
+
+
+def unpack(data, offset=0):
+    '''
+    Returns a dictionary of the packet in data, keyed by descriptor label,
+    with the header fields "timestamp" and "type" (and "cmd_id" for commands)
+
+    Raises ValueError if the packet type or command is unknown, or if data
+    is too short for its layout.
+    '''
+    if len(data) - offset < HEADER.size:
+        raise ValueError("Packet shorter than its header")
+    packetType = HEADER.unpack_from(data, offset)[1]
+    layout = _layouts.get(packetType)
+    if layout is None:
+        raise ValueError("Unknown packet type " + hex(packetType))
+    commands = _commands.get(packetType)
+    if commands is not None:
+        if len(data) - offset <= HEADER.size:
+            raise ValueError("Command packet has no command ID")
+        cmd_id = _COMMAND_ID.unpack_from(data, offset + HEADER.size)[0]
+        layout = commands.get(cmd_id)
+        if layout is None:
+            raise ValueError("Unknown command " + hex(cmd_id) + " for packet type " + hex(packetType))
+    if len(data) - offset < layout.size:
+        raise ValueError("Packet too short for type " + hex(packetType))
+    return dict(zip(layout.names, layout.struct.unpack_from(data, offset)))
+
+
+_compile_schema()
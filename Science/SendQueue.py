@@ -0,0 +1,123 @@
+"""
+Bounded, blocking packet queue for the CommHandler sender thread.
+
+The sender thread sleeps on a condition variable until a packet is
+queued instead of spinning on the queue length. The queue never grows
+past its maximum size; when it is full the overflow policy decides
+which packet is dropped:
+
+    DROP_OLDEST  - the oldest queued packet is discarded
+    KEEP_LATEST  - only the newest packet of each PacketType is kept,
+                   a new packet replaces the queued one of the same type
+                   (in place, so it keeps its turn in the queue).
+                   Packets are matched on Packet.queueKey, which is the
+                   PacketType unless the sender sets a finer key.
+
+Every packet dropped or replaced is released (Packet.release()), so a
+FramedPacket's buffer goes back to its PacketBuilder.
+
+All operations are O(1).
+
+EE Team of Husky Robotics
+"""
+import threading
+from collections import deque
+
+
+class OverflowPolicy:
+    DROP_OLDEST = 0
+    KEEP_LATEST = 1
+
+
+class SendQueue:
+
+    def __init__(self, maxSize=32, policy=OverflowPolicy.KEEP_LATEST):
+        self._maxSize = maxSize
+        self._policy = policy
+        self._queue = deque()   # Packets, or PacketType keys under KEEP_LATEST
+        self._latest = {}       # queueKey -> newest packet (KEEP_LATEST only)
+        self._condition = threading.Condition(threading.Lock())
+        self._closed = False
+        self._queued = 0
+        self._dropped = 0
+        self._replaced = 0
+        self._maxDepth = 0
+
+    # Adds a packet to the queue and wakes the sender.
+    # Returns False if a packet had to be dropped to make room.
+    def put(self, packet):
+        with self._condition:
+            accepted = True
+            self._queued += 1
+            if self._policy == OverflowPolicy.KEEP_LATEST:
+                key = packet.queueKey
+                if key in self._latest:
+                    self._latest[key].release()
+                    self._latest[key] = packet
+                    self._replaced += 1
+                    self._dropped += 1
+                    return False
+                self._latest[key] = packet
+                self._queue.append(key)
+            else:
+                self._queue.append(packet)
+            if len(self._queue) > self._maxSize:
+                self._discardOldest()
+                accepted = False
+            if len(self._queue) > self._maxDepth:
+                self._maxDepth = len(self._queue)
+            self._condition.notify()
+            return accepted
+
+    # Removes and returns the next packet, blocking until one
+    # is available. Returns None on timeout or when closed.
+    def get(self, timeout=None):
+        with self._condition:
+            if len(self._queue) == 0 and not self._closed:
+                self._condition.wait(timeout)
+            if len(self._queue) == 0:
+                return None
+            return self._popLeft()
+
+    # Wakes any blocked get() so the sender thread can exit
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def open(self):
+        with self._condition:
+            self._closed = False
+
+    def clear(self):
+        with self._condition:
+            while self._queue:
+                self._popLeft().release()
+
+    def depth(self):
+        return len(self._queue)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def getStats(self):
+        with self._condition:
+            return {
+                "depth": len(self._queue),
+                "maxDepth": self._maxDepth,
+                "queued": self._queued,
+                "dropped": self._dropped,
+                "replaced": self._replaced
+            }
+
+    # Meant for internal use only, caller holds the condition
+    def _popLeft(self):
+        item = self._queue.popleft()
+        if self._policy == OverflowPolicy.KEEP_LATEST:
+            return self._latest.pop(item)
+        return item
+
+    # Meant for internal use only, caller holds the condition
+    def _discardOldest(self):
+        self._popLeft().release()
+        self._dropped += 1
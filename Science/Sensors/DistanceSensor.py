@@ -21,31 +21,51 @@ NOTE: There are more options for the operation of the ToF Sensor than the operat
       Look through the supplied class in the VL53L0X library for full functionality. These are very basic
       operations.
 
-NOTE: getDistance() takes an average of 30ms according to the documentation, so if
-      your code is more time sensitive, it may make more sense to create a thread and
-      run this code in the background.
-      A good tutorial on threads: https://www.youtube.com/watch?v=EvbA3qVMGaw
+NOTE: The sensor ranges continuously. A background sampler thread reads each
+      measurement as it completes and keeps the latest one (with its time) and a
+      short history, so getValue() returns right away. The sampler either lets
+      the library poll the sensor for data ready, or, given interruptPin (the
+      sensor's GPIO1, low when a new sample is ready), sleeps until that edge.
 
-NOTE: If you do not call startRanging() BEFORE getDistance(), it will take at least 10x as long to receive the result.
-
-NOTE: It is recommended to call stopRanging() at the end of getting distances, but not required. See VL53L0X
-      documentation for more details on ranging.
+NOTE: setMode() (HIGH_SPEED, BETTER_ACCURACY, ...) and setTimingBudget() can be
+      called at any time, the sampler applies them between measurements.
 
 """
 import VL53L0X
 import time
+import threading
+import collections
 import Error
 import Util
+import Codec
+import ThreadStats
+import Adafruit_BBIO.GPIO as GPIO
 from Sensor import Sensor
+from EdgeEventService import EdgeEventService
 
 
 class DistanceSensor(Sensor):
 
+    HIGH_SPEED = VL53L0X.VL53L0X_HIGH_SPEED_MODE  # 20ms budget, ~50 Hz
+    BETTER_ACCURACY = VL53L0X.VL53L0X_BETTER_ACCURACY_MODE  # 66ms budget, ~15 Hz
+    HISTORY = 16  # readings kept for getHistory()
+
+    sampleRate = None  # Sampled by its own ranging thread, not the scheduler
+
     _ranging = False
     _distance = 0
 
-    def __init__(self):
+    def __init__(self, interruptPin=None, mode=BETTER_ACCURACY):
         self._sensor = None
+        self._mode = mode
+        self._budget = None  # microseconds, None = the mode's default
+        self._pendingMode = None
+        self._pendingBudget = None
+        self._interruptPin = interruptPin
+        self._dataReady = threading.Event()
+        self._stopEvent = threading.Event()
+        self._thread = None
+        self._history = collections.deque(maxlen=self.HISTORY)
         try:
             self._sensor = VL53L0X.VL53L0X()
         except:
@@ -53,45 +73,136 @@ class DistanceSensor(Sensor):
             self.critical_status = True
             Error.throw(0x0303, "Could not initialize distance sensor communications")
 
+    # Starts continuous ranging and the sampler thread
     def start(self):
-        if not self.critical_status:
-            try:
-                self._sensor.start_ranging(VL53L0X.VL53L0X_BETTER_ACCURACY_MODE)
-                self._ranging = True
-            except:
-                # Throw "Could not start ranging"
-                Error.throw(0x0304)
+        if self.critical_status or self._ranging:
+            return
+        try:
+            self._sensor.start_ranging(self._mode)
+            self._ranging = True
+        except:
+            # Throw "Could not start ranging"
+            Error.throw(0x0304)
+            return
+        if self._budget is not None:
+            self._sensor.set_timing(self._budget)
+        if self._interruptPin is not None:
+            GPIO.setup(self._interruptPin, GPIO.IN)
+            EdgeEventService.register(self._interruptPin, self._onInterrupt)
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name="Sample-DistanceSensor")
+        self._thread.daemon = True
+        self._thread.start()
 
     def stop(self):
-        if not self.critical_status:
-            try:
-                self._sensor.stop_ranging()
-                self._ranging = False
-            except:
-                # Throw "Could not stop ranging"
-                Error.throw(0x0305)
+        if self.critical_status or not self._ranging:
+            return
+        self._stopEvent.set()
+        self._dataReady.set()
+        if self._interruptPin is not None:
+            EdgeEventService.unregister(self._interruptPin)
+        if self._thread is not None:
+            self._thread.join(1.0)
+        try:
+            self._sensor.stop_ranging()
+            self._ranging = False
+        except:
+            # Throw "Could not stop ranging"
+            Error.throw(0x0305)
+
+    # Ranging mode, one of the VL53L0X modes (HIGH_SPEED, BETTER_ACCURACY, ...)
+    def setMode(self, mode):
+        self._pendingMode = mode
 
+    def getMode(self):
+        return self._mode
+
+    # Timing budget in microseconds (at least 20000)
+    def setTimingBudget(self, budget):
+        if budget < 20000:
+            budget = 20000
+        self._pendingBudget = budget
+
+    def getTimingBudget(self):
+        return self._budget
+
+    # Returns the latest distance (mm) without waiting for the sensor
     def getValue(self):
         if self.critical_status:
             return 0
         if not self._ranging:
             self.start()
-            time.sleep(0.3)
-        try:
-            timing = self._sensor.get_timing()
-            if timing < 20000:
-                timing = 20000
-            self._distance = self._sensor.get_distance()
-            time.sleep(timing / 1000000.00)
-        except:
-            # Throw "Could not get Reading"
-            Error.throw(0x0301)
-        if not Util.isValidUnsigned(self._distance):
-            # Throw "Reading Invalid"
-            Error.throw(0x0302)
         return self._distance
 
-    def getDataForPacket(self):
-        return Util.long_to_byte_length(self._distance, 2)
+    # The sampler thread stores each measurement with its own time, so
+    # SensorHandler.updateAll() must not overwrite it with the current time
+    def update(self):
+        if not self.critical_status and not self._ranging:
+            self.start()
+
+    # Returns [(distance, time), ...] of the latest readings, oldest first
+    def getHistory(self):
+        return list(self._history)
 
+    def readPacketValues(self):
+        return (self.getValue(),)
 
+    def getDataForPacket(self):
+        return Codec.encode(self.getPacketValues()[0], 2)
+
+    # Edge callback for the data ready interrupt
+    # Meant for internal use only
+    def _onInterrupt(self, level, timestamp):
+        if not level:
+            self._dataReady.set()
+
+    # Reads every measurement as it completes
+    # Meant for internal use only
+    def _run(self):
+        ThreadStats.register("sensors")
+        while not self._stopEvent.is_set():
+            self._applySettings()
+            if self._interruptPin is not None:
+                # At most twice the budget, in case an edge was missed
+                self._dataReady.wait(2 * (self._budget or 200000) / 1000000.0)
+                self._dataReady.clear()
+                if self._stopEvent.is_set():
+                    break
+            try:
+                distance = self._sensor.get_distance()  # Returns once data is ready
+            except:
+                # Throw "Could not get Reading"
+                Error.throw(0x0301)
+                self._stopEvent.wait(0.1)
+                continue
+            if not Util.isValidUnsigned(distance):
+                # Throw "Reading Invalid"
+                Error.throw(0x0302)
+                self._stopEvent.wait(0.1)
+                continue
+            now = time.time()
+            self._distance = distance
+            self._history.append((distance, now))
+            self._sample = ((distance,), now)
+
+    # Restarts ranging for a new mode, sets a new budget
+    # Meant for internal use only
+    def _applySettings(self):
+        mode = self._pendingMode
+        if mode is not None:
+            self._pendingMode = None
+            if mode != self._mode:
+                self._mode = mode
+                self._budget = None
+                try:
+                    self._sensor.stop_ranging()
+                    self._sensor.start_ranging(mode)
+                except:
+                    Error.throw(0x0304)
+        budget = self._pendingBudget
+        if budget is not None:
+            self._pendingBudget = None
+            if self._sensor.set_timing(budget) == 0:
+                self._budget = budget
+            else:
+                Error.throw(0x0304, "Could not set timing budget")
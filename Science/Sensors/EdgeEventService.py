@@ -0,0 +1,236 @@
+"""
+One epoll edge-event service for every GPIO edge input (the Encoders).
+
+Instead of two threads per encoder blocking in GPIO.waitForEdge, every
+registered pin's sysfs value file goes into a single epoll set with
+edge = both. One thread sleeps in epoll, and on wakeup reads the level
+of each pin that changed from its already open value file, timestamps
+the edge with a monotonic clock and calls the callback registered for
+that pin:
+
+    callback(level, timestamp)
+
+Pins that only make sense together (an encoder's A and B channels) can
+be registered as a group. An edge on any pin of the group reads every
+pin of the group at the same time and calls the callback once with all
+of the levels, in the order the pins were given:
+
+    callback((levelA, levelB, ...), timestamp)
+
+Basic Implementation as follows:
+
+1) GPIO.setup(pin, GPIO.IN) as usual (this exports the pin)
+2) EdgeEventService.register(pin, callback)
+    or EdgeEventService.registerGroup((pinA, pinB), callback)
+3) EdgeEventService.unregister(pin) when done
+    (any pin of a group unregisters the whole group)
+
+NOTE: Callbacks run on the service thread and must be short, every
+other pin waits while one runs.
+
+NOTE: If a pin toggles twice before the thread reads it, the kernel
+reports one event and the level read back is the same as before. The
+callback still gets called, with the repeated level.
+
+NOTE: Edges on several pins of a group that arrive before the thread
+wakes up are delivered as one callback with every level changed.
+
+EE Team of Husky Robotics
+"""
+import os
+import sys
+import time
+import select
+import threading
+import ThreadStats
+
+GPIO_PATH = "/sys/class/gpio"
+
+# Header pin -> kernel GPIO number (from Adafruit_BBIO source/common.c)
+GPIO_NUMBERS = {
+    "P8_3": 38, "P8_4": 39, "P8_5": 34, "P8_6": 35, "P8_7": 66, "P8_8": 67, "P8_9": 69,
+    "P8_10": 68, "P8_11": 45, "P8_12": 44, "P8_13": 23, "P8_14": 26, "P8_15": 47,
+    "P8_16": 46, "P8_17": 27, "P8_18": 65, "P8_19": 22, "P8_20": 63, "P8_21": 62,
+    "P8_22": 37, "P8_23": 36, "P8_24": 33, "P8_25": 32, "P8_26": 61, "P8_27": 86,
+    "P8_28": 88, "P8_29": 87, "P8_30": 89, "P8_31": 10, "P8_32": 11, "P8_33": 9,
+    "P8_34": 81, "P8_35": 8, "P8_36": 80, "P8_37": 78, "P8_38": 79, "P8_39": 76,
+    "P8_40": 77, "P8_41": 74, "P8_42": 75, "P8_43": 72, "P8_44": 73, "P8_45": 70,
+    "P8_46": 71, "P9_11": 30, "P9_12": 60, "P9_13": 31, "P9_14": 50, "P9_15": 48,
+    "P9_16": 51, "P9_17": 5, "P9_18": 4, "P9_19": 13, "P9_20": 12, "P9_21": 3, "P9_22": 2,
+    "P9_23": 49, "P9_24": 15, "P9_25": 117, "P9_26": 14, "P9_27": 115, "P9_28": 113,
+    "P9_29": 111, "P9_30": 112, "P9_31": 110, "P9_41": 20, "P9_42": 7
+}
+
+
+"""
+Returns seconds from a monotonic clock (not affected by changes to
+the system time), with the best resolution available
+"""
+def _makeMonotonic():
+    if hasattr(time, "monotonic"):
+        return time.monotonic
+    try:
+        import ctypes
+
+        class timespec(ctypes.Structure):
+            _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+        clock_gettime = ctypes.CDLL("librt.so.1", use_errno=True).clock_gettime
+        CLOCK_MONOTONIC = 1
+        spec = timespec()
+
+        def monotonic():
+            clock_gettime(CLOCK_MONOTONIC, ctypes.byref(spec))
+            return spec.tv_sec + spec.tv_nsec * 1e-9
+        monotonic()
+        return monotonic
+    except (OSError, AttributeError):
+        return time.time
+
+
+monotonic = _makeMonotonic()
+
+
+class EdgeEventService:
+
+    POLL_TIMEOUT = 0.5  # seconds, lets the thread notice stop()
+
+    _lock = threading.Lock()
+    _epoll = None
+    _thread = None
+    _running = False
+    _pins = {}    # pin -> fd
+    _groups = {}  # pin or tuple of pins -> (pins, fds, callback, single)
+    _fds = {}     # fd -> group key
+    _events = 0
+
+    # Calls callback(level, timestamp) on every edge of pin.
+    # The pin must already be set up as an input.
+    @classmethod
+    def register(cls, pin, callback):
+        cls._add(pin, (pin,), callback, True)
+
+    # Calls callback(levels, timestamp) on every edge of any of pins,
+    # levels holds the level of every pin in the order given.
+    # The pins must already be set up as inputs.
+    @classmethod
+    def registerGroup(cls, pins, callback):
+        pins = tuple(pins)
+        cls._add(pins, pins, callback, False)
+
+    # Unregisters pin, or the whole group pin belongs to
+    @classmethod
+    def unregister(cls, pin):
+        with cls._lock:
+            fd = cls._pins.get(pin)
+            if fd is not None:
+                cls._remove(cls._fds[fd])
+
+    # Returns the current level of a registered pin
+    @classmethod
+    def read(cls, pin):
+        return cls._readLevel(cls._pins[pin])
+
+    @classmethod
+    def start(cls):
+        with cls._lock:
+            if cls._running:
+                return
+            cls._running = True
+            cls._thread = threading.Thread(target=cls._run, name="EdgeEvents")
+            cls._thread.daemon = True
+        cls._thread.start()
+
+    @classmethod
+    def stop(cls):
+        cls._running = False
+        if cls._thread is not None:
+            cls._thread.join(cls.POLL_TIMEOUT * 2)
+
+    @classmethod
+    def getEventCount(cls):
+        return cls._events
+
+    # Meant for internal use only
+    @classmethod
+    def _add(cls, key, pins, callback, single):
+        paths = []
+        for pin in pins:
+            gpio = GPIO_NUMBERS.get(pin)
+            if gpio is None:
+                raise ValueError("Not a GPIO pin: " + str(pin))
+            paths.append(GPIO_PATH + "/gpio" + str(gpio))
+        fds = []
+        for path in paths:
+            with open(path + "/edge", "w") as edge:
+                edge.write("both")
+            fds.append(os.open(path + "/value", os.O_RDONLY | os.O_NONBLOCK))
+        with cls._lock:
+            for pin in pins:
+                if pin in cls._pins:
+                    cls._remove(cls._fds[cls._pins[pin]])
+            if cls._epoll is None:
+                cls._epoll = select.epoll()
+            for pin, fd in zip(pins, fds):
+                os.read(fd, 2)  # Clear the event pending from open()
+                cls._epoll.register(fd, select.EPOLLPRI | select.EPOLLERR | select.EPOLLET)
+                cls._pins[pin] = fd
+                cls._fds[fd] = key
+            cls._groups[key] = (pins, tuple(fds), callback, single)
+        cls.start()
+
+    # Meant for internal use only, caller holds cls._lock
+    @classmethod
+    def _remove(cls, key):
+        pins, fds = cls._groups.pop(key)[:2]
+        for pin in pins:
+            del cls._pins[pin]
+        for fd in fds:
+            del cls._fds[fd]
+            try:
+                cls._epoll.unregister(fd)
+            except (IOError, OSError, ValueError):
+                pass
+            os.close(fd)
+
+    # Meant for internal use only
+    @classmethod
+    def _readLevel(cls, fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        return os.read(fd, 2)[:1] == b"1"
+
+    # Meant for internal use only
+    @classmethod
+    def _run(cls):
+        ThreadStats.register("encoders")
+        while cls._running:
+            try:
+                events = cls._epoll.poll(cls.POLL_TIMEOUT)
+            except (IOError, OSError):
+                continue  # Interrupted system call
+            if not events:
+                continue
+            timestamp = monotonic()
+            woken = []
+            for fd, mask in events:
+                key = cls._fds.get(fd)
+                if key is not None and key not in woken:
+                    woken.append(key)  # Once per group, however many pins fired
+            for key in woken:
+                entry = cls._groups.get(key)
+                if entry is None:
+                    continue  # Unregistered while waiting
+                pins, fds, callback, single = entry
+                try:
+                    levels = tuple([cls._readLevel(fd) for fd in fds])
+                except OSError:
+                    continue
+                cls._events += 1
+                try:
+                    if single:
+                        callback(levels[0], timestamp)
+                    else:
+                        callback(levels, timestamp)
+                except Exception:
+                    sys.stderr.write("\nEdge callback for " + str(key) + " failed: " +
+                                     str(sys.exc_info()[1]) + "\n")
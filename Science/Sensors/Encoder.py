@@ -23,22 +23,47 @@ Basic Implementation as follows:
 NOTE: Only two channel encoders
 NOTE: Vibrations that can cause misalignment of the encoder wheel (especially
     in the case of optical encoders) is ignored
-NOTE: Run the update() method as often as possible
-NOTE: Assumes Encoder does not step more than one phase per update
+NOTE: Edges are delivered by the shared EdgeEventService (one epoll thread
+    for every encoder), call start() to begin counting. A and B are registered
+    as one group, so every edge comes with the live level of both channels.
+NOTE: Steps are decoded with a 16 entry transition table. A transition where
+    both channels changed before the edge was read (the encoder skipped a
+    state) cannot be decoded; it is counted in getIllegalTransitions() and
+    not stepped.
+NOTE: getVelocity() uses the timestamps of the last EDGE_BUFFER edges. At
+    high speed it counts the steps in the last VELOCITY_WINDOW seconds, at
+    low speed (fewer than MIN_WINDOW_EDGES edges in the window) it uses
+    1 / (time between the last two edges), decaying towards zero while no
+    new edge arrives and reaching zero after STOP_TIMEOUT seconds.
 
 
 TODO: ADD ERROR THROWING TO INITIALIZED / READ GPIO
 
 """
-import Util
+import Codec
 import Adafruit_BBIO.GPIO as GPIO
 from math import pi
-from threading import Thread
 from Sensor import Sensor
+from EdgeEventService import EdgeEventService, monotonic
+
+# Step for each transition, indexed by (lastA, lastB, curA, curB) as bits.
+# States run 00 -> 10 -> 11 -> 01 -> 00 clockwise. None = both channels
+# changed, the direction is unknown.
+QUADRATURE_STEPS = (
+    0, -1, 1, None,
+    1, 0, None, -1,
+    -1, None, 0, 1,
+    None, 1, -1, 0
+)
 
 
 class Encoder(Sensor):
 
+    EDGE_BUFFER = 64         # edge timestamps kept for getVelocity()
+    VELOCITY_WINDOW = 0.02   # seconds, window for counting steps at high speed
+    MIN_WINDOW_EDGES = 4     # fewer edges than this in the window uses 1/T
+    STOP_TIMEOUT = 0.5       # seconds without an edge before velocity is 0
+
     # Takes in channel A and B pin numbers
     # ppr = Pulses per revolution
     def __init__(self, pinA, pinB, ppr):
@@ -52,56 +77,45 @@ class Encoder(Sensor):
         self._lastA = False    # last pin position for channel A
         self._lastB = False    # last pin position for channel B
         self._isSetup = False  # whether the Encoder has been set up yet
-        self._threadA = None
-        self._threadB = None
+        self._illegal = 0      # transitions with both channels changed
+        self._edgeTimes = [0.0] * self.EDGE_BUFFER  # ring of edge timestamps
+        self._edgeSteps = [0] * self.EDGE_BUFFER    # step of each edge in the ring
+        self._edgeCount = 0    # total edges, the ring index is this mod EDGE_BUFFER
 
-    # Initializes Encoder
+    # Initializes Encoder and starts receiving edges
     # Meant for internal use only
     def _setup(self):
         self._lastA = GPIO.input(self._pinA)
         self._lastB = GPIO.input(self._pinB)
         self._isSetup = True
-        self._threadA = Thread(target=self._threadAChannel)
-        self._threadB = Thread(target=self._threadBChannel)
-        self._threadA.start()
-        self._threadB.start()
+        EdgeEventService.registerGroup((self._pinA, self._pinB), self._edge)
 
-    # Updates encoder values
-    # Assumes the Encoder does not go past a whole phase change
-    def _update(self):
-        # Calculates the change in pulses from
-        # last cycle to this cycle.
+    def start(self):
         if not self._isSetup:
             self._setup()
-        curA = GPIO.input(self._pinA)
-        curB = GPIO.input(self._pinB)
-
-        increment = 0
-        if self._lastA != curA:
-            increment += 1
-        if self._lastB != curB:
-            increment += 1
-        if self._isClockwise(self._lastA, self._lastB, curA, curB):
-            self._steps += increment
-        else:
-            self._steps -= increment
 
+    # Edge callback for either channel, run on the EdgeEventService thread.
+    # levels holds both channels, read together after the edge.
+    def _edge(self, levels, timestamp):
+        self._update(levels[0], levels[1], timestamp)
+
+    # Updates encoder values from the channel levels after an edge
+    # Assumes the Encoder does not go past a whole phase change
+    def _update(self, curA, curB, timestamp):
+        step = QUADRATURE_STEPS[(bool(self._lastA) << 3) | (bool(self._lastB) << 2) |
+                                (bool(curA) << 1) | bool(curB)]
         self._lastA = curA
         self._lastB = curB
-
-    def _waitForEdge(self, pin):
-        current = GPIO.input(pin)
-        if current:
-            GPIO.waitForEdge(pin, GPIO.FALLING)
-        else:
-            GPIO.waitForEdge(pin, GPIO.RISING)
-        self._update()
-
-    def _waitForA(self):
-        self._waitForEdge(self._pinA)
-
-    def _waitForB(self):
-        self._waitForEdge(self._pinB)
+        if step is None:
+            self._illegal += 1
+            return
+        if step == 0:
+            return  # Edge with no change in level, it toggled back before it was read
+        self._steps += step
+        index = self._edgeCount % self.EDGE_BUFFER
+        self._edgeTimes[index] = timestamp
+        self._edgeSteps[index] = step
+        self._edgeCount += 1  # Published last, readers never see a half written edge
 
     # This method sets a constant whose product with the accumulated angle is
     # the distance traveled
@@ -113,36 +127,73 @@ class Encoder(Sensor):
     def getAngle(self):
         return self._steps * (2 * pi/self._ppr)
 
-    # Returns true if the direction the encoder is moving clockwise
-    def _isClockwise(self, lastA, lastB, curA, curB):
-        return (curA != lastA and curA != curB) \
-                or (curB != lastB and curA == curB)
-
     # Returns distance moved as though it were a disk with radius "_distK"
     # Set "_distK" in self.setDistanceK(...)
     def getDistance(self):
         return self._steps * self._distK
 
+    # Returns angular velocity in radians per second, clockwise positive
+    def getVelocity(self):
+        count = self._edgeCount
+        if count == 0:
+            return 0.0
+        now = monotonic()
+        size = self.EDGE_BUFFER
+        times = self._edgeTimes
+        steps = self._edgeSteps
+        last = (count - 1) % size
+        lastTime = times[last]
+        sinceLast = now - lastTime
+        if sinceLast > self.STOP_TIMEOUT:
+            return 0.0
+        stepAngle = 2 * pi / self._ppr
+
+        # High speed: steps counted over the edges in the window
+        windowStart = now - self.VELOCITY_WINDOW
+        available = min(count, size)
+        edges = 1
+        netSteps = 0
+        while edges < available:
+            index = (count - 1 - edges) % size
+            if times[index] < windowStart:
+                break
+            netSteps += steps[(index + 1) % size]
+            edges += 1
+        if edges >= self.MIN_WINDOW_EDGES:
+            firstTime = times[(count - edges) % size]
+            if lastTime > firstTime:
+                return netSteps * stepAngle / (lastTime - firstTime)
+
+        # Low speed: 1/T, never faster than an edge that would arrive now
+        period = sinceLast
+        if count > 1:
+            period = max(period, lastTime - times[(count - 2) % size])
+        if period <= 0:
+            return 0.0
+        return steps[last] * stepAngle / period
+
+    # Returns how many transitions could not be decoded
+    def getIllegalTransitions(self):
+        return self._illegal
+
     # Resets all accumulations
     def reset(self):
         self._steps = 0
-
-    def _threadAChannel(self):
-        while True:
-            self._waitForA()
-
-    def _threadBChannel(self):
-        while True:
-            self._waitForB()
+        self._illegal = 0
 
     def getValue(self):
         return self.getAngle(), self.getDistance()
 
+    # Steps are counted by the EdgeEventService, so this is
+    # cheap and read every cycle rather than scheduled
+    def readPacketValues(self):
+        return (int(round(self.getAngle() % (2*pi))),)
+
     def getDataForPacket(self):
-        return Util.long_to_byte_length(int(round(self.getAngle() % (2*pi))), 2)
+        return Codec.encode(self.getPacketValues()[0], 2)
 
 
     def stop(self):
-        self._threadA.join(0.02)
-        self._threadB.join(0.02)
+        EdgeEventService.unregister(self._pinA)  # And pinB, same group
+        self._isSetup = False
 
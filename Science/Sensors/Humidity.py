@@ -12,15 +12,23 @@ this sensor.
 
 NOTE: Beaglebone Black ADC has a 12-bit resolution
 
+NOTE: Readings come from the shared buffered ADC capture (ADCCapture.py),
+each one an average of the newest OVERSAMPLE samples.
+
 """
 import Util
+import Codec
 import Error
 import Adafruit_BBIO.ADC as ADC  # Ignore compilation errors
+from ADCCapture import ADCCapture
 from Sensor import Sensor
 
 
 class Humidity(Sensor):
 
+    sampleRate = 10  # Hz
+    OVERSAMPLE = 16  # ADC samples averaged per reading
+
     _m = 1
     _int = 0
 
@@ -41,18 +49,18 @@ class Humidity(Sensor):
                 # Throw "ADC Could not initialize"
                 Error.throw(0x0001, "Failed to initialize ADC", "Humidity.py", 42)
                 self.critical_status = True
+        self._adc = ADCCapture.shared()
+        if not self.critical_status:
+            self._adc.addChannel(self._pin)
+            self._adc.start()
 
     # Reads raw ADC value
     def readRaw(self):
-        # Reading twice per the Adafruit Documentation,
-        # which warns of a bug if you neglect to read
-        # twice
         reading = 0
         if self.critical_status:
             return 0
         try:
-            reading = ADC.read(self._pin)
-            reading = ADC.read(self._pin) * 1.8  # To get voltage
+            reading = self._adc.read(self._pin, self.OVERSAMPLE) * 1.8  # To get voltage
         except:
             # Throw "Could not get reading"
             Error.throw(0x0401)
@@ -72,6 +80,8 @@ class Humidity(Sensor):
         self._m = slope
         self._int = i
 
+    def readPacketValues(self):
+        return (int(self.getValue() * 1023),)
+
     def getDataForPacket(self):
-        data = int(self.getValue() * 1023)
-        return Util.long_to_byte_length(data, 2)
+        return Codec.encode(self.getPacketValues()[0], 2)
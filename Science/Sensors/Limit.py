@@ -9,7 +9,7 @@ Questions/Comments? Email: jadenjb@uw.edu
 (Untested as of 2/6/2017)
 
 """
-import Util
+import Codec
 import Error
 import Adafruit_BBIO.GPIO as GPIO  # Ignore compiler errors
 from Sensor import Sensor
@@ -17,6 +17,8 @@ from Sensor import Sensor
 
 class Limit(Sensor):
 
+    sampleRate = 50  # Hz
+
     # Sets pin of limit switch
     def __init__(self, pin):
         self._pin = str(pin)
@@ -40,7 +42,10 @@ class Limit(Sensor):
             Error.throw(0x0003)
         return val
 
+    def readPacketValues(self):
+        return (int(self.getValue()),)
+
     # Returns data for packet
     def getDataForPacket(self):
-        return Util.long_to_byte_length(int(self.getValue()), 1)
+        return Codec.encode(self.getPacketValues()[0], 1)
 
@@ -1,8 +1,18 @@
-import Util
+import time
+import Schema
+from Schema import PacketType
+from Packet import FramedPacket
+from PacketBuilder import PacketBuilder
+from SensorScheduler import SensorScheduler
 
 class Sensor:
 
     critical_status = False
+    packetFields = 1  # Number of Schema.py fields in getPacketValues()
+    sampleRate = None  # Hz, None = sampled by SensorHandler.updateAll()
+
+    _sample = None  # (values, time) of the latest reading
+    _scheduled = False
 
     # Sets up the sensor
     def setup(self, *args):
@@ -16,9 +26,9 @@ class Sensor:
     def start(self):
         pass
 
-    # Updates values for sensor
+    # Takes a new reading and stores it in the sample cache
     def update(self):
-        pass
+        self._sample = (tuple(self.readPacketValues()), time.time())
 
     # Returns appropriate sensor value
     def getValue(self):
@@ -28,12 +38,43 @@ class Sensor:
     def getDataForPacket(self):
         pass
 
+    # Reads the sensor and returns tuple of the integer values
+    # it puts in its packet, in the order of its Schema.py fields.
+    # May block on the hardware, sensors override this.
+    def readPacketValues(self):
+        return ()
+
+    # Returns the latest cached packet values without blocking.
+    # Reads the sensor directly if it has never been sampled
+    # and is not on the scheduler.
+    def getPacketValues(self):
+        sample = self._sample
+        if sample is not None:
+            return sample[0]
+        if self._scheduled:
+            return (0,) * self.packetFields
+        return tuple(self.readPacketValues())
+
+    # Returns (values, time) of the latest reading, or None
+    def getSample(self):
+        return self._sample
+
+    # Returns seconds since the latest reading, or None
+    def getSampleAge(self):
+        sample = self._sample
+        if sample is None:
+            return None
+        return time.time() - sample[1]
+
 
 class SensorHandler:
 
     _sensors = []
     _auxSensors = []
     _dataArray = []
+    _primaryBuilder = None
+    _auxBuilder = None
+    _scheduler = None
 
     @classmethod
     def addPrimarySensor(cls, sensor):
@@ -53,10 +94,12 @@ class SensorHandler:
         for arg in args:
             cls.addAccessorySensor(arg)
 
+    # Updates the sensors that are not sampled on their own timers
     @classmethod
     def updateAll(cls):
         for sensor in (cls._sensors + cls._auxSensors):
-            sensor.update()
+            if not sensor._scheduled:
+                sensor.update()
 
     @classmethod
     def setupAll(cls):
@@ -68,19 +111,61 @@ class SensorHandler:
         for sensor in (cls._sensors + cls._auxSensors):
             sensor.start()
 
+    # Starts sampling every sensor that declares a sampleRate
+    # on its own worker (see SensorScheduler.py)
+    @classmethod
+    def startSampling(cls):
+        if cls._scheduler is None:
+            cls._scheduler = SensorScheduler()
+        for sensor in (cls._sensors + cls._auxSensors):
+            if sensor.sampleRate:
+                cls._scheduler.add(sensor, sensor.sampleRate)
+        cls._scheduler.start()
+
+    @classmethod
+    def stopSampling(cls):
+        if cls._scheduler is not None:
+            cls._scheduler.stop()
+
+    # Returns { sensor class name: counters } for scheduled sensors
+    @classmethod
+    def getSamplingStats(cls):
+        if cls._scheduler is None:
+            return {}
+        return cls._scheduler.getStats()
+
+    # Packs the sensor values with the PrimarySensor
+    # layout from Schema.py in one struct call
     @classmethod
     def getPrimarySensorData(cls):
-        data = bytearray()
+        values = []
         for sensor in cls._sensors:
-            buffer = sensor.getDataForPacket()
-            Util.appendBytearray(data, buffer)
-        return data
+            values.extend(sensor.getPacketValues())
+        return Schema.packBody(PacketType.PrimarySensor, values)
 
+    # Packs the sensor values with the AuxSensor
+    # layout from Schema.py in one struct call
     @classmethod
     def getAuxSensorData(cls):
-        data = bytearray()
+        values = []
         for sensor in cls._auxSensors:
-            buffer = sensor.getDataForPacket()
-            Util.appendBytearray(data, buffer)
-        return data
+            values.extend(sensor.getPacketValues())
+        return Schema.packBody(PacketType.AuxSensor, values)
 
+    # Returns the PrimarySensor packet, filled in place
+    # in a preallocated buffer (see PacketBuilder.py)
+    @classmethod
+    def buildPrimaryPacket(cls):
+        if cls._primaryBuilder is None:
+            cls._primaryBuilder = PacketBuilder(PacketType.PrimarySensor, cls._sensors,
+                                                wrap=lambda frame: FramedPacket(PacketType.PrimarySensor, frame))
+        return cls._primaryBuilder.build()
+
+    # Returns the AuxSensor packet, filled in place
+    # in a preallocated buffer (see PacketBuilder.py)
+    @classmethod
+    def buildAuxPacket(cls):
+        if cls._auxBuilder is None:
+            cls._auxBuilder = PacketBuilder(PacketType.AuxSensor, cls._auxSensors,
+                                            wrap=lambda frame: FramedPacket(PacketType.AuxSensor, frame))
+        return cls._auxBuilder.build()
@@ -0,0 +1,132 @@
+"""
+Samples sensors at independent rates.
+
+Each scheduled sensor gets its own worker thread that calls the
+sensor's update() on a fixed period, so a slow sensor (the VL53L0X
+waits out its timing budget, the thermocouple sleeps between reads)
+no longer holds back fast ones like the limit switches. update()
+stores the reading with its time in the sensor's sample cache, which
+getPacketValues() / getDataForPacket() read without blocking.
+
+Basic Implementation as follows:
+
+1) Give the sensor a rate: sensor.sampleRate = 20  (Hz), or set it on the class
+2) scheduler.add(sensor, sensor.sampleRate) for each sensor
+3) scheduler.start(), and scheduler.stop() on shutdown
+
+NOTE: Deadlines are absolute (start + n * period), so a late sample does
+not shift every later one. If a read takes longer than a whole period
+the missed deadlines are skipped and counted as overruns rather than
+run back to back.
+
+EE Team of Husky Robotics
+"""
+import time
+import threading
+import ThreadStats
+
+
+class SensorScheduler:
+
+    def __init__(self):
+        self._workers = []
+        self._stopEvent = threading.Event()
+        self._running = False
+
+    # Schedules sensor.update() at rate Hz.
+    # Sensors added while running start immediately.
+    def add(self, sensor, rate):
+        if rate <= 0:
+            raise ValueError("Sample rate must be positive")
+        for worker in self._workers:
+            if worker.sensor is sensor:
+                worker.period = 1.0 / rate
+                return
+        worker = _SampleWorker(sensor, 1.0 / rate, self._stopEvent)
+        sensor._scheduled = True
+        self._workers.append(worker)
+        if self._running:
+            worker.start()
+
+    def start(self):
+        if self._running:
+            return
+        self._stopEvent.clear()
+        self._running = True
+        for worker in self._workers:
+            worker.start()
+
+    # Stops all workers, waiting up to timeout seconds for each
+    # one to finish its current read
+    def stop(self, timeout=1.0):
+        self._stopEvent.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._running = False
+
+    def isRunning(self):
+        return self._running
+
+    # Returns a list of counters per scheduled sensor, in the order added
+    def getStats(self):
+        return [worker.getStats() for worker in self._workers]
+
+
+class _SampleWorker:
+
+    def __init__(self, sensor, period, stopEvent):
+        self.sensor = sensor
+        self.period = period
+        self._stopEvent = stopEvent
+        self._thread = None
+        self._samples = 0
+        self._overruns = 0
+        self._errors = 0
+        self._lastDuration = 0.0
+        self._maxDuration = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="Sample-" + self.sensor.__class__.__name__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def join(self, timeout):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def getStats(self):
+        return {
+            "sensor": self.sensor.__class__.__name__,
+            "rate": 1.0 / self.period,
+            "samples": self._samples,
+            "overruns": self._overruns,
+            "errors": self._errors,
+            "lastDuration": self._lastDuration,
+            "maxDuration": self._maxDuration,
+            "age": self.sensor.getSampleAge()
+        }
+
+    # Meant for internal use only
+    def _run(self):
+        ThreadStats.register("sensors")
+        deadline = time.time()
+        while not self._stopEvent.is_set():
+            start = time.time()
+            try:
+                self.sensor.update()
+                self._samples += 1
+            except Exception:
+                # Sensors throw their own error codes, keep sampling
+                self._errors += 1
+            now = time.time()
+            self._lastDuration = now - start
+            if self._lastDuration > self._maxDuration:
+                self._maxDuration = self._lastDuration
+            deadline += self.period
+            if deadline < now:
+                missed = int((now - deadline) / self.period) + 1
+                self._overruns += missed
+                deadline += missed * self.period
+            self._stopEvent.wait(deadline - now)
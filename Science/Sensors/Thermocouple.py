@@ -6,100 +6,131 @@ Written by Jaden Bottemiller in January 2017
 EE Team of Husky Robotics
 This code has been tested.
 
+Every reading is one 32 bit read of the MAX31855 (readSnapshot()); the
+fault bits, thermocouple and internal temperatures all come from that
+same word, so they always belong to the same conversion.
+
 """
 import Error
-import time
 import Util
+import Codec
 import Adafruit_MAX31855.MAX31855 as MAX31855
 from Sensor import Sensor
 
 
 class Thermocouple(Sensor):
 
+    packetFields = 2  # thermocouple, internal_temp
+    sampleRate = 4  # Hz, the MAX31855 converts in ~100ms
+
     def __init__(self, clock, cs, data):
         self._device = None
+        self._snapshot = None  # Latest decoded reading, see readSnapshot()
         self.critical_status = False
         try:
             self._device = MAX31855.MAX31855(clock, cs, data)
         except:
             Error.throw(0x0108, "Could not initialize thermocouple communications")
             self.critical_status = True
+            return
         self.checkError()
 
-    def getRawData(self):
-        self.checkError()
-        if self.critical_status:
-            return 0
-        raw = 0
+    # Reads the device once (one 32 bit transfer) and returns every
+    # field decoded from that word (see MAX31855.decode), or None if
+    # the read failed. Faults in the reading are thrown.
+    def readSnapshot(self):
+        if self._device is None:
+            return None
         try:
-            raw = self._device._read32()
+            snapshot = self._device.readSnapshot()
         except:
-            Error.throw(0x0108, "Could not initialize thermocouple communications")
-        return raw
+            Error.throw(0x0108, "Could not read thermocouple communications")
+            return None
+        self._snapshot = snapshot
+        self._checkSnapshot(snapshot)
+        return snapshot
 
-    def getInternalTemp(self):  # degrees C
-        self.checkError()
-        if self.critical_status:
+    # Returns the latest decoded reading without reading the device
+    def getSnapshot(self):
+        return self._snapshot
+
+    def getRawData(self):
+        snapshot = self.readSnapshot()
+        if snapshot is None:
             return 0
-        time.sleep(0.01)
-        internal_temp = 0
-        try:
-            internal_temp = int(self._device.readInternalC() * 100)
-        except:
-            Error.throw(0x0102, "Could not get internal temperature reading")
-        if not Util.isValidUnsigned(internal_temp):
-            Error.throw(0x0103, "Internal temperature reading invalid")
-        return internal_temp
+        return snapshot["raw"]
+
+    def getInternalTemp(self):  # degrees C
+        return self._internalTemp(self.readSnapshot())
 
     def getTemp(self):
-        self.checkError()
-        if self.critical_status:
-            return 0
-        time.sleep(0.01)
-        temp = 0
-        try:
-            temp = int(self._device.readTempC() * 100)
-        except:
-            Error.throw(0x0101, "Could not get external temperature reading")
-        if not Util.isValidUnsigned(int(temp)):
-            Error.throw(0x0103, "External temperature reading invalid")
-        return temp
+        return self._temp(self.readSnapshot())
+
+    # Returns the NIST linearized temperature in degrees C
+    def getLinearizedTemp(self):
+        snapshot = self.readSnapshot()
+        if snapshot is None or self.critical_status:
+            return float("NaN")
+        return MAX31855.linearize(snapshot["tempC"], snapshot["internalC"])
 
     # Returns true if error detected, false
     # if otherwise. Sets critical status to
     # true if error is found. Does not set
     # to false if none is found
     def checkError(self):
-        status = {}
-        status = self._device.readState()
-        
-        if status["openCircuit"]:
-            Error.throw(0x0104, "Open Circuit detected on Thermocouple.")
-        if status["shortGND"]:
-            Error.throw(0x0105, "Ground short detected on Thermocouple.")
-        if status["shortVCC"]:
-            Error.throw(0x0106, "VCC short detected on Thermocouple.")
-        if status["fault"]:
-            Error.throw(0x0107, "General failure on Thermocouple.")
-        if status["none"]:
-            self.critical_status = False
-            return self.critical_status
-
-        self.critical_status = True
+        snapshot = self.readSnapshot()
+        if snapshot is None:
+            self.critical_status = True
         return self.critical_status
 
     # Returns tuple of (temp, internal temp)
     def getValue(self):
-        return (self.getTemp() / 100.0, self.getInternalTemp() / 100.0)
+        snapshot = self.readSnapshot()
+        return (self._temp(snapshot) / 100.0, self._internalTemp(snapshot) / 100.0)
 
-    # Returns 4 byte data for packet sending
-    def getDataForPacket(self):
-        raw = self.getRawData() >> 4  # Get rid of status bits
-        tempEncoded = bytearray()
+    # Returns (thermocouple, internal) raw readings
+    def readPacketValues(self):
+        snapshot = self.readSnapshot()
+        if snapshot is None or self.critical_status:
+            return (0, 0)
+        raw = snapshot["raw"] >> 4  # Get rid of status bits
         internalTemp = raw & 0xFFF  # Grab last 12 bits (internal temp reading)
         thermocoupleTemp = (raw >> 14) & 0x3FFF # Grab thermocouple reading
-        thermocoupleTempEncoded = Util.long_to_byte_length(thermocoupleTemp, 2)
-        internalTempEncoded = Util.long_to_byte_length(internalTemp, 2)
-        tempEncoded = Util.appendBytearray(thermocoupleTempEncoded, internalTempEncoded)
-        return tempEncoded
+        return (thermocoupleTemp, internalTemp)
+
+    # Returns 4 byte data for packet sending
+    def getDataForPacket(self):
+        thermocoupleTemp, internalTemp = self.getPacketValues()
+        return Codec.encode(thermocoupleTemp, 2) + Codec.encode(internalTemp, 2)
+
+    # Throws the faults in a reading and sets critical status
+    # Meant for internal use only
+    def _checkSnapshot(self, snapshot):
+        if snapshot["openCircuit"]:
+            Error.throw(0x0104, "Open Circuit detected on Thermocouple.")
+        if snapshot["shortGND"]:
+            Error.throw(0x0105, "Ground short detected on Thermocouple.")
+        if snapshot["shortVCC"]:
+            Error.throw(0x0106, "VCC short detected on Thermocouple.")
+        if snapshot["fault"]:
+            Error.throw(0x0107, "General failure on Thermocouple.")
+        self.critical_status = not snapshot["none"]
+
+    # Temperatures in hundredths of a degree from one reading
+    # Meant for internal use only
+    def _temp(self, snapshot):
+        if snapshot is None or self.critical_status:
+            return 0
+        temp = int(snapshot["tempC"] * 100)
+        if not Util.isValidUnsigned(temp):
+            Error.throw(0x0103, "External temperature reading invalid")
+        return temp
 
+    # Meant for internal use only
+    def _internalTemp(self, snapshot):
+        if snapshot is None or self.critical_status:
+            return 0
+        internal_temp = int(snapshot["internalC"] * 100)
+        if not Util.isValidUnsigned(internal_temp):
+            Error.throw(0x0103, "Internal temperature reading invalid")
+        return internal_temp
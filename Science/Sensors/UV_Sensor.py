@@ -5,9 +5,12 @@ Written by Jaden Bottemiller in January 2017
 EE Team of Husky Robotics
 This code has been tested.
 """
+import sys
 import Util
+import Codec
 import Error
 import Adafruit_GPIO.I2C as I2C
+from I2CArbiter import I2CArbiter
 from Sensor import Sensor
 
 
@@ -16,15 +19,22 @@ class UV(Sensor):
     # default time constant
     _uvTConst = 0x02
     critical_status = False
+    sampleRate = 10  # Hz
 
     # initialize device with the correct LSB address given in the
     # documentation.
     def __init__(self, LSB_ADDR):
         self._uvl = None
         self._uvm = None
+        self._lsbAddr = LSB_ADDR
         try:
-            self._uvl = I2C.Device(LSB_ADDR, I2C.get_default_bus())
-            self._uvm = I2C.Device(LSB_ADDR + 1, I2C.get_default_bus())
+            # Shares the bus (and its one file handle) with the distance sensor
+            busnum = I2C.get_default_bus()
+            self._uvl = I2C.Device(LSB_ADDR, busnum, I2CArbiter.get)
+            self._uvm = I2C.Device(LSB_ADDR + 1, busnum, I2CArbiter.get)
+            bus = I2CArbiter.get(busnum)
+            bus.setPriority(LSB_ADDR, I2CArbiter.PRIORITY_TELEMETRY)
+            bus.setPriority(LSB_ADDR + 1, I2CArbiter.PRIORITY_TELEMETRY)
         except:
             sys.stderr.write("\nUnexpected error: " + str(sys.exc_info()[0]) + "\n")
             # Throw "Communication Failure"
@@ -43,8 +53,9 @@ class UV(Sensor):
         if self.critical_status:
             return 0
         try:
-            uvData = self._uvl.readRaw8()
-            uvData |= self._uvm.readRaw8() << 8
+            # Both halves in one I2C transaction
+            low, high = self._uvl.transfer([(self._lsbAddr, None, 1), (self._lsbAddr + 1, None, 1)])
+            uvData = bytearray(low)[0] | (bytearray(high)[0] << 8)
         except:
             # Throw "Could Not Get Reading"
             Error.throw(0x0201)
@@ -62,8 +73,11 @@ class UV(Sensor):
     def getValue(self):
         return self.getRaw() * 5  # uW/cm/cm (multiplication factor of 5 given by the datasheet)
 
+    def readPacketValues(self):
+        return (self.getValue(),)
+
     def getDataForPacket(self):
-        return Util.long_to_byte_length(self.getValue(), 4) # BYTEMAP?
+        return Codec.encode(self.getPacketValues()[0], 4)
 
 
 
@@ -24,7 +24,7 @@
 
 import time
 from ctypes import *
-import smbus
+from I2CArbiter import I2CArbiter
 
 VL53L0X_GOOD_ACCURACY_MODE      = 0   # Good Accuracy mode
 VL53L0X_BETTER_ACCURACY_MODE    = 1   # Better Accuracy mode
@@ -32,7 +32,8 @@ VL53L0X_BEST_ACCURACY_MODE      = 2   # Best Accuracy mode
 VL53L0X_LONG_RANGE_MODE         = 3   # Longe Range mode
 VL53L0X_HIGH_SPEED_MODE         = 4   # High Speed mode
 
-i2cbus = smbus.SMBus(2)
+# Shared with the other devices on bus 2, see I2CArbiter.py
+i2cbus = I2CArbiter.get(2)
 
 # i2c bus read callback
 def i2c_read(address, reg, data_p, length):
@@ -78,6 +79,9 @@ write_func = WRITEFUNC(i2c_write)
 # pass i2c read and write function pointers to VL53L0X library
 tof_lib.VL53L0X_set_i2c(read_func, write_func)
 
+# getDev returns a pointer, not the default int
+tof_lib.getDev.restype = c_void_p
+
 class VL53L0X(object):
     """VL53L0X ToF."""
 
@@ -107,7 +111,7 @@ class VL53L0X(object):
     # from python instead of through the simplified interface
     def get_timing(self):
         Dev = POINTER(c_void_p)
-        Dev = tof_lib.getDev(self.my_object_number)
+        Dev = c_void_p(tof_lib.getDev(self.my_object_number))
         budget = c_uint(0)
         budget_p = pointer(budget)
         Status =  tof_lib.VL53L0X_GetMeasurementTimingBudgetMicroSeconds(Dev, budget_p)
@@ -115,3 +119,26 @@ class VL53L0X(object):
             return (budget.value + 1000)
         else:
             return 0
+
+    def set_timing(self, budget):
+        """Change the measurement timing budget (microseconds, 20000 or more)
+        while ranging: stops the continuous measurement, waits for the stop,
+        sets the budget and starts measuring again.  Returns the API status."""
+        Dev = tof_lib.getDev(self.my_object_number)
+        if not Dev:
+            return -1
+        Dev = c_void_p(Dev)
+        Status = tof_lib.VL53L0X_StopMeasurement(Dev)
+        stop_completed = c_uint(1)
+        for attempt in range(100):
+            if Status != 0:
+                break
+            Status = tof_lib.VL53L0X_GetStopCompletedStatus(Dev, byref(stop_completed))
+            if stop_completed.value == 0:
+                break
+            time.sleep(0.001)
+        if Status == 0:
+            Status = tof_lib.VL53L0X_SetMeasurementTimingBudgetMicroSeconds(Dev, c_uint(budget))
+        if Status == 0:
+            Status = tof_lib.VL53L0X_StartMeasurement(Dev)
+        return Status
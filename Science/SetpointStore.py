@@ -0,0 +1,133 @@
+"""
+Versioned setpoint store shared by the parse thread and the Commands.
+
+Replaces the bare lists Parse.aux_ctrl / sys_ctrl / cam_ctrl.
+
+Values: the writer (the parse thread) never changes the published
+values in place. set() copies them into a new tuple, changes the copy
+and then publishes (version, timestamp, values) with one attribute
+assignment. A reader therefore always sees a consistent snapshot and
+never takes a lock: get() and snapshot() are a single attribute read.
+
+One-shot slots: trigger(slot) counts an event (ping, reboot, capture
+request) and consume(slot) returns how many events arrived since the
+last consume() and marks them handled. Counting instead of a flag that
+is read and then cleared means an event that arrives while another is
+being handled is never lost, and one is never handled twice.
+
+Readers that need to react to a new command can call
+waitForVersion(version) instead of polling.
+
+Basic Implementation as follows:
+
+    store = SetpointStore(32)
+    store.set(AuxCtrlID.DrillRPM, 1200, timestamp)    # parse thread
+    store.get(AuxCtrlID.DrillRPM)                     # command thread
+
+    store.trigger(SysCtrlID.Ping)                     # parse thread
+    if store.consume(SysCtrlID.Ping): ...             # command thread
+
+EE Team of Husky Robotics
+"""
+import time
+import threading
+
+
+class SetpointStore:
+
+    def __init__(self, size, default=0):
+        self._size = size
+        self._default = default
+        self._condition = threading.Condition(threading.Lock())
+        # (VERSION, TIMESTAMP, VALUES), replaced as a whole by the writer
+        self._state = (0, 0, (default,) * size)
+        self._events = [0] * size    # events triggered per slot
+        self._consumed = [0] * size  # events consumed per slot
+
+    # Sets the value at index and publishes a new version
+    def set(self, index, value, timestamp=0):
+        with self._condition:
+            version, oldTimestamp, values = self._state
+            values = values[:index] + (value,) + values[index + 1:]
+            self._state = (version + 1, timestamp, values)
+            self._condition.notify_all()
+
+    # Sets several values at once, { index: value }
+    def update(self, changes, timestamp=0):
+        with self._condition:
+            version, oldTimestamp, values = self._state
+            values = list(values)
+            for index, value in changes.items():
+                values[index] = value
+            self._state = (version + 1, timestamp, tuple(values))
+            self._condition.notify_all()
+
+    # Returns the latest value at index, without locking
+    def get(self, index):
+        return self._state[2][index]
+
+    # Returns (version, timestamp, values) as one consistent snapshot
+    def snapshot(self):
+        return self._state
+
+    def getVersion(self):
+        return self._state[0]
+
+    def getTimestamp(self):
+        return self._state[1]
+
+    # Records one event in a one-shot slot
+    def trigger(self, slot, timestamp=0):
+        with self._condition:
+            self._events[slot] += 1
+            version, oldTimestamp, values = self._state
+            self._state = (version + 1, timestamp, values)
+            self._condition.notify_all()
+
+    # Returns the number of events in slot since the last consume()
+    # (at most limit) and marks them handled
+    def consume(self, slot, limit=None):
+        if self._events[slot] == self._consumed[slot]:
+            return 0  # Common case, no lock taken
+        with self._condition:
+            pending = self._events[slot] - self._consumed[slot]
+            if limit is not None and pending > limit:
+                pending = limit
+            self._consumed[slot] += pending
+            return pending
+
+    # Returns whether slot has unconsumed events, without consuming them
+    def pending(self, slot):
+        return self._events[slot] != self._consumed[slot]
+
+    # Drops every unconsumed event
+    def clearEvents(self):
+        with self._condition:
+            self._consumed = list(self._events)
+
+    # Restores every value to its default and drops pending events
+    def reset(self):
+        with self._condition:
+            version = self._state[0]
+            self._state = (version + 1, 0, (self._default,) * self._size)
+            self._consumed = list(self._events)
+            self._condition.notify_all()
+
+    # Blocks until the version is no longer the given one, or timeout
+    # seconds pass. Returns the current version.
+    def waitForVersion(self, version, timeout=None):
+        with self._condition:
+            if timeout is None:
+                while self._state[0] == version:
+                    self._condition.wait()
+                return self._state[0]
+            end = time.time() + timeout
+            while self._state[0] == version:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._state[0]
+
+    def __len__(self):
+        return self._size
@@ -1,32 +1,172 @@
+"""
+Collects system telemetry for the SystemTelemetry packet.
+
+CPU usage comes from /proc/stat deltas between updates, memory from
+/proc/meminfo, flash and SD card usage from os.statvfs() and the CPU
+usage of our own threads from ThreadStats.py. The /proc files are kept
+open and re-read with seek(0), so an update is a few reads and no
+subprocesses and is cheap enough to run every cycle.
+
+Units:
+    CPU_USAGE and THREAD_CPU_*    hundredths of a percent (of one core
+                                  for threads), 0 - 10000
+    RAM_* , FLASH_*, SD_CARD_*    MiB
+
+NOTE: Values are saturated to their 2 byte fields.
+
+EE Team of Husky Robotics
+"""
+import os
 import threading
-import Util
+import Schema
+import ThreadStats
+from Schema import PacketType
+import CommHandler  # Module import, CommHandler and Error import each other
 
 
 class SystemTelemetry:
 
+    FLASH_PATH = "/"
+    SD_CARD_PATH = "/media/card"
+
     telemetry = {
-        "0_CPU_USAGE": (1, 2),
-        "1_RAM_USAGE": (2, 2),
+        "0_CPU_USAGE": (0, 2),
+        "1_RAM_USAGE": (0, 2),
         "2_RAM_CAPACITY": (0, 2),
         "3_ACTIVE_THREADS": (threading.active_count(), 2),
         "4_FLASH_USAGE": (0, 2),
         "5_FLASH_CAPACITY": (0, 2),
         "6_SD_CARD_USAGE": (0, 2),
-        "7_SD_CARD_CAPACITY": (0, 2)
+        "7_SD_CARD_CAPACITY": (0, 2),
+        "8_SEND_QUEUE_DEPTH": (0, 2),
+        "9_SEND_QUEUE_DROPS": (0, 2),
+        "10_THREAD_CPU_ENCODERS": (0, 2),
+        "11_THREAD_CPU_COMMS": (0, 2),
+        "12_THREAD_CPU_COMMANDS": (0, 2),
+        "13_THREAD_CPU_SENSORS": (0, 2)
     }
 
+    _threadKeys = {
+        "encoders": "10_THREAD_CPU_ENCODERS",
+        "comms": "11_THREAD_CPU_COMMS",
+        "commands": "12_THREAD_CPU_COMMANDS",
+        "sensors": "13_THREAD_CPU_SENSORS"
+    }
+
+    _statFile = None
+    _meminfoFile = None
+    _lastCPU = None  # (busy, total) jiffies of the previous update
+
     @classmethod
     def initializeTelemetry(cls):
         cls.telemetry["3_ACTIVE_THREADS"] = (threading.active_count(), cls.telemetry["3_ACTIVE_THREADS"][1])
+        cls._statFile = cls._open("/proc/stat")
+        cls._meminfoFile = cls._open("/proc/meminfo")
+        cls._lastCPU = cls._readCPU()
+        ThreadStats.sample()
 
     @classmethod
     def updateTelemetry(cls):
         cls.telemetry["3_ACTIVE_THREADS"] = (threading.active_count(), cls.telemetry["3_ACTIVE_THREADS"][1])
+        cls._updateCPU()
+        cls._updateMemory()
+        cls._updateDisk(cls.FLASH_PATH, "4_FLASH_USAGE", "5_FLASH_CAPACITY")
+        cls._updateDisk(cls.SD_CARD_PATH, "6_SD_CARD_USAGE", "7_SD_CARD_CAPACITY")
+        queueStats = CommHandler.CommHandler.getQueueStats()
+        cls._set("8_SEND_QUEUE_DEPTH", queueStats["depth"])
+        cls._set("9_SEND_QUEUE_DROPS", queueStats["dropped"])
+        for group, usage in ThreadStats.sample().items():
+            key = cls._threadKeys.get(group)
+            if key is not None:
+                cls._set(key, usage * 100)
+
+    # Sets a telemetry value, saturating it to the width of its field
+    # Meant for internal use only
+    @classmethod
+    def _set(cls, key, value):
+        length = cls.telemetry[key][1]
+        cls.telemetry[key] = (max(0, min(int(value), (1 << (8 * length)) - 1)), length)
+
+    # Meant for internal use only
+    @classmethod
+    def _open(cls, path):
+        try:
+            return open(path, "r")
+        except IOError:
+            return None
+
+    # Returns (busy, total) jiffies of all CPUs from /proc/stat
+    # Meant for internal use only
+    @classmethod
+    def _readCPU(cls):
+        if cls._statFile is None:
+            return None
+        try:
+            cls._statFile.seek(0)
+            line = cls._statFile.readline()
+        except IOError:
+            return None
+        # cpu user nice system idle iowait irq softirq steal ...
+        # Time stolen by a hypervisor is not counted as busy
+        values = [int(value) for value in line.split()[1:9]]
+        busy = values[0] + values[1] + values[2] + values[5] + values[6]
+        return busy, sum(values)
+
+    # Meant for internal use only
+    @classmethod
+    def _updateCPU(cls):
+        current = cls._readCPU()
+        if current is None:
+            return
+        if cls._lastCPU is not None:
+            busy = current[0] - cls._lastCPU[0]
+            total = current[1] - cls._lastCPU[1]
+            if total > 0:
+                cls._set("0_CPU_USAGE", 10000.0 * busy / total)
+        cls._lastCPU = current
+
+    # Meant for internal use only
+    @classmethod
+    def _updateMemory(cls):
+        if cls._meminfoFile is None:
+            return
+        try:
+            cls._meminfoFile.seek(0)
+            lines = cls._meminfoFile.read().splitlines()
+        except IOError:
+            return
+        meminfo = {}
+        for line in lines:
+            parts = line.split()
+            if len(parts) >= 2:
+                meminfo[parts[0].rstrip(":")] = int(parts[1])  # kB
+        total = meminfo.get("MemTotal", 0)
+        available = meminfo.get("MemAvailable")
+        if available is None:  # Kernels before 3.14
+            available = meminfo.get("MemFree", 0) + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0)
+        cls._set("1_RAM_USAGE", (total - available) / 1024)
+        cls._set("2_RAM_CAPACITY", total / 1024)
+
+    # Meant for internal use only
+    @classmethod
+    def _updateDisk(cls, path, usageKey, capacityKey):
+        try:
+            if path != "/" and not os.path.ismount(path):
+                raise OSError("Not mounted: " + path)
+            stat = os.statvfs(path)
+        except OSError:
+            cls._set(usageKey, 0)
+            cls._set(capacityKey, 0)
+            return
+        capacity = stat.f_blocks * stat.f_frsize
+        used = (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+        cls._set(usageKey, used >> 20)
+        cls._set(capacityKey, capacity >> 20)
 
+    # Packs the values in key number order with the
+    # SystemTelemetry layout from Schema.py
     @classmethod
     def getTelemetryData(cls):
-        data = b''
-        for key in sorted(cls.telemetry.iterkeys()):
-            buffer = Util.long_to_byte_length(cls.telemetry[key][0], cls.telemetry[key][1])
-            data += buffer
-        return data
+        keys = sorted(cls.telemetry.iterkeys(), key=lambda key: int(key.split("_", 1)[0]))
+        values = [cls.telemetry[key][0] for key in keys]
+        return Schema.packBody(PacketType.SystemTelemetry, values)
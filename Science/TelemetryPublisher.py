@@ -0,0 +1,183 @@
+"""
+Rate-limited telemetry publisher for the Main.py loop.
+
+Each packet type is published at its own configured rate instead of
+as fast as the loop can spin. A stream is a packet type, a rate in Hz
+and a function that builds the packet; run() sleeps until the next
+stream is due, builds its packet and hands it to
+CommHandler.addCyclePacket().
+
+Coalescing: only the newest unsent snapshot of each type is kept. The
+publisher relies on the KEEP_LATEST policy of the send queue (see
+SendQueue.py) for this, a newer packet replaces the queued one of the
+same type, so a slow link never builds a backlog of stale readings.
+Replaced packets are counted by the send queue ("replaced" in
+CommHandler.getQueueStats()).
+
+Basic Implementation as follows:
+
+1) publisher = TelemetryPublisher()
+2) publisher.addStream(PacketType.PrimarySensor, 10, SensorHandler.buildPrimaryPacket)
+3) publisher.run()  (blocks, call stop() from another thread to return)
+
+NOTE: Deadlines are absolute, so the achieved rate does not drift below
+the configured one because of build time. A stream that falls more than
+one period behind skips the missed deadlines (counted as "late") rather
+than publishing a burst to catch up.
+
+EE Team of Husky Robotics
+"""
+import sys
+import time
+import threading
+from CommHandler import CommHandler
+
+
+class TelemetryPublisher:
+
+    RATE_WINDOW = 2.0  # seconds the achieved rate is measured over
+
+    def __init__(self, publish=None):
+        self._streams = []
+        self._publish = publish or CommHandler.addCyclePacket
+        self._stopEvent = threading.Event()
+
+    # Publishes build() every 1 / rate seconds.
+    # Adding a type that already has a stream changes its rate.
+    def addStream(self, packetType, rate, build):
+        if rate <= 0:
+            raise ValueError("Publish rate must be positive")
+        for stream in self._streams:
+            if stream.packetType == packetType:
+                stream.setRate(rate)
+                stream.build = build
+                return
+        self._streams.append(_Stream(packetType, rate, build))
+
+    def setRate(self, packetType, rate):
+        if rate <= 0:
+            raise ValueError("Publish rate must be positive")
+        for stream in self._streams:
+            if stream.packetType == packetType:
+                stream.setRate(rate)
+                return
+        raise KeyError("No stream for packet type " + hex(packetType))
+
+    # Publishes every stream that is due and returns
+    # the number of seconds until the next one is
+    def runOnce(self, now=None):
+        if now is None:
+            now = time.time()
+        wait = None
+        for stream in self._streams:
+            if stream.deadline is None:
+                stream.deadline = now
+            if stream.deadline <= now:
+                self._publishStream(stream, now)
+            remaining = stream.deadline - now
+            if wait is None or remaining < wait:
+                wait = remaining
+        if wait is None:
+            return 0.0
+        return max(wait, 0.0)
+
+    # Publishes until stop() is called. If reportPeriod is
+    # given the rates are written to stdout that often.
+    def run(self, reportPeriod=None):
+        self._stopEvent.clear()
+        for stream in self._streams:
+            stream.deadline = None
+        nextReport = None
+        if reportPeriod:
+            nextReport = time.time() + reportPeriod
+        while not self._stopEvent.is_set():
+            wait = self.runOnce()
+            if nextReport is not None and time.time() >= nextReport:
+                self.report()
+                nextReport += reportPeriod
+            sys.stdout.flush()
+            if wait > 0:
+                self._stopEvent.wait(wait)
+
+    def stop(self):
+        self._stopEvent.set()
+
+    # Returns { PacketType: counters } with the configured
+    # and achieved rate of each stream
+    def getStats(self, now=None):
+        if now is None:
+            now = time.time()
+        return dict((stream.packetType, stream.getStats(now)) for stream in self._streams)
+
+    # Writes the configured and achieved rate of each stream
+    def report(self, out=sys.stdout):
+        stats = self.getStats()
+        for packetType in sorted(stats):
+            stream = stats[packetType]
+            out.write("Packet %s: %.1f / %.1f Hz (%d published, %d late, %d errors)\n" %
+                      (hex(packetType), stream["achieved"], stream["configured"],
+                       stream["published"], stream["late"], stream["errors"]))
+
+    # Meant for internal use only
+    def _publishStream(self, stream, now):
+        try:
+            packet = stream.build()
+            if packet is not None:
+                self._publish(packet)
+                stream.record(now)
+        except Exception:
+            stream.errors += 1
+            sys.stderr.write("\nFailed to publish packet " + hex(stream.packetType) + ": " +
+                             str(sys.exc_info()[1]) + "\n")
+        stream.advance(now)
+
+
+class _Stream:
+
+    def __init__(self, packetType, rate, build):
+        self.packetType = packetType
+        self.build = build
+        self.period = 1.0 / rate
+        self.deadline = None  # Set to the current time on the first run
+        self.published = 0
+        self.late = 0
+        self.errors = 0
+        self._windowStart = None
+        self._windowCount = 0
+        self._achieved = 0.0
+
+    def setRate(self, rate):
+        self.period = 1.0 / rate
+
+    # Moves the deadline to the next period, skipping any that were missed
+    def advance(self, now):
+        self.deadline += self.period
+        if self.deadline <= now:
+            missed = int((now - self.deadline) / self.period) + 1
+            self.late += missed
+            self.deadline += missed * self.period
+
+    def record(self, now):
+        self.published += 1
+        if self._windowStart is None:
+            self._windowStart = now
+            self._windowCount = 0
+            return
+        self._windowCount += 1
+        elapsed = now - self._windowStart
+        if elapsed >= TelemetryPublisher.RATE_WINDOW:
+            self._achieved = self._windowCount / elapsed
+            self._windowStart = now
+            self._windowCount = 0
+
+    def getStats(self, now):
+        achieved = self._achieved
+        if achieved == 0.0 and self._windowStart is not None and now > self._windowStart:
+            achieved = self._windowCount / (now - self._windowStart)
+        return {
+            "configured": 1.0 / self.period,
+            "achieved": achieved,
+            "published": self.published,
+            "late": self.late,
+            "errors": self.errors
+        }
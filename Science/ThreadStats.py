@@ -0,0 +1,127 @@
+"""
+Per-thread CPU time accounting for SystemTelemetry.
+
+Threads call register(group) once at the start of their run function.
+sample() then reads utime + stime of every registered thread from
+/proc/self/task/<tid>/stat and returns the CPU usage of each group
+since the previous sample, which SystemTelemetry puts in its packet so
+a thread stuck in a busy-loop shows up at the base station.
+
+The stat files are opened once per thread and re-read with seek(0),
+so a sample is one read() per thread and no subprocesses.
+
+Groups reported in the SystemTelemetry packet:
+    encoders  - EdgeEventService thread (Encoder edges)
+    comms     - CommHandler receive / send and Parse threads
+    commands  - Command control loops
+    sensors   - SensorScheduler sample workers
+
+EE Team of Husky Robotics
+"""
+import os
+import time
+import threading
+
+GROUPS = ("encoders", "comms", "commands", "sensors")
+
+_SYS_GETTID = {"armv7l": 224, "armv6l": 224, "x86_64": 186, "aarch64": 178, "i686": 224}
+
+_lock = threading.Lock()
+_threads = {}  # tid -> [group, name, file, lastTicks]
+_lastTime = None
+_ticksPerSecond = float(os.sysconf("SC_CLK_TCK")) if hasattr(os, "sysconf") else 100.0
+_syscall = None
+
+
+"""
+Returns the kernel thread ID of the calling thread,
+or None if it can not be found on this platform
+"""
+def gettid():
+    global _syscall
+    if hasattr(threading, "get_native_id"):
+        return threading.get_native_id()
+    number = _SYS_GETTID.get(os.uname()[4])
+    if number is None:
+        return None
+    try:
+        if _syscall is None:
+            import ctypes
+            _syscall = ctypes.CDLL(None, use_errno=True).syscall
+        return _syscall(number)
+    except (OSError, AttributeError):
+        return None
+
+
+"""
+Registers the calling thread under the given group
+Does nothing if the thread ID or its stat file is unavailable
+"""
+def register(group):
+    tid = gettid()
+    if tid is None:
+        return
+    try:
+        statFile = open("/proc/self/task/%d/stat" % tid, "r")
+    except IOError:
+        return
+    with _lock:
+        old = _threads.pop(tid, None)
+        if old is not None:
+            old[2].close()
+        _threads[tid] = [group, threading.current_thread().name, statFile, _readTicks(statFile)]
+
+
+"""
+Returns { group: CPU usage in percent of one core } since the
+previous call, for every group in GROUPS. Threads that have exited
+are dropped.
+"""
+def sample(now=None):
+    global _lastTime
+    if now is None:
+        now = time.time()
+    usage = dict((group, 0.0) for group in GROUPS)
+    with _lock:
+        elapsed = None
+        if _lastTime is not None:
+            elapsed = now - _lastTime
+        _lastTime = now
+        for tid in list(_threads):
+            entry = _threads[tid]
+            ticks = _readTicks(entry[2])
+            if ticks is None:
+                entry[2].close()
+                del _threads[tid]
+                continue
+            delta = ticks - entry[3]
+            entry[3] = ticks
+            if elapsed:
+                usage[entry[0]] = usage.get(entry[0], 0.0) + 100.0 * delta / _ticksPerSecond / elapsed
+    return usage
+
+
+"""
+Returns [(name, group, tid)] of the registered threads
+"""
+def getThreads():
+    with _lock:
+        return [(entry[1], entry[0], tid) for tid, entry in _threads.items()]
+
+
+"""
+Returns utime + stime in clock ticks from an open stat
+file, or None if the thread has exited
+Meant for internal use only
+"""
+def _readTicks(statFile):
+    try:
+        statFile.seek(0)
+        stat = statFile.read()
+    except (IOError, OSError):
+        return None
+    if not stat:
+        return None
+    # The name field can contain spaces, so split after its closing ')'
+    fields = stat[stat.rfind(")") + 2:].split()
+    return int(fields[11]) + int(fields[12])
@@ -0,0 +1,222 @@
+"""
+Persistent TCP uplink to the base station.
+
+Keeps one long-lived stream open per (ip, port) target instead of
+opening and closing a socket for every packet. Each packet is written
+as a length-framed record:
+
+    [ 2 byte big-endian length ][ packet bytes ]
+
+so the receiver can split back-to-back packets that arrive in the same
+segment (or one packet split across segments).
+
+Basic Implementation as follows:
+
+1) Get the connection for a target with Uplink.get(ip, port)
+2) Call send(data) with the packet bytes; a dropped connection is
+   re-established automatically on the next send
+3) If batching is enabled with Uplink.setBatching(cork=True), call
+   flush() (or Uplink.flushAll()) once the cycle's packets are written
+
+NOTE: send() raises socket.error on failure so the caller decides how
+to report it (see Packet.send()). Reconnects are rate limited by
+RECONNECT_DELAY so a missing cable does not turn into a connect storm.
+
+EE Team of Husky Robotics
+"""
+import socket
+import struct
+import threading
+import time
+
+
+class Uplink:
+
+    FRAME_HEADER = struct.Struct(">H")
+    MAX_FRAME_SIZE = 0xFFFF
+    CONNECT_TIMEOUT = 1.0   # seconds
+    RECONNECT_DELAY = 0.5   # seconds between reconnect attempts
+
+    # Batching options, applied to every connection in the pool
+    _nodelay = True   # Disable Nagle so small packets go out immediately
+    _cork = False     # Hold partial frames until flush() (Linux only)
+
+    _pool = {}
+    _poolLock = threading.Lock()
+
+    def __init__(self, targetIP, targetPort):
+        self._target = (targetIP, targetPort)
+        self._sock = None
+        self._lock = threading.Lock()
+        self._lastAttempt = 0
+        self._sent = 0
+        self._failures = 0
+        self._connects = 0
+        self._bytes = 0
+        self._totalLatency = 0.0
+        self._maxLatency = 0.0
+        self._lastLatency = 0.0
+
+    # Returns the pooled connection for the given target,
+    # creating it if it does not exist yet
+    @classmethod
+    def get(cls, targetIP, targetPort):
+        key = (targetIP, targetPort)
+        with cls._poolLock:
+            uplink = cls._pool.get(key)
+            if uplink is None:
+                uplink = Uplink(targetIP, targetPort)
+                cls._pool[key] = uplink
+        return uplink
+
+    # Sets Nagle/cork batching for all connections.
+    # nodelay = True disables Nagle's algorithm (lowest latency)
+    # cork = True holds data in the kernel until flush() is called,
+    #        so a whole cycle of packets leaves in as few segments as possible
+    @classmethod
+    def setBatching(cls, nodelay=True, cork=False):
+        cls._nodelay = nodelay
+        cls._cork = cork and hasattr(socket, "TCP_CORK")
+        with cls._poolLock:
+            uplinks = list(cls._pool.values())
+        for uplink in uplinks:
+            uplink._applyOptions()
+
+    @classmethod
+    def flushAll(cls):
+        with cls._poolLock:
+            uplinks = list(cls._pool.values())
+        for uplink in uplinks:
+            uplink.flush()
+
+    @classmethod
+    def closeAll(cls):
+        with cls._poolLock:
+            uplinks = list(cls._pool.values())
+            cls._pool = {}
+        for uplink in uplinks:
+            uplink.close()
+
+    # Returns a dictionary of counters for every pooled connection
+    @classmethod
+    def getAllStats(cls):
+        with cls._poolLock:
+            uplinks = list(cls._pool.values())
+        return dict((uplink._target, uplink.getStats()) for uplink in uplinks)
+
+    # Writes one framed packet to the stream.
+    # Raises socket.error if the packet could not be sent.
+    def send(self, data):
+        if len(data) > self.MAX_FRAME_SIZE:
+            raise ValueError("Packet too large for uplink frame: " + str(len(data)))
+        return self.sendFrame(self.FRAME_HEADER.pack(len(data)) + bytes(data))
+
+    # Writes bytes that already start with the length prefix,
+    # e.g. a memoryview from PacketBuilder, without copying them.
+    # Raises socket.error if the frame could not be sent.
+    def sendFrame(self, frame):
+        with self._lock:
+            start = time.time()
+            try:
+                self._connect()
+                self._sock.sendall(frame)
+            except socket.error:
+                self._failures += 1
+                self._disconnect()
+                raise
+            latency = time.time() - start
+            self._sent += 1
+            self._bytes += len(frame)
+            self._lastLatency = latency
+            self._totalLatency += latency
+            if latency > self._maxLatency:
+                self._maxLatency = latency
+        return True
+
+    # Pushes out any corked data. Does nothing if cork is disabled.
+    def flush(self):
+        if not self._cork:
+            return
+        with self._lock:
+            if self._sock is None:
+                return
+            try:
+                self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+                self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+            except socket.error:
+                self._disconnect()
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def isConnected(self):
+        return self._sock is not None
+
+    def getStats(self):
+        with self._lock:
+            average = 0.0
+            if self._sent > 0:
+                average = self._totalLatency / self._sent
+            return {
+                "sent": self._sent,
+                "failures": self._failures,
+                "connects": self._connects,
+                "bytes": self._bytes,
+                "lastLatency": self._lastLatency,
+                "avgLatency": average,
+                "maxLatency": self._maxLatency
+            }
+
+    def resetStats(self):
+        with self._lock:
+            self._sent = 0
+            self._failures = 0
+            self._connects = 0
+            self._bytes = 0
+            self._totalLatency = 0.0
+            self._maxLatency = 0.0
+            self._lastLatency = 0.0
+
+    # Opens the stream if it is not already open
+    # Meant for internal use only, caller holds self._lock
+    def _connect(self):
+        if self._sock is not None:
+            return
+        now = time.time()
+        if now - self._lastAttempt < self.RECONNECT_DELAY:
+            raise socket.error("Uplink to " + str(self._target) + " is down, waiting to reconnect")
+        self._lastAttempt = now
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.CONNECT_TIMEOUT)
+            sock.connect(self._target)
+            sock.settimeout(None)
+        except socket.error:
+            sock.close()
+            raise
+        self._sock = sock
+        self._connects += 1
+        self._applyOptions()
+
+    # Meant for internal use only
+    def _applyOptions(self):
+        sock = self._sock
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self._nodelay))
+            if hasattr(socket, "TCP_CORK"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, int(self._cork))
+        except socket.error:
+            pass
+
+    # Meant for internal use only, caller holds self._lock
+    def _disconnect(self):
+        if self._sock is None:
+            return
+        try:
+            self._sock.close()
+        except socket.error:
+            pass
+        self._sock = None
@@ -15,6 +15,7 @@ method comments below.
 import sys
 import math
 import struct
+import Codec
 from binascii import unhexlify
 
 ADC_STATUS = False
@@ -77,34 +78,24 @@ def binaryLength(n):
     return int(digits)
 
 """
-Returns an integer from a hex encoded bytearray
+Returns an integer from a big-endian bytearray
 called data. From position start to stop
+Uses the struct fast paths in Codec.py
+TESTED? YES
 """
 def bytesToInt(data, start=None, stop=None, signed=False):
-    """Convert a bytearray into an integer, considering the first bit as
-    sign. The data MUST be big-endian."""
-    data = data[start:stop]
-    if signed:
-        negative = data[0] & 0x80 > 0
-
-        if negative:
-            inverted = bytearray(~d % 256 for d in data)
-            return -signedbytes(inverted) - 1
-
-    encoded = str(data).encode('hex')
-    return int(encoded, 16)
+    return Codec.decode(data, start, stop, signed)
 
 """
-Returns val represented as a bytearray length byte_length
-DEFINITELY WORKS!
+Returns val represented as a big-endian bytearray length byte_length
+Negative values are two's complement, see Codec.py
+TESTED? YES
 """
 def long_to_byte_length(val, byte_length, endianness='big'):
-    valBA = bytearray(long_to_bytes(val))
-    if len(valBA) > byte_length:
-        valBA = valBA[:byte_length]
-    elif len(valBA) < byte_length:
-        valBA = b'\x00'*(byte_length-len(valBA)) + valBA
-    return valBA
+    data = Codec.encode(val, byte_length)
+    if endianness == 'little':
+        data.reverse()
+    return data
 
 """
 Appends Bytearray to end of parent bytearray
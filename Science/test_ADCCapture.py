@@ -0,0 +1,110 @@
+import os
+import time
+import shutil
+import tempfile
+import pytest
+from ADCCapture import ADCCapture, FakeIIODevice, MAX_VALUE
+
+
+@pytest.fixture
+def fake():
+    path = tempfile.mkdtemp()
+    yield FakeIIODevice(path)
+    shutil.rmtree(path)
+
+
+def start(fake, *pins):
+    adc = ADCCapture(fake.sysfsPath, fake.devPath)
+    for pin in pins:
+        adc.addChannel(pin)
+    adc.start()
+    return adc
+
+
+# Waits for the capture thread to store scans scans
+def wait_for(adc, scans, timeout=2.0):
+    deadline = time.time() + timeout
+    while adc.getStats()["scans"] < scans:
+        assert time.time() < deadline, "capture thread stored " + str(adc.getStats()["scans"]) + " scans"
+        time.sleep(0.005)
+
+
+class TestBuffered:
+    def test_read(self, fake):
+        adc = start(fake, "AIN1")
+        try:
+            assert adc.isBuffered()
+            fake.push({1: [1000] * 8 + [3000] * 8})
+            wait_for(adc, 16)
+            assert adc.readRaw("AIN1", 8) == 3000
+            assert adc.readRaw("AIN1", 16) == 2000
+            assert adc.read("P9_40", 4) == pytest.approx(3000.0 / MAX_VALUE)
+        finally:
+            adc.stop()
+
+    def test_read_average(self, fake):
+        adc = start(fake, "AIN1")
+        try:
+            before = time.time()
+            fake.push({1: [100, 200, 300, 400]})
+            wait_for(adc, 4)
+            value, timestamp = adc.readAverage("AIN1", 2)
+            assert value == pytest.approx(350.0 / MAX_VALUE)
+            assert before <= timestamp <= time.time()
+        finally:
+            adc.stop()
+
+    def test_decimate(self, fake):
+        adc = start(fake, "AIN1")
+        try:
+            fake.push({1: [10, 20, 30, 40, 50, 60, 70, 80]})
+            wait_for(adc, 8)
+            values = adc.decimate("AIN1", 2, 3)
+            assert [value * MAX_VALUE for value in values] == pytest.approx([35, 55, 75])
+            assert len(adc.decimate("AIN1", 4, 10)) == 2
+        finally:
+            adc.stop()
+
+    def test_two_channels_are_deinterleaved(self, fake):
+        adc = start(fake, "AIN3", "AIN0")
+        try:
+            assert adc.getStats()["channels"] == [0, 3]
+            fake.push({0: [111] * 10, 3: [3333] * 10})
+            wait_for(adc, 10)
+            assert adc.readRaw("AIN0", 10) == 111
+            assert adc.readRaw("AIN3", 10) == 3333
+        finally:
+            adc.stop()
+
+    def test_read_before_first_scan_uses_one_shot(self, fake):
+        adc = start(fake, "AIN1")
+        try:
+            fake.setOneShot(1, 1234)
+            assert adc.getStats()["scans"] == 0
+            assert adc.readRaw("AIN1", 4) == 1234
+            assert adc.decimate("AIN1", 2, 3) == pytest.approx([1234.0 / MAX_VALUE])
+        finally:
+            adc.stop()
+
+    def test_add_channel_restart_uses_one_shot(self, fake):
+        adc = start(fake, "AIN1")
+        try:
+            adc.addChannel("AIN2")
+            fake.setOneShot(2, 777)
+            assert adc.readRaw("AIN2") == 777
+        finally:
+            adc.stop()
+
+
+class TestOneShot:
+    def test_falls_back_without_buffer(self, fake):
+        shutil.rmtree(os.path.join(fake.sysfsPath, "buffer"))
+        adc = start(fake, "AIN2")
+        try:
+            assert not adc.isBuffered()
+            fake.setOneShot(2, 2048)
+            assert adc.readRaw("AIN2", 4) == 2048
+            assert adc.read("AIN2") == pytest.approx(2048.0 / MAX_VALUE)
+            assert adc.decimate("AIN2", 2, 3) == pytest.approx([2048.0 / MAX_VALUE] * 3)
+        finally:
+            adc.stop()
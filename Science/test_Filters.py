@@ -0,0 +1,52 @@
+import random
+import pytest
+from Filters import MovingAverage, RunningMedian
+
+
+def brute_median(window):
+    ordered = sorted(window)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+class TestRunningMedian:
+    @pytest.mark.parametrize("size", [1, 2, 5, 8])
+    def test_matches_brute_force(self, size):
+        rng = random.Random(size)
+        median = RunningMedian(size)
+        window = []
+        for i in range(2000):
+            # Few distinct values so duplicates enter and leave the window
+            value = rng.randint(0, 20) / 4.0
+            window = (window + [value])[-size:]
+            assert median.filter(value) == brute_median(window)
+            assert median.get() == brute_median(window)
+
+    def test_window_stays_bounded_on_monotonic_input(self):
+        median = RunningMedian(5)
+        for i in range(200000):
+            assert median.filter(i) == max(i - 2, i / 2.0)
+        assert len(median._sorted) == 5
+
+    def test_reset(self):
+        median = RunningMedian(3)
+        for value in (1, 9, 4):
+            median.filter(value)
+        median.reset()
+        assert median.get() == 0.0
+        assert median.filter(7) == 7.0
+
+    def test_size_must_be_positive(self):
+        with pytest.raises(ValueError):
+            RunningMedian(0)
+
+
+class TestMovingAverage:
+    def test_mean_of_window(self):
+        average = MovingAverage(4)
+        values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+        for i, value in enumerate(values):
+            window = values[max(i - 3, 0):i + 1]
+            assert average.filter(value) == pytest.approx(sum(window) / len(window))